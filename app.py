@@ -1,16 +1,44 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import subprocess
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse, Response
+from pydantic import BaseModel, Field
 import tempfile
 import os
 import re
 import json
 import asyncio
 import uuid
-from typing import Optional, List
+from typing import Optional, List, Dict, Any, AsyncIterator, Callable, Awaitable, Tuple
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+import heapq
+import bisect
+import itertools
+import calendar
+import codecs
+import time
+import sqlite3
+import threading
+import queue
+import tarfile
+import io
+import base64
+import random
+import ssl
+import gzip
+import hashlib
+import hmac
+import contextvars
+import sys
+import abc
+from urllib.parse import urlencode, quote, urlsplit
 import logging
 from datetime import datetime
 
+try:
+    import brotli
+except ImportError:  # Optional: without it responses fall back to gzip
+    brotli = None
+
 app = FastAPI(title="Simple Mailbox Creator API", version="1.0.0")
 
 class MailboxRequest(BaseModel):
@@ -19,6 +47,8 @@ class MailboxRequest(BaseModel):
     password: str
     variations: int = 10
     proxy_endpoint: Optional[str] = None  # Optional proxy for this domain
+    priority: int = 0  # Higher priority jobs leave the queue first
+    callback_url: Optional[str] = None  # Receives job events by POST (auth code ready, finished)
 
 class MailboxResponse(BaseModel):
     success: bool
@@ -30,6 +60,1048 @@ class MailboxResponse(BaseModel):
     failed_mailboxes: Optional[List[str]] = None
     logs: Optional[str] = None
     ip_info: Optional[str] = None  # Added for proxy verification
+    queue_position: Optional[int] = None  # Set while the job waits for a free container slot
+    error: Optional[str] = None  # Why a job of a batch could not be started
+    logs_offset: Optional[int] = None  # Position of `logs` within the job's whole log
+    logs_size: Optional[int] = None  # Length of the job's whole log so far
+
+class BatchMailboxRequest(BaseModel):
+    jobs: List[MailboxRequest]
+
+class BatchMailboxResponse(BaseModel):
+    success: bool
+    jobs: List[MailboxResponse]
+
+class BulkCleanupRequest(BaseModel):
+    container_ids: Optional[List[str]] = None  # Explicit targets; otherwise the filters below select jobs
+    domain: Optional[str] = None
+    status: Optional[List[str]] = None
+    min_age: Optional[float] = None  # Seconds since submission
+    max_age: Optional[float] = None
+    grace: int = Field(10, ge=0)  # Seconds a running container gets to stop before it is killed
+    remove: bool = True  # False only stops the containers
+
+class BatchStatusRequest(BaseModel):
+    container_ids: List[str]
+    include_logs: bool = False
+
+# Docker Engine API configuration
+DOCKER_HOST = os.getenv("DOCKER_HOST", "unix:///var/run/docker.sock")
+DOCKER_API_VERSION = os.getenv("DOCKER_API_VERSION", "v1.41")
+DOCKER_POOL_SIZE = int(os.getenv("DOCKER_POOL_SIZE", "16"))
+# Like the docker CLI: tcp:// hosts use TLS with client certificates from DOCKER_CERT_PATH (ca.pem, cert.pem, key.pem)
+DOCKER_TLS_VERIFY = os.getenv("DOCKER_TLS_VERIFY", "") not in ("", "0")
+DOCKER_CERT_PATH = os.getenv("DOCKER_CERT_PATH", os.path.expanduser("~/.docker"))
+# Several Docker endpoints (comma-separated unix://, tcp:// or ssh://) to spread jobs over; overrides DOCKER_HOST
+DOCKER_HOSTS = [host.strip() for host in os.getenv("DOCKER_HOSTS", "").split(",") if host.strip()]
+# Seconds a host's load (running containers, memory) is reused when placing new jobs
+HOST_LOAD_TTL = float(os.getenv("HOST_LOAD_TTL", "5"))
+
+# Where job containers run: "docker" (the Engine API above) or "fake" (simulated in-process, for load tests)
+EXECUTION_BACKEND = os.getenv("EXECUTION_BACKEND", "docker")
+# Fake runner timeline: seconds until the auth code, until sign-in completes and per mailbox; mailbox failure odds
+FAKE_AUTH_DELAY = float(os.getenv("FAKE_AUTH_DELAY", "1"))
+FAKE_LOGIN_DELAY = float(os.getenv("FAKE_LOGIN_DELAY", "5"))
+FAKE_MAILBOX_DELAY = float(os.getenv("FAKE_MAILBOX_DELAY", "0.2"))
+FAKE_FAILURE_RATE = float(os.getenv("FAKE_FAILURE_RATE", "0.05"))
+# Fake runners replay captured job logs from this directory instead, sped up by FAKE_REPLAY_SPEED
+FAKE_REPLAY_DIR = os.getenv("FAKE_REPLAY_DIR", "")
+FAKE_REPLAY_SPEED = float(os.getenv("FAKE_REPLAY_SPEED", "1"))
+
+# Save the timed log stream of every finished job here (one .log.gz per job); empty disables capture
+LOG_CAPTURE_DIR = os.getenv("LOG_CAPTURE_DIR", "")
+
+# In-memory job table: max number of jobs kept and log characters retained per job
+JOB_TABLE_SIZE = int(os.getenv("JOB_TABLE_SIZE", "1000"))
+JOB_LOG_RETAIN_CHARS = int(os.getenv("JOB_LOG_RETAIN_CHARS", "65536"))
+
+# Docker reads behind /status: seconds a result is reused, and how many containers are remembered
+STATUS_CACHE_TTL = float(os.getenv("STATUS_CACHE_TTL", "1"))
+STATUS_CACHE_SIZE = int(os.getenv("STATUS_CACHE_SIZE", "1024"))
+
+# Durable job store (SQLite in WAL mode); writes are batched every flush interval
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "data/jobs.db")
+JOB_STORE_FLUSH_INTERVAL = float(os.getenv("JOB_STORE_FLUSH_INTERVAL", "0.5"))
+
+# Webhook delivery: connections per callback host, request timeout and retry schedule
+WEBHOOK_HOST_CONCURRENCY = int(os.getenv("WEBHOOK_HOST_CONCURRENCY", "4"))
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "10"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+WEBHOOK_BACKOFF_BASE = float(os.getenv("WEBHOOK_BACKOFF_BASE", "2"))
+WEBHOOK_BACKOFF_MAX = float(os.getenv("WEBHOOK_BACKOFF_MAX", "600"))
+
+# Runner image (see Dockerfile.runner) and number of pre-started idle runner containers
+RUNNER_IMAGE = os.getenv("RUNNER_IMAGE", "mcr.microsoft.com/powershell:latest")
+RUNNER_POOL_SIZE = int(os.getenv("RUNNER_POOL_SIZE", "0"))
+RUNNER_POOL_PREFIX = "mailbox-runner-idle-"
+
+# Mailboxes created in parallel inside one authenticated runner session; 1 (sequential) until parallel
+# workers sharing the Exchange session are verified against a real tenant
+MAILBOX_CONCURRENCY = int(os.getenv("MAILBOX_CONCURRENCY", "1"))
+
+# Runner output: 0 = JSON events only, 1 = plus progress log events, 2 = plus raw module output (banners, warnings)
+RUNNER_VERBOSITY = int(os.getenv("RUNNER_VERBOSITY", "1"))
+
+# Admission control: concurrently running job containers, queue length and 429 back-off hint
+MAX_RUNNING_JOBS = int(os.getenv("MAX_RUNNING_JOBS", "8"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "200"))
+QUEUE_RETRY_AFTER = int(os.getenv("QUEUE_RETRY_AFTER", "30"))
+SCHEDULER_SYNC_INTERVAL = float(os.getenv("SCHEDULER_SYNC_INTERVAL", "15"))
+BATCH_MAX_JOBS = int(os.getenv("BATCH_MAX_JOBS", "500"))
+
+# Status streams: keep-alive comment interval, and re-check interval when no Docker watcher feeds updates
+STREAM_KEEPALIVE_INTERVAL = float(os.getenv("STREAM_KEEPALIVE_INTERVAL", "15"))
+STREAM_POLL_INTERVAL = float(os.getenv("STREAM_POLL_INTERVAL", "2"))
+# Upper bound for the `timeout` of a long-polling `/status?wait_for=...` request
+STATUS_WAIT_MAX_TIMEOUT = float(os.getenv("STATUS_WAIT_MAX_TIMEOUT", "120"))
+# Status bodies at least this large are compressed when the client accepts it
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+
+# Request tracing: "stdout" or a file to append one JSON line per traced request to; empty disables tracing
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1"))
+# Only traces of requests at least this slow (milliseconds) are exported
+TRACE_MIN_DURATION_MS = float(os.getenv("TRACE_MIN_DURATION_MS", "0"))
+# Bearer token for the /debug endpoints (profiling); empty disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "120"))
+
+# Retention: seconds a finished job container is kept per final status, and the longest a job may run
+RETENTION_COMPLETED = float(os.getenv("RETENTION_COMPLETED", "86400"))
+RETENTION_FAILED = float(os.getenv("RETENTION_FAILED", "86400"))
+RETENTION_AUTH_TIMEOUT = float(os.getenv("RETENTION_AUTH_TIMEOUT", "86400"))
+JOB_MAX_RUNTIME = float(os.getenv("JOB_MAX_RUNTIME", "86400"))
+REAPER_INTERVAL = float(os.getenv("REAPER_INTERVAL", "300"))
+REAPER_CONCURRENCY = int(os.getenv("REAPER_CONCURRENCY", "8"))
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "16"))
+
+# Follow Docker events and stream runner logs in the background
+WATCH_DOCKER_EVENTS = os.getenv("WATCH_DOCKER_EVENTS", "1") == "1"
+JOB_NAME_PREFIX = "mailbox-creator-"
+# Docker labels on every container the API creates; job containers also carry their job id, domain and creation time
+LABEL_ROLE = "mailbox-creator.role"
+LABEL_JOB = "mailbox-creator.job"
+LABEL_DOMAIN = "mailbox-creator.domain"
+LABEL_CREATED_AT = "mailbox-creator.created-at"
+CONTAINERS_PAGE_MAX = 1000
+
+class DockerError(Exception):
+    """Error response returned by the Docker Engine API"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+StreamOpener = Callable[[], Awaitable[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]]
+
+class _HTTPConnectionPool:
+    """Minimal HTTP/1.1 client with a pool of keep-alive connections to one endpoint"""
+
+    def __init__(self, opener: StreamOpener, host_header: str, max_connections: int = 16):
+        self._opener = opener
+        self._host_header = host_header
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots = asyncio.Semaphore(max_connections)
+
+    async def _acquire(self, fresh: bool = False) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+        while self._idle and not fresh:
+            reader, writer = self._idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await self._opener()
+        return reader, writer, False
+
+    def _release(self, conn: Tuple[asyncio.StreamReader, asyncio.StreamWriter], reusable: bool):
+        if reusable:
+            self._idle.append(conn)
+        else:
+            conn[1].close()
+
+    def _encode_request(self, method: str, target: str, body: Optional[bytes], headers: Optional[Dict[str, str]]) -> bytes:
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {self._host_header}", "User-Agent: mailbox-creator-api"]
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        if body is not None:
+            lines.append(f"Content-Length: {len(body)}")
+        lines.append("\r\n")
+        return "\r\n".join(lines).encode("latin-1") + (body or b"")
+
+    @staticmethod
+    async def _read_head(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str]]:
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed before response")
+        status = int(status_line.split(b" ", 2)[1])
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return status, headers
+
+    @staticmethod
+    async def _iter_body(reader: asyncio.StreamReader, method: str, status: int, headers: Dict[str, str]) -> AsyncIterator[bytes]:
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            return
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size_line = await reader.readline()
+                size = int(size_line.split(b";", 1)[0].strip() or b"0", 16)
+                if size == 0:
+                    # Skip trailers up to the terminating blank line
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    return
+                yield await reader.readexactly(size)
+                await reader.readexactly(2)
+        elif "content-length" in headers:
+            remaining = int(headers["content-length"])
+            while remaining > 0:
+                chunk = await reader.read(min(remaining, 65536))
+                if not chunk:
+                    raise asyncio.IncompleteReadError(b"", remaining)
+                remaining -= len(chunk)
+                yield chunk
+        else:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    return
+                yield chunk
+
+    @staticmethod
+    def _keep_alive(headers: Dict[str, str]) -> bool:
+        if headers.get("connection", "").lower() == "close":
+            return False
+        return "content-length" in headers or headers.get("transfer-encoding", "").lower() == "chunked"
+
+    async def request(self, method: str, target: str, body: Optional[bytes] = None,
+                      headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        """Send a request and read the whole response body"""
+        async with self._slots:
+            for attempt in range(2):
+                reader, writer, reused = await self._acquire(fresh=attempt > 0)
+                try:
+                    writer.write(self._encode_request(method, target, body, headers))
+                    await writer.drain()
+                    status, resp_headers = await self._read_head(reader)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                    # A pooled connection may have been closed by the server while idle
+                    if reused:
+                        continue
+                    raise
+                except BaseException:
+                    writer.close()
+                    raise
+                try:
+                    data = b"".join([chunk async for chunk in self._iter_body(reader, method, status, resp_headers)])
+                except BaseException:
+                    writer.close()
+                    raise
+                self._release((reader, writer), self._keep_alive(resp_headers))
+                return status, resp_headers, data
+        raise ConnectionResetError("Connection closed before response")
+
+    async def stream(self, method: str, target: str, body: Optional[bytes] = None,
+                     headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], AsyncIterator[bytes]]:
+        """Send a request on a dedicated connection and return an iterator over the response body"""
+        reader, writer = await self._opener()
+        try:
+            writer.write(self._encode_request(method, target, body, headers))
+            await writer.drain()
+            status, resp_headers = await self._read_head(reader)
+        except BaseException:
+            writer.close()
+            raise
+
+        async def body_iter() -> AsyncIterator[bytes]:
+            try:
+                async for chunk in self._iter_body(reader, method, status, resp_headers):
+                    yield chunk
+            finally:
+                writer.close()
+
+        return status, resp_headers, body_iter()
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop()[1].close()
+
+class _LogDemuxer:
+    """Incrementally split Docker's multiplexed stdout/stderr log stream into raw text"""
+
+    def __init__(self):
+        self._buffer = b""
+        self._raw = False
+
+    def feed(self, data: bytes) -> bytes:
+        self._buffer += data
+        # Containers started with a TTY send plain text without frame headers
+        if not self._raw and self._buffer and self._buffer[0] not in (0, 1, 2):
+            self._raw = True
+        if self._raw:
+            out, self._buffer = self._buffer, b""
+            return out
+        out = []
+        while len(self._buffer) >= 8:
+            size = int.from_bytes(self._buffer[4:8], "big")
+            if len(self._buffer) < 8 + size:
+                break
+            out.append(self._buffer[8:8 + size])
+            self._buffer = self._buffer[8 + size:]
+        return b"".join(out)
+
+class ExecutionBackend(abc.ABC):
+    """Where job containers run: launch, inspect, read or follow logs, list, stop and remove them
+
+    The contract follows the Docker Engine API, which the Docker backend speaks directly: containers
+    are addressed by id or name, listings and inspections return Engine-shaped dicts, failures raise
+    DockerError with the matching HTTP status, and `events` yields start/rename/die/destroy events.
+    """
+
+    # Hosts left out of the latest listing because they could not be reached
+    unreachable: frozenset = frozenset()
+
+    @abc.abstractmethod
+    async def create_container(self, name: str, config: Dict[str, Any]) -> str:
+        ...
+
+    @abc.abstractmethod
+    async def start_container(self, container_id: str):
+        ...
+
+    @abc.abstractmethod
+    async def rename_container(self, container_id: str, name: str):
+        ...
+
+    @abc.abstractmethod
+    async def put_archive(self, container_id: str, path: str, files: Dict[str, bytes]):
+        ...
+
+    @abc.abstractmethod
+    async def inspect_container(self, container_id: str) -> Dict[str, Any]:
+        ...
+
+    @abc.abstractmethod
+    async def container_logs(self, container_id: str, **params) -> str:
+        ...
+
+    @abc.abstractmethod
+    async def follow_logs(self, container_id: str, **params) -> AsyncIterator[str]:
+        ...
+
+    @abc.abstractmethod
+    async def events(self, filters: Optional[Dict[str, List[str]]] = None) -> AsyncIterator[Dict[str, Any]]:
+        ...
+
+    @abc.abstractmethod
+    async def list_containers(self, all: bool = False, filters: Optional[Dict[str, List[str]]] = None) -> List[Dict[str, Any]]:
+        ...
+
+    @abc.abstractmethod
+    async def stop_container(self, container_id: str, timeout: int = 10):
+        ...
+
+    @abc.abstractmethod
+    async def remove_container(self, container_id: str, force: bool = False):
+        ...
+
+    def host_of(self, container_id: str) -> Optional[str]:
+        """The Docker endpoint a container lives on, if known"""
+        return None
+
+    async def close(self):
+        pass
+
+class DockerClient(ExecutionBackend):
+    """Async Docker Engine API client over the daemon socket with pooled keep-alive connections"""
+
+    def __init__(self, host: str = DOCKER_HOST, api_version: str = DOCKER_API_VERSION, pool_size: int = DOCKER_POOL_SIZE,
+                 tls_verify: bool = DOCKER_TLS_VERIFY, cert_path: str = DOCKER_CERT_PATH):
+        self.host = host
+        self.api_version = api_version
+        url = urlsplit(host)
+        if url.scheme == "unix":
+            path = url.path
+            opener: StreamOpener = lambda: asyncio.open_unix_connection(path)
+            host_header = "docker"
+        elif url.scheme in ("tcp", "http"):
+            if tls_verify:
+                context = ssl.create_default_context(cafile=os.path.join(cert_path, "ca.pem"))
+                context.load_cert_chain(os.path.join(cert_path, "cert.pem"), os.path.join(cert_path, "key.pem"))
+            elif url.hostname not in ("localhost", "127.0.0.1", "::1"):
+                # A plain TCP daemon socket gives anyone on the network root on the host
+                raise ValueError(f"DOCKER_HOST {host} needs TLS: set DOCKER_TLS_VERIFY=1 and DOCKER_CERT_PATH")
+            else:
+                context = None
+            hostname, port = url.hostname, url.port or (2376 if tls_verify else 2375)
+            opener = lambda: asyncio.open_connection(hostname, port, ssl=context)
+            host_header = f"{hostname}:{port}"
+        elif url.scheme == "ssh":
+            # Like the docker CLI: each connection is an ssh session bridged to the remote daemon's socket
+            command = ["ssh", "-o", "BatchMode=yes", *(["-p", str(url.port)] if url.port else []),
+                       f"{url.username}@{url.hostname}" if url.username else url.hostname,
+                       "docker", "system", "dial-stdio"]
+            
+            async def opener() -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+                process = await asyncio.create_subprocess_exec(*command, stdin=asyncio.subprocess.PIPE,
+                                                               stdout=asyncio.subprocess.PIPE)
+                return process.stdout, process.stdin
+            host_header = "docker"
+        else:
+            raise ValueError(f"Unsupported DOCKER_HOST: {host}")
+        self._pool = _HTTPConnectionPool(opener, host_header, pool_size)
+
+    def _target(self, path: str, params: Optional[Dict[str, Any]] = None) -> str:
+        target = f"/{self.api_version}{path}"
+        if params:
+            query = {k: v for k, v in params.items() if v is not None}
+            target += "?" + urlencode({k: json.dumps(v) if isinstance(v, dict) else v for k, v in query.items()})
+        return target
+
+    @staticmethod
+    def _error(status: int, data: bytes) -> DockerError:
+        try:
+            message = json.loads(data).get("message", "")
+        except ValueError:
+            message = data.decode("utf-8", "replace")
+        return DockerError(status, message or f"Docker API returned HTTP {status}")
+
+    async def _call(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+                    payload: Any = None, timeout: float = 30, raw: Optional[bytes] = None,
+                    content_type: str = "application/json") -> bytes:
+        body, headers = raw, {"Content-Type": content_type} if raw is not None else None
+        if payload is not None:
+            body = json.dumps(payload).encode()
+            headers = {"Content-Type": "application/json"}
+        elif body is None and method in ("POST", "PUT"):
+            body = b""
+        status, _, data = await asyncio.wait_for(
+            self._pool.request(method, self._target(path, params), body, headers), timeout
+        )
+        if status >= 400:
+            raise self._error(status, data)
+        return data
+
+    async def create_container(self, name: str, config: Dict[str, Any]) -> str:
+        """Create a container, pulling its image first if the daemon does not have it"""
+        try:
+            data = await self._call("POST", "/containers/create", {"name": name}, config)
+        except DockerError as e:
+            if e.status != 404:
+                raise
+            await self.pull_image(config["Image"])
+            data = await self._call("POST", "/containers/create", {"name": name}, config)
+        return json.loads(data)["Id"]
+
+    async def pull_image(self, image: str):
+        repo, _, tag = image.rpartition(":") if ":" in image.split("/")[-1] else (image, "", "latest")
+        # Pulls can take minutes; progress is streamed as JSON lines and failures arrive in-band
+        data = await self._call("POST", "/images/create", {"fromImage": repo, "tag": tag}, timeout=600)
+        for line in data.splitlines():
+            if b'"error"' in line:
+                raise DockerError(500, json.loads(line).get("error", f"Failed to pull {image}"))
+
+    async def start_container(self, container_id: str):
+        await self._call("POST", f"/containers/{quote(container_id)}/start")
+
+    async def rename_container(self, container_id: str, name: str):
+        await self._call("POST", f"/containers/{quote(container_id)}/rename", {"name": name})
+
+    async def put_archive(self, container_id: str, path: str, files: Dict[str, bytes]):
+        """Extract the given files into a directory of a container"""
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w") as tar:
+            for name, data in files.items():
+                info = tarfile.TarInfo(name)
+                info.size, info.mtime, info.mode = len(data), int(time.time()), 0o644
+                tar.addfile(info, io.BytesIO(data))
+        await self._call("PUT", f"/containers/{quote(container_id)}/archive", {"path": path},
+                         raw=buffer.getvalue(), content_type="application/x-tar")
+
+    async def inspect_container(self, container_id: str) -> Dict[str, Any]:
+        return json.loads(await self._call("GET", f"/containers/{quote(container_id)}/json"))
+
+    async def container_logs(self, container_id: str, **params) -> str:
+        """Return the demultiplexed stdout/stderr logs of a container"""
+        query = {"stdout": 1, "stderr": 1, **params}
+        data = await self._call("GET", f"/containers/{quote(container_id)}/logs", query)
+        return _LogDemuxer().feed(data).decode("utf-8", "replace")
+
+    async def _stream(self, path: str, params: Dict[str, Any]) -> AsyncIterator[bytes]:
+        status, _, body = await self._pool.stream("GET", self._target(path, params))
+        if status >= 400:
+            raise self._error(status, b"".join([chunk async for chunk in body]))
+        return body
+
+    async def follow_logs(self, container_id: str, **params) -> AsyncIterator[str]:
+        """Stream demultiplexed log text of a container until it stops"""
+        query = {"stdout": 1, "stderr": 1, "follow": 1, **params}
+        body = await self._stream(f"/containers/{quote(container_id)}/logs", query)
+        
+        async def text_iter() -> AsyncIterator[str]:
+            demuxer, decoder = _LogDemuxer(), codecs.getincrementaldecoder("utf-8")("replace")
+            async for chunk in body:
+                text = decoder.decode(demuxer.feed(chunk))
+                if text:
+                    yield text
+        
+        return text_iter()
+
+    async def events(self, filters: Optional[Dict[str, List[str]]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Subscribe to daemon events; the subscription is active once this returns"""
+        body = await self._stream("/events", {"filters": filters})
+        
+        async def event_iter() -> AsyncIterator[Dict[str, Any]]:
+            buffer = b""
+            async for chunk in body:
+                buffer += chunk
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    if line.strip():
+                        yield json.loads(line)
+        
+        return event_iter()
+
+    async def list_containers(self, all: bool = False, filters: Optional[Dict[str, List[str]]] = None) -> List[Dict[str, Any]]:
+        params = {"all": 1 if all else 0, "filters": filters}
+        return json.loads(await self._call("GET", "/containers/json", params))
+
+    async def stop_container(self, container_id: str, timeout: int = 10):
+        try:
+            await self._call("POST", f"/containers/{quote(container_id)}/stop", {"t": timeout}, timeout=timeout + 30)
+        except DockerError as e:
+            # 304 means the container was already stopped
+            if e.status != 304:
+                raise
+
+    async def remove_container(self, container_id: str, force: bool = False):
+        await self._call("DELETE", f"/containers/{quote(container_id)}", {"force": 1 if force else 0})
+
+    async def info(self) -> Dict[str, Any]:
+        return json.loads(await self._call("GET", "/info", timeout=10))
+
+    def host_of(self, container_id: str) -> Optional[str]:
+        return self.host
+
+    async def close(self):
+        await self._pool.close()
+
+class ShardedBackend(ExecutionBackend):
+    """Spreads job containers over several Docker hosts and routes each call to the host owning the container
+
+    New containers go to the reachable host with the fewest running containers per GiB of memory.
+    Owners are learned on creation and from listings; an unknown container is looked up on all hosts.
+    """
+
+    def __init__(self, clients: List[DockerClient], load_ttl: float = HOST_LOAD_TTL):
+        self.clients = {client.host: client for client in clients}
+        self.load_ttl = load_ttl
+        # Names and ids a container was addressed by -> its full id -> host, and the reverse for forgetting it
+        self._ids: Dict[str, str] = {}
+        self._hosts: Dict[str, str] = {}
+        self._aliases: Dict[str, set] = {}
+        # Host -> (checked at, running containers, memory in bytes); None values mark an unreachable host
+        self._load: Dict[str, Tuple[float, Optional[int], Optional[int]]] = {}
+        # Containers placed on a host since its load was last checked
+        self._placed: Dict[str, int] = {}
+
+    def _own(self, host: str, full_id: str, *aliases: str):
+        self._hosts[full_id] = host
+        keys = self._aliases.setdefault(full_id, set())
+        for key in (full_id, *aliases):
+            self._ids[key] = full_id
+            keys.add(key)
+
+    def _forget(self, full_id: str):
+        self._hosts.pop(full_id, None)
+        for key in self._aliases.pop(full_id, ()):
+            if self._ids.get(key) == full_id:
+                del self._ids[key]
+
+    async def _check_load(self, host: str):
+        checked = self._load.get(host)
+        if checked is not None and time.monotonic() - checked[0] < self.load_ttl:
+            return
+        try:
+            info = await self.clients[host].info()
+            self._load[host] = (time.monotonic(), info.get("ContainersRunning", 0), info.get("MemTotal", 0))
+        except Exception as e:
+            print(f"DEBUG: Docker host {host} unavailable: {e}")
+            self._load[host] = (time.monotonic(), None, None)
+        self._placed[host] = 0
+
+    async def _place(self) -> str:
+        await asyncio.gather(*(self._check_load(host) for host in self.clients))
+        scores = {
+            host: (running + self._placed[host]) / max(memory / (1 << 30), 1)
+            for host, (_, running, memory) in self._load.items() if running is not None
+        }
+        if not scores:
+            raise DockerError(503, "No Docker host is reachable")
+        host = min(scores, key=scores.get)
+        self._placed[host] += 1
+        return host
+
+    async def _route(self, container_id: str) -> Tuple[str, DockerClient]:
+        host = self.host_of(container_id)
+        if host is not None:
+            return host, self.clients[host]
+        results = await asyncio.gather(*(client.inspect_container(container_id) for client in self.clients.values()),
+                                       return_exceptions=True)
+        errors = []
+        for host, result in zip(self.clients, results):
+            if isinstance(result, dict):
+                self._own(host, result["Id"], container_id, result["Name"].lstrip("/"))
+                return host, self.clients[host]
+            if not (isinstance(result, DockerError) and result.status == 404):
+                errors.append(result)
+        # A container on an unreachable host is not known to be gone
+        raise errors[0] if errors else DockerError(404, f"No such container: {container_id}")
+
+    async def create_container(self, name: str, config: Dict[str, Any]) -> str:
+        host = await self._place()
+        container_id = await self.clients[host].create_container(name, config)
+        self._own(host, container_id, name)
+        return container_id
+
+    async def start_container(self, container_id: str):
+        await (await self._route(container_id))[1].start_container(container_id)
+
+    async def rename_container(self, container_id: str, name: str):
+        host, client = await self._route(container_id)
+        await client.rename_container(container_id, name)
+        if container_id in self._ids:
+            self._own(host, self._ids[container_id], name)
+
+    async def put_archive(self, container_id: str, path: str, files: Dict[str, bytes]):
+        await (await self._route(container_id))[1].put_archive(container_id, path, files)
+
+    async def inspect_container(self, container_id: str) -> Dict[str, Any]:
+        return await (await self._route(container_id))[1].inspect_container(container_id)
+
+    async def container_logs(self, container_id: str, **params) -> str:
+        return await (await self._route(container_id))[1].container_logs(container_id, **params)
+
+    async def follow_logs(self, container_id: str, **params) -> AsyncIterator[str]:
+        return await (await self._route(container_id))[1].follow_logs(container_id, **params)
+
+    async def stop_container(self, container_id: str, timeout: int = 10):
+        await (await self._route(container_id))[1].stop_container(container_id, timeout=timeout)
+
+    async def remove_container(self, container_id: str, force: bool = False):
+        host, client = await self._route(container_id)
+        await client.remove_container(container_id, force=force)
+        if container_id in self._ids:
+            self._forget(self._ids[container_id])
+
+    async def list_containers(self, all: bool = False, filters: Optional[Dict[str, List[str]]] = None) -> List[Dict[str, Any]]:
+        results = await asyncio.gather(*(client.list_containers(all=all, filters=filters) for client in self.clients.values()),
+                                       return_exceptions=True)
+        failed = [(host, result) for host, result in zip(self.clients, results) if isinstance(result, BaseException)]
+        if len(failed) == len(results):
+            raise failed[0][1]
+        # Containers on a down host are missing from the listing; callers that act on absence check `unreachable`
+        self.unreachable = frozenset(host for host, _ in failed)
+        for host, error in failed:
+            print(f"DEBUG: Docker host {host} not listed: {error}")
+        listed = []
+        for host, result in zip(self.clients, results):
+            if isinstance(result, BaseException):
+                continue
+            for container in result:
+                container["Host"] = host
+                self._own(host, container["Id"], *(name.lstrip("/") for name in container["Names"]))
+            listed.extend(result)
+        return listed
+
+    async def events(self, filters: Optional[Dict[str, List[str]]] = None) -> AsyncIterator[Dict[str, Any]]:
+        results = await asyncio.gather(*(client.events(filters) for client in self.clients.values()), return_exceptions=True)
+        streams = [result for result in results if not isinstance(result, BaseException)]
+        missing = [host for host, result in zip(self.clients, results) if isinstance(result, BaseException)]
+        if not streams:
+            raise results[0]
+        for host in missing:
+            print(f"DEBUG: Docker host {host} events unavailable")
+        
+        async def event_iter() -> AsyncIterator[Dict[str, Any]]:
+            queue: asyncio.Queue = asyncio.Queue()
+            
+            async def pump(stream: AsyncIterator[Dict[str, Any]]):
+                try:
+                    async for event in stream:
+                        queue.put_nowait(event)
+                    queue.put_nowait(DockerError(502, "Docker event stream ended"))
+                except Exception as e:
+                    queue.put_nowait(e)
+            
+            pumps = [asyncio.create_task(pump(stream)) for stream in streams]
+            # Hosts that were down rejoin when the caller subscribes again
+            deadline = time.monotonic() + 30 if missing else None
+            try:
+                while True:
+                    timeout = deadline - time.monotonic() if deadline is not None else None
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        raise DockerError(503, f"Resubscribing to Docker hosts {', '.join(missing)}")
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+            finally:
+                for task in pumps:
+                    task.cancel()
+        
+        return event_iter()
+
+    def host_of(self, container_id: str) -> Optional[str]:
+        full_id = self._ids.get(container_id)
+        return self._hosts.get(full_id) if full_id is not None else None
+
+    async def close(self):
+        await asyncio.gather(*(client.close() for client in self.clients.values()))
+
+def format_docker_timestamp(ns: int) -> str:
+    """Render nanoseconds since the epoch as a Docker RFC3339Nano timestamp"""
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ns // 1_000_000_000)) + f".{ns % 1_000_000_000:09d}Z"
+
+LOG_CAPTURE_FORMAT = "mailbox-creator-capture"
+
+def write_log_capture(path: str, header: Dict[str, Any], entries: List[Tuple[int, str]]):
+    """Write a captured log stream: gzip text, a JSON header line, then one `<µs since previous line>\\t<line>` per line"""
+    lines, previous = [json.dumps({"format": LOG_CAPTURE_FORMAT, "version": 1, **header})], None
+    for ns, line in entries:
+        us = ns // 1000 if previous is None else max(ns // 1000, previous)
+        lines.append(f"{0 if previous is None else us - previous}\t{line}")
+        previous = us
+    tmp = f"{path}.tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=9) as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, path)
+
+def read_log_capture(path: str) -> Tuple[Dict[str, Any], List[Tuple[float, str]]]:
+    """Read a capture written by write_log_capture; returns its header and (seconds since the first line, line) pairs"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("format") != LOG_CAPTURE_FORMAT:
+            raise ValueError(f"{path} is not a job log capture")
+        entries, offset = [], 0
+        for entry in f:
+            delta, _, line = entry.rstrip("\n").partition("\t")
+            offset += int(delta)
+            entries.append((offset / 1e6, line))
+    return header, entries
+
+@dataclass
+class _FakeContainer:
+    id: str
+    name: str
+    config: Dict[str, Any]
+    created_ns: int
+    status: str = "created"
+    exit_code: int = 0
+    started_ns: int = 0
+    finished_ns: int = 0
+    stamps: List[int] = field(default_factory=list)
+    lines: List[str] = field(default_factory=list)
+    files: Dict[str, bytes] = field(default_factory=dict)
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+    task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self.status == "running"
+
+    def append(self, line: str):
+        # Log timestamps are strictly increasing, as `since` cursors rely on them
+        ns = time.time_ns()
+        self.stamps.append(max(ns, self.stamps[-1] + 1) if self.stamps else ns)
+        self.lines.append(line + "\n")
+        self.wake()
+
+    def wake(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+class FakeBackend(ExecutionBackend):
+    """In-process stand-in for Docker whose runners print realistic job events on a configurable timeline
+
+    Nothing is executed: every started container replays the runner's event protocol (sign-in code,
+    authentication, one event per mailbox) with asyncio timers, so the API can be load-tested with
+    thousands of simulated jobs on a single machine.
+    """
+
+    def __init__(self, auth_delay: float = FAKE_AUTH_DELAY, login_delay: float = FAKE_LOGIN_DELAY,
+                 mailbox_delay: float = FAKE_MAILBOX_DELAY, failure_rate: float = FAKE_FAILURE_RATE,
+                 replay_dir: str = FAKE_REPLAY_DIR, replay_speed: float = FAKE_REPLAY_SPEED):
+        self.auth_delay = auth_delay
+        self.login_delay = login_delay
+        self.mailbox_delay = mailbox_delay
+        self.failure_rate = failure_rate
+        self.replay_dir = replay_dir
+        self.replay_speed = replay_speed
+        self._replays: Optional[List[Tuple[Dict[str, Any], List[Tuple[float, str]]]]] = None
+        self._containers: Dict[str, _FakeContainer] = {}
+        self._names: Dict[str, str] = {}
+        self._subscribers: List[Tuple[asyncio.Queue, Dict[str, List[str]]]] = []
+
+    def _get(self, container_id: str) -> _FakeContainer:
+        container = self._containers.get(self._names.get(container_id, container_id))
+        if container is None and len(container_id) >= 12:
+            container = next((c for c in self._containers.values() if c.id.startswith(container_id)), None)
+        if container is None:
+            raise DockerError(404, f"No such container: {container_id}")
+        return container
+
+    def _emit(self, container: _FakeContainer, action: str, **attributes):
+        ns = time.time_ns()
+        event = {
+            "Type": "container",
+            "Action": action,
+            "Actor": {"ID": container.id, "Attributes": {
+                **container.config.get("Labels", {}), "image": container.config.get("Image", ""),
+                "name": container.name, **attributes,
+            }},
+            "time": ns // 1_000_000_000,
+            "timeNano": ns,
+        }
+        for subscriber, filters in self._subscribers:
+            if action in filters.get("event", [action]):
+                subscriber.put_nowait(event)
+
+    async def create_container(self, name: str, config: Dict[str, Any]) -> str:
+        if name in self._names:
+            raise DockerError(409, f'Conflict. The container name "/{name}" is already in use')
+        container = _FakeContainer(uuid.uuid4().hex + uuid.uuid4().hex, name, config, time.time_ns())
+        self._containers[container.id] = container
+        self._names[name] = container.id
+        return container.id
+
+    async def start_container(self, container_id: str):
+        container = self._get(container_id)
+        if container.running:
+            raise DockerError(304, "Container already started")
+        container.status, container.started_ns = "running", time.time_ns()
+        container.task = asyncio.create_task(self._run(container))
+        self._emit(container, "start")
+
+    async def rename_container(self, container_id: str, name: str):
+        container = self._get(container_id)
+        if name in self._names:
+            raise DockerError(409, f'Conflict. The container name "/{name}" is already in use')
+        old_name = container.name
+        del self._names[old_name]
+        container.name, self._names[name] = name, container.id
+        self._emit(container, "rename", oldName=f"/{old_name}")
+
+    async def put_archive(self, container_id: str, path: str, files: Dict[str, bytes]):
+        container = self._get(container_id)
+        container.files.update({f"{path.rstrip('/')}/{name}": data for name, data in files.items()})
+        container.wake()
+
+    async def inspect_container(self, container_id: str) -> Dict[str, Any]:
+        container = self._get(container_id)
+        zero = "0001-01-01T00:00:00Z"
+        return {
+            "Id": container.id,
+            "Name": f"/{container.name}",
+            "Created": format_docker_timestamp(container.created_ns),
+            "Config": container.config,
+            "State": {
+                "Status": container.status,
+                "Running": container.running,
+                "ExitCode": container.exit_code,
+                "StartedAt": format_docker_timestamp(container.started_ns) if container.started_ns else zero,
+                "FinishedAt": format_docker_timestamp(container.finished_ns) if container.finished_ns else zero,
+            },
+        }
+
+    @staticmethod
+    def _since(params: Dict[str, Any]) -> int:
+        seconds, _, fraction = str(params.get("since") or 0).partition(".")
+        return int(seconds) * 1_000_000_000 + int(fraction[:9].ljust(9, "0") or 0)
+
+    @staticmethod
+    def _render(container: _FakeContainer, start: int, end: int, timestamps: bool) -> str:
+        if not timestamps:
+            return "".join(container.lines[start:end])
+        return "".join(f"{format_docker_timestamp(ns)} {line}"
+                       for ns, line in zip(container.stamps[start:end], container.lines[start:end]))
+
+    async def container_logs(self, container_id: str, **params) -> str:
+        container = self._get(container_id)
+        start = bisect.bisect_left(container.stamps, self._since(params))
+        return self._render(container, start, len(container.lines), bool(params.get("timestamps")))
+
+    async def follow_logs(self, container_id: str, **params) -> AsyncIterator[str]:
+        container = self._get(container_id)
+        timestamps = bool(params.get("timestamps"))
+        
+        async def text_iter() -> AsyncIterator[str]:
+            index = bisect.bisect_left(container.stamps, self._since(params))
+            while True:
+                end = len(container.lines)
+                if index < end:
+                    yield self._render(container, index, end, timestamps)
+                    index = end
+                elif container.running or container.status == "created":
+                    await container.changed.wait()
+                else:
+                    return
+        
+        return text_iter()
+
+    async def events(self, filters: Optional[Dict[str, List[str]]] = None) -> AsyncIterator[Dict[str, Any]]:
+        subscription = (asyncio.Queue(), filters or {})
+        self._subscribers.append(subscription)
+        
+        async def event_iter() -> AsyncIterator[Dict[str, Any]]:
+            try:
+                while True:
+                    yield await subscription[0].get()
+            finally:
+                self._subscribers.remove(subscription)
+        
+        return event_iter()
+
+    async def list_containers(self, all: bool = False, filters: Optional[Dict[str, List[str]]] = None) -> List[Dict[str, Any]]:
+        filters = filters or {}
+        names, labels = filters.get("name"), [label.partition("=") for label in filters.get("label", [])]
+        listed = []
+        for container in self._containers.values():
+            if not all and not container.running:
+                continue
+            if names and not any(name in container.name for name in names):
+                continue
+            container_labels = container.config.get("Labels", {})
+            if any(key not in container_labels or (value and container_labels[key] != value) for key, _, value in labels):
+                continue
+            listed.append({
+                "Id": container.id,
+                "Names": [f"/{container.name}"],
+                "Image": container.config.get("Image", ""),
+                "Labels": container_labels,
+                "State": container.status,
+                "Status": "Up" if container.running else f"Exited ({container.exit_code})",
+                "Created": container.created_ns // 1_000_000_000,
+            })
+        return listed
+
+    def _exit(self, container: _FakeContainer, exit_code: int):
+        container.status, container.exit_code, container.finished_ns = "exited", exit_code, time.time_ns()
+        container.wake()
+        self._emit(container, "die", exitCode=str(exit_code))
+
+    async def stop_container(self, container_id: str, timeout: int = 10):
+        container = self._get(container_id)
+        if container.running:
+            container.task.cancel()
+            # Runners do not trap SIGTERM, so they exit as if terminated by it
+            self._exit(container, 143)
+
+    async def remove_container(self, container_id: str, force: bool = False):
+        container = self._get(container_id)
+        if container.running:
+            if not force:
+                raise DockerError(409, f"You cannot remove a running container {container.id}. Stop the container before attempting removal or force remove")
+            container.task.cancel()
+            self._exit(container, 137)
+        del self._containers[container.id], self._names[container.name]
+        self._emit(container, "destroy")
+
+    async def close(self):
+        tasks = [c.task for c in self._containers.values() if c.task is not None and not c.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _replay(self, container: _FakeContainer) -> int:
+        """Print a captured job's log lines with their original spacing, scaled by the replay speed"""
+        if self._replays is None:
+            paths = sorted(os.path.join(self.replay_dir, name) for name in os.listdir(self.replay_dir)
+                           if name.endswith(".log.gz"))
+            self._replays = await asyncio.to_thread(lambda: [read_log_capture(path) for path in paths])
+            if not self._replays:
+                raise ValueError(f"No captures (*.log.gz) in FAKE_REPLAY_DIR {self.replay_dir}")
+        header, entries = random.choice(self._replays)
+        started = time.monotonic()
+        for offset, line in entries:
+            delay = started + offset / self.replay_speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            container.append(line)
+        return header.get("exit_code") or 0
+
+    async def _run(self, container: _FakeContainer):
+        """Replay the runner script's output for the job handed to this container"""
+        try:
+            if self.replay_dir:
+                self._exit(container, await self._replay(container))
+                return
+            env = dict(item.partition("=")[::2] for item in container.config.get("Env", []))
+            if "MAILBOX_JOB" in env:
+                payload = json.loads(base64.b64decode(env["MAILBOX_JOB"]))
+            else:
+                # Pool runners idle until a job has been copied in
+                while "/tmp/job/ready" not in container.files:
+                    await container.changed.wait()
+                payload = json.loads(container.files["/tmp/job/job.json"])
+            verbosity = payload.get("verbosity", 1)
+            
+            def event(kind: str, **fields):
+                container.append(json.dumps({"type": kind, "ts": round(time.time(), 3), **fields}, separators=(",", ":")))
+            
+            def log(message: str, level: str = "info"):
+                if verbosity >= 1:
+                    event("log", level=level, message=message)
+            
+            event("start", protocol=1, domain=payload["domain"], container=container.id[:12])
+            log("Checking IP location...")
+            event("proxy_check", ip=f"203.0.113.{random.randint(1, 254)}", country="US", state="California", city="Los Angeles")
+            log("Importing ExchangeOnlineManagement module...")
+            log(f"Connecting to Exchange Online for domain: {payload['domain']}")
+            await asyncio.sleep(self.auth_delay)
+            code = "".join(random.choices("ABCDEFGHJKLMNPQRSTUVWXYZ23456789", k=9))
+            event("auth_code", code=code, url="https://microsoft.com/devicelogin")
+            await asyncio.sleep(self.login_delay)
+            if verbosity >= 2:
+                container.append("This V3 EXO PowerShell module contains new REST API backed Exchange Online cmdlets")
+            event("authenticated")
+            mailboxes = payload.get("mailboxes", [])
+            event("creating", count=len(mailboxes))
+            concurrency = max(1, payload.get("concurrency", 1))
+            for start in range(0, len(mailboxes), concurrency):
+                await asyncio.sleep(self.mailbox_delay)
+                for email in (f"{name}@{payload['domain']}" for name in mailboxes[start:start + concurrency]):
+                    if random.random() < self.failure_rate:
+                        event("mailbox", email=email, ok=False, error=f"The proxy address \"SMTP:{email}\" is already being used")
+                    else:
+                        event("mailbox", email=email, ok=True)
+            event("completed")
+            exit_code = 0
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            container.append(json.dumps({"type": "error", "ts": round(time.time(), 3), "message": str(e)}, separators=(",", ":")))
+            exit_code = 1
+        self._exit(container, exit_code)
+
+def create_backend(name: str = EXECUTION_BACKEND) -> ExecutionBackend:
+    if name == "docker":
+        if len(DOCKER_HOSTS) > 1:
+            return ShardedBackend([DockerClient(host) for host in DOCKER_HOSTS])
+        return DockerClient(*DOCKER_HOSTS)
+    if name == "fake":
+        return FakeBackend()
+    raise ValueError(f"Unknown EXECUTION_BACKEND: {name}")
+
+# The module-wide execution backend keeps the name of its default, Docker implementation
+docker = create_backend()
 
 def generate_email_variations(first_name: str, last_name: str, count: int) -> List[str]:
     """Generate professional business email variations based on real company patterns"""
@@ -223,12 +1295,8 @@ def generate_email_variations(first_name: str, last_name: str, count: int) -> Li
     
     return variations[:count]
 
-@app.post("/create-mailboxes", response_model=MailboxResponse)
-async def create_mailboxes(request: MailboxRequest):
-    """
-    Create mailboxes for a domain in an isolated container.
-    Each domain gets its own container for proxy isolation.
-    """
+def prepare_job(request: MailboxRequest) -> "QueuedJob":
+    """Validate a request and build its runner payload"""
     
     # Parse sender name
     name_parts = request.sender_name.strip().split()
@@ -238,11 +1306,16 @@ async def create_mailboxes(request: MailboxRequest):
     first_name = name_parts[0]
     last_name = " ".join(name_parts[1:])
     
+    if request.callback_url:
+        url = urlsplit(request.callback_url)
+        if url.scheme not in ("http", "https") or not url.hostname:
+            raise HTTPException(400, "callback_url must be an http(s) URL")
+    
     # Generate email variations
     variations = generate_email_variations(first_name, last_name, request.variations)
     
-    # Create PowerShell script for this domain
-    ps_script = create_powershell_script(
+    # Create the runner job payload for this domain
+    job_payload = create_job_payload(
         variations=variations,
         domain=request.domain,
         password=request.password,
@@ -250,269 +1323,813 @@ async def create_mailboxes(request: MailboxRequest):
         last_name=last_name
     )
     
-    # Start isolated container for this domain
-    container_id = await start_domain_container(
+    return QueuedJob((-request.priority, 0), job_container_name(request.domain), request.domain,
+                     job_payload, request.proxy_endpoint)
+
+def record_job(request: MailboxRequest, job: "QueuedJob"):
+    store.record(
+        job.name,
         domain=request.domain,
-        ps_script=ps_script,
-        proxy_endpoint=request.proxy_endpoint
+        sender_name=request.sender_name,
+        variations=request.variations,
+        proxy=redact_proxy(request.proxy_endpoint),
+        callback_url=request.callback_url,
+        status="container_started",
+        submitted_at=time.time(),
     )
+    if request.callback_url:
+        webhooks.register(job.name, request.callback_url)
+
+def queue_full(e: "QueueFullError") -> HTTPException:
+    return HTTPException(429, str(e), headers={"Retry-After": str(QUEUE_RETRY_AFTER)})
+
+@app.post("/create-mailboxes", response_model=MailboxResponse)
+async def create_mailboxes(request: MailboxRequest):
+    """
+    Create mailboxes for a domain in an isolated container.
+    Each domain gets its own container for proxy isolation.
+    """
+    with span("prepare_job", variations=request.variations):
+        job = prepare_job(request)
+    container_id = job.name
+    
+    # Start isolated container for this domain, or queue it until a slot frees up.
+    # Requests turned away with 429 leave no trace in the job store.
+    try:
+        status = scheduler.admit([job])[0]
+    except QueueFullError as e:
+        raise queue_full(e)
+    record_job(request, job)
+    if status == "queued":
+        store.record(container_id, status="queued")
+    else:
+        try:
+            with span("scheduler.launch"):
+                await scheduler.launch(container_id, job.domain, job.payload, job.proxy_endpoint)
+        except Exception:
+            store.record(container_id, status="failed", finished_at=time.time())
+            webhooks.observe(container_id, "failed")
+            raise
     
     return MailboxResponse(
         success=True,
         container_id=container_id,
-        status="container_started",
-        auth_url="https://microsoft.com/devicelogin"
+        status=status,
+        auth_url="https://microsoft.com/devicelogin",
+        queue_position=scheduler.position(container_id)
     )
 
-@app.get("/status/{container_id}", response_model=MailboxResponse)
-async def get_container_status(container_id: str):
+@app.post("/create-mailboxes/batch", response_model=BatchMailboxResponse)
+async def create_mailboxes_batch(request: BatchMailboxRequest):
     """
-    Get status of a specific domain container.
-    Returns auth code when available, final results when complete.
+    Create mailboxes for many domains in one request.
+    The whole batch is validated and admitted at once; container starts run concurrently.
     """
+    if not request.jobs:
+        raise HTTPException(400, "Batch must contain at least one job")
+    if len(request.jobs) > BATCH_MAX_JOBS:
+        raise HTTPException(400, f"Batch is limited to {BATCH_MAX_JOBS} jobs")
+    
+    batch = []
+    for index, item in enumerate(request.jobs):
+        try:
+            batch.append(prepare_job(item))
+        except HTTPException as e:
+            raise HTTPException(e.status_code, f"jobs[{index}]: {e.detail}")
     
     try:
-        # Get container logs
-        result = subprocess.run(
-            ["docker", "logs", container_id],
-            capture_output=True,
-            text=True,
-            timeout=30
+        statuses = scheduler.admit(batch)
+    except QueueFullError as e:
+        raise queue_full(e)
+    for item, job, status in zip(request.jobs, batch, statuses):
+        record_job(item, job)
+        if status == "queued":
+            store.record(job.name, status="queued")
+    
+    # Fan out the container starts of every job that got a slot
+    launches = [(job, scheduler.launch(job.name, job.domain, job.payload, job.proxy_endpoint))
+                for job, status in zip(batch, statuses) if status == "container_started"]
+    outcomes = await asyncio.gather(*(launch for _, launch in launches), return_exceptions=True)
+    errors = {}
+    for (job, _), outcome in zip(launches, outcomes):
+        if isinstance(outcome, BaseException):
+            errors[job.name] = str(outcome)
+            store.record(job.name, status="failed", finished_at=time.time())
+            webhooks.observe(job.name, "failed")
+    
+    results = [
+        MailboxResponse(
+            success=job.name not in errors,
+            container_id=job.name,
+            status="failed" if job.name in errors else status,
+            queue_position=scheduler.position(job.name),
+            error=errors.get(job.name)
         )
-        
-        if result.returncode != 0:
-            raise HTTPException(404, f"Container {container_id} not found")
-        
-        logs = result.stdout + result.stderr
-        
-        # Parse current status from logs
-        status = parse_container_status(logs)
-        auth_code = extract_auth_code(logs)
-        created, failed = parse_final_results(logs)
-        
-        # Check if container is still running
-        status_result = subprocess.run(
-            ["docker", "ps", "-q", "-f", f"name={container_id}"],
-            capture_output=True,
-            text=True
+        for job, status in zip(batch, statuses)
+    ]
+    return BatchMailboxResponse(success=not errors, jobs=results)
+
+async def job_status(container_id: str, listed: Optional[Dict[str, Any]] = None, include_logs: bool = False,
+                     logs_offset: int = 0, logs_limit: Optional[int] = None) -> MailboxResponse:
+    """Build the status of one job; `listed` is its entry from a shared container listing, if any"""
+    # Jobs still waiting for a slot have no container yet
+    pending = scheduler.state(container_id)
+    if pending is not None:
+        return MailboxResponse(
+            success=True,
+            container_id=container_id,
+            status=pending,
+            queue_position=scheduler.position(container_id)
         )
-        
-        is_running = bool(status_result.stdout.strip())
-        
-        # Determine overall status
-        if "AUTH_CODE:" in logs and not auth_code:
-            # Extract auth code
-            auth_code = extract_auth_code(logs)
-            current_status = "waiting_for_auth"
-        elif is_authenticated_from_logs(logs):
-            current_status = "creating_mailboxes"
-        elif "AUTH_TIMEOUT:" in logs:
-            current_status = "auth_timeout"
-        elif not is_running:
-            if created or failed:
-                current_status = "completed"
-            else:
-                current_status = "failed"
-        else:
-            current_status = "starting"
-        
-        ip_info = extract_ip_info(logs)
-        
+    
+    job = jobs.get(container_id)
+    if job is not None and (job.synced or (watcher.live and job.following)):
+        # Finished jobs and jobs the watcher keeps current need no Docker round trip
+        is_running = job.running
+    elif job is None and (record := await store.get(container_id)) and record["finished_at"] is not None:
+        # Historical jobs are answered from the job store, even after their container is gone
         return MailboxResponse(
             success=True,
             container_id=container_id,
-            status=current_status,
-            auth_code=auth_code,
-            created_mailboxes=created,
-            failed_mailboxes=failed,
-            logs=logs,
-            ip_info=ip_info
+            status=record["status"] or "failed",
+            auth_code=record["auth_code"],
+            created_mailboxes=record["created_mailboxes"] or [],
+            failed_mailboxes=record["failed_mailboxes"] or [],
+            ip_info=record["ip_info"]
         )
+    else:
+        # Fetch only the log lines written since the last poll; concurrent and repeated polls share one fetch
+        try:
+            with span("status_cache.get"):
+                job, is_running = await status_cache.get(container_id, lambda: tail_container_logs(container_id, listed))
+        except DockerError as e:
+            if e.status == 404:
+                raise HTTPException(404, f"Container {container_id} not found")
+            raise
+    
+    with span("parse.result"):
+        parsed = job.parser.result(is_running)
+    logs, offset = job.log_range(logs_offset, logs_limit) if include_logs else (None, None)
+    
+    return MailboxResponse(
+        success=True,
+        container_id=container_id,
+        status=parsed.status,
+        auth_code=parsed.auth_code,
+        created_mailboxes=parsed.created,
+        failed_mailboxes=parsed.failed,
+        logs=logs,
+        ip_info=parsed.ip_info,
+        logs_offset=offset,
+        logs_size=job.log_dropped + job.log_size if include_logs else None
+    )
+
+def encode_response(request: Request, model: BaseModel) -> Response:
+    """Serialize a response with an ETag, answering 304 for an unchanged body and compressing large ones"""
+    body = model.model_dump_json().encode()
+    etag = f'W/"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    if len(body) >= COMPRESS_MIN_SIZE:
+        accepted = {part.split(";")[0].strip() for part in request.headers.get("accept-encoding", "").lower().split(",")}
+        if brotli is not None and "br" in accepted:
+            body, headers["Content-Encoding"] = brotli.compress(body, quality=4), "br"
+        elif "gzip" in accepted:
+            body, headers["Content-Encoding"] = gzip.compress(body, compresslevel=5), "gzip"
+    return Response(body, media_type="application/json", headers=headers)
+
+@app.get("/status/{container_id}", response_model=MailboxResponse)
+async def get_container_status(container_id: str, request: Request, wait_for: Optional[str] = None,
+                               timeout: float = 30, include_logs: bool = False, logs_offset: int = 0,
+                               logs_limit: Optional[int] = None):
+    """
+    Get status of a specific domain container.
+    Returns auth code when available, final results when complete.
+    With `wait_for=auth_code|completed` the request is held until that condition holds or `timeout` seconds pass.
+    Logs are only returned with `include_logs`, optionally limited to `logs_limit` characters from
+    `logs_offset` (negative: counted from the end).
+    """
+    if wait_for not in (None, "auth_code", "completed"):
+        raise HTTPException(400, "wait_for must be 'auth_code' or 'completed'")
+    if logs_limit is not None and logs_limit < 0:
+        raise HTTPException(400, "logs_limit must not be negative")
+    
+    try:
+        if wait_for is not None:
+            with span("wait_for_status", wait_for=wait_for):
+                await wait_for_status(container_id, wait_for, min(max(timeout, 0), STATUS_WAIT_MAX_TIMEOUT))
+        with span("job_status"):
+            status = await job_status(container_id, include_logs=include_logs, logs_offset=logs_offset, logs_limit=logs_limit)
+        with span("serialize"):
+            return encode_response(request, status)
         
-    except subprocess.TimeoutExpired:
+    except HTTPException:
+        raise
+    except asyncio.TimeoutError:
         raise HTTPException(408, "Timeout getting container status")
     except Exception as e:
         raise HTTPException(500, f"Error checking status: {str(e)}")
 
-@app.delete("/containers/{container_id}")
-async def cleanup_container(container_id: str):
-    """Clean up a specific container"""
-    try:
-        # Stop and remove container
-        subprocess.run(["docker", "stop", container_id], timeout=10)
-        subprocess.run(["docker", "rm", container_id], timeout=10)
-        
-        return {"success": True, "message": f"Container {container_id} cleaned up"}
-    except Exception as e:
-        raise HTTPException(500, f"Error cleaning up container: {str(e)}")
+async def wait_for_status(container_id: str, wait_for: str, timeout: float):
+    """Block until a job has an auth code / is finished, woken by published job changes"""
+    deadline = time.monotonic() + timeout
+    while True:
+        status = await job_status(container_id, include_logs=False)
+        if status.status in TERMINAL_STATUSES or (wait_for == "auth_code" and status.auth_code):
+            return
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        # Without a watcher nothing publishes changes, so re-check on a timer
+        await job_updates.wait(container_id, remaining if watcher.live else min(remaining, STREAM_POLL_INTERVAL))
 
-@app.get("/containers")
-async def list_active_containers():
-    """List all active mailbox creator containers"""
+TERMINAL_STATUSES = {"completed", "failed", "auth_timeout", "cancelled"}
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.get("/status/{container_id}/stream")
+async def stream_container_status(container_id: str):
+    """
+    Server-Sent Events stream of a job's state transitions.
+    Sends a `status` event whenever status, auth code or IP info change, a `mailboxes` event with
+    newly parsed created/failed mailboxes, and `end` once the job reached a final status.
+    """
     try:
-        result = subprocess.run(
-            ["docker", "ps", "--filter", "name=mailbox-creator-", "--format", "table {{.Names}}\t{{.Status}}\t{{.Ports}}"],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
-        
-        return {"containers": result.stdout.split('\n')[1:]}  # Skip header
+        first = await job_status(container_id, include_logs=False)
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(500, f"Error listing containers: {str(e)}")
-
-def create_powershell_script(variations: List[str], domain: str, password: str, first_name: str, last_name: str) -> str:
-    """Create PowerShell script for isolated domain processing"""
-    
-    mailbox_commands = []
-    display_name = f"{first_name} {last_name}"
+        raise HTTPException(500, f"Error checking status: {str(e)}")
     
-    for variation in variations:
-        email = f"{variation}@{domain}"
-        mailbox_commands.append(f"""
-try {{
-    $result = New-Mailbox -Name "{variation}" -DisplayName "{display_name}" -PrimarySmtpAddress "{email}" -Shared -Password (ConvertTo-SecureString "{password}" -AsPlainText -Force) -ResetPasswordOnNextLogon $false -ErrorAction Stop
-    Write-Host "SUCCESS: Created mailbox {email}" -ForegroundColor Green
-}} catch {{
-    Write-Host "FAILED: Could not create {email} - $_" -ForegroundColor Red
-}}""")
+    async def events() -> AsyncIterator[str]:
+        current, state, created, failed = first, None, 0, 0
+        while True:
+            snapshot = {
+                "status": current.status,
+                "auth_code": current.auth_code,
+                "auth_url": current.auth_url,
+                "ip_info": current.ip_info,
+                "queue_position": current.queue_position,
+            }
+            if snapshot != state:
+                state = snapshot
+                yield sse_event("status", {"container_id": container_id, **snapshot})
+            new_created = (current.created_mailboxes or [])[created:]
+            new_failed = (current.failed_mailboxes or [])[failed:]
+            if new_created or new_failed:
+                created += len(new_created)
+                failed += len(new_failed)
+                yield sse_event("mailboxes", {"container_id": container_id, "created": new_created, "failed": new_failed})
+            if current.status in TERMINAL_STATUSES:
+                yield sse_event("end", {"container_id": container_id, "status": current.status})
+                return
+            
+            # Wake up on the next published change; without a watcher nothing publishes, so re-check on a timer
+            interval = STREAM_KEEPALIVE_INTERVAL if watcher.live else STREAM_POLL_INTERVAL
+            if not await job_updates.wait(container_id, interval) and watcher.live:
+                yield ": keep-alive\n\n"
+            try:
+                current = await job_status(container_id, include_logs=False)
+            except Exception as e:
+                detail = e.detail if isinstance(e, HTTPException) else str(e)
+                yield sse_event("error", {"container_id": container_id, "error": detail})
+                return
     
-    script = f"""
-# Isolated Mailbox Creation Script for {domain}
-Write-Host "=== STARTING MAILBOX CREATION FOR {domain.upper()} ===" -ForegroundColor Cyan
-Write-Host "Container ID: $env:HOSTNAME" -ForegroundColor Gray
-Write-Host "Timestamp: $(Get-Date)" -ForegroundColor Gray
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
-# IP Check for Proxy Verification
-Write-Host "=== PROXY VERIFICATION ===" -ForegroundColor Yellow
-try {{
-    Write-Host "Checking IP location..." -ForegroundColor Yellow
-    
-    # Get IP info from ipinfo.io (includes IP, country, region)
-    $ipInfo = Invoke-RestMethod -Uri "https://ipinfo.io/json" -TimeoutSec 15 -ErrorAction Stop
+@app.post("/status/batch", response_model=BatchMailboxResponse)
+async def get_batch_status(request: BatchStatusRequest, http_request: Request):
+    """
+    Get the status of many containers at once.
+    Jobs not served from memory or the job store share one container listing; a failing item does not fail the batch.
+    """
+    if len(request.container_ids) > BATCH_MAX_JOBS:
+        raise HTTPException(400, f"Batch is limited to {BATCH_MAX_JOBS} jobs")
+    container_ids = list(dict.fromkeys(request.container_ids))
     
-    $ip = $ipInfo.ip
-    $country = $ipInfo.country
-    $state = $ipInfo.region
-    $city = $ipInfo.city
+    # One listing answers "does it exist and is it running" for every job that needs Docker
+    def needs_docker(name: str) -> bool:
+        job = jobs.get(name)
+        return scheduler.state(name) is None and not (job is not None and (job.synced or (watcher.live and job.following)))
     
-    # Output on single line for easy parsing
-    Write-Host "PROXY_CHECK: IP=$ip | Country=$country | State=$state | City=$city" -ForegroundColor Green
+    wanted = {name for name in container_ids if needs_docker(name)}
+    listing: Optional[Dict[str, Dict[str, Any]]] = None
+    if wanted:
+        try:
+            containers = await docker.list_containers(all=True, filters={"name": sorted(wanted)})
+            listing = {c["Names"][0].lstrip("/"): c for c in containers}
+        except Exception as e:
+            # Fall back to per-job lookups
+            print(f"DEBUG: Batch status listing failed: {e}")
     
-    # Also output individual components for parsing
-    Write-Host "IP_ADDRESS: $ip" -ForegroundColor White
-    Write-Host "COUNTRY: $country" -ForegroundColor White
-    Write-Host "STATE: $state" -ForegroundColor White
-    Write-Host "CITY: $city" -ForegroundColor White
+    semaphore = asyncio.Semaphore(DOCKER_POOL_SIZE)
     
-}} catch {{
-    Write-Host "PROXY_CHECK: Failed to get IP info - $_" -ForegroundColor Red
+    async def item(container_id: str) -> MailboxResponse:
+        async with semaphore:
+            try:
+                listed = listing.get(container_id) if listing is not None else None
+                if listed is None and listing is not None and container_id in wanted and await store.get(container_id) is None:
+                    raise HTTPException(404, f"Container {container_id} not found")
+                return await job_status(container_id, listed, include_logs=request.include_logs)
+            except HTTPException as e:
+                error, status = e.detail, "not_found" if e.status_code == 404 else "error"
+            except asyncio.TimeoutError:
+                error, status = "Timeout getting container status", "error"
+            except Exception as e:
+                error, status = f"Error checking status: {str(e)}", "error"
+            return MailboxResponse(success=False, container_id=container_id, status=status, error=error)
     
-    # Fallback - try simpler IP check
-    try {{
-        $fallbackIP = Invoke-RestMethod -Uri "https://api64.ipify.org" -TimeoutSec 10 -ErrorAction Stop
-        Write-Host "PROXY_CHECK: IP=$fallbackIP | Country=Unknown | State=Unknown | City=Unknown" -ForegroundColor Yellow
-        Write-Host "IP_ADDRESS: $fallbackIP" -ForegroundColor White
-    }} catch {{
-        Write-Host "PROXY_CHECK: Complete IP check failure - $_" -ForegroundColor Red
-    }}
-}}
-
-# Install and Import Exchange Online module
-Write-Host "Installing ExchangeOnlineManagement module..." -ForegroundColor Yellow
-Install-Module -Name ExchangeOnlineManagement -Force -AllowClobber -Scope CurrentUser
+    results = await asyncio.gather(*(item(container_id) for container_id in container_ids))
+    return encode_response(http_request, BatchMailboxResponse(success=all(r.success for r in results), jobs=results))
 
-Write-Host "Importing ExchangeOnlineManagement module..." -ForegroundColor Yellow
-Import-Module ExchangeOnlineManagement -Force
-
-# Connect to Exchange Online with device authentication
-Write-Host "Connecting to Exchange Online for domain: {domain}" -ForegroundColor Yellow
-Write-Host "This will generate an authentication code..." -ForegroundColor Yellow
+async def cleanup_job(container_id: str, grace: int = 10, remove: bool = True) -> str:
+    """Cancel a queued job, or stop (and remove) its container; returns what was done"""
+    if scheduler.cancel(container_id):
+        store.record(container_id, status="cancelled", finished_at=time.time())
+        webhooks.observe(container_id, "cancelled")
+        job_updates.notify(container_id)
+        return "cancelled"
+    if remove:
+        await remove_job_container(container_id, grace=grace)
+        return "removed"
+    await docker.stop_container(container_id, timeout=grace)
+    await tail_container_logs(container_id)
+    return "stopped"
 
-try {{
-    Write-Host "Connecting to Exchange Online..." -ForegroundColor Yellow
+@app.delete("/containers/{container_id}")
+async def cleanup_container(container_id: str, grace: int = Query(10, ge=0)):
+    """Clean up a specific container"""
+    try:
+        if await cleanup_job(container_id, grace=grace) == "cancelled":
+            return {"success": True, "message": f"Queued job {container_id} cancelled"}
+        
+        return {"success": True, "message": f"Container {container_id} cleaned up"}
+    except DockerError as e:
+        if e.status == 404:
+            raise HTTPException(404, f"Container {container_id} not found")
+        raise HTTPException(500, f"Error cleaning up container: {e.message}")
+    except Exception as e:
+        raise HTTPException(500, f"Error cleaning up container: {str(e)}")
+
+@app.post("/containers/cleanup")
+async def bulk_cleanup_containers(request: BulkCleanupRequest):
+    """
+    Stop and remove many jobs at once, chosen by id list or by domain / status / age filters.
+    Runs concurrently with a bounded number of workers and reports the outcome per job.
+    """
+    if request.container_ids is not None:
+        targets = list(dict.fromkeys(request.container_ids))
+    elif request.domain or request.status or request.min_age is not None or request.max_age is not None:
+        # Only jobs that still have a container or a queue slot can be cleaned up
+        await store.flush()
+        now = time.time()
+        records, _ = await store.search(
+            statuses=request.status,
+            domain=request.domain,
+            submitted_before=now - request.min_age if request.min_age is not None else None,
+            submitted_after=now - request.max_age if request.max_age is not None else None,
+            limit=-1,
+        )
+        existing = {
+            c["Names"][0].lstrip("/")
+            for c in await docker.list_containers(all=True, filters={"name": [JOB_NAME_PREFIX]})
+        }
+        targets = [r["name"] for r in records if r["name"] in existing or scheduler.state(r["name"]) == "queued"]
+    else:
+        raise HTTPException(400, "Give container_ids or at least one of domain, status, min_age, max_age")
+    
+    semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+    
+    async def cleanup(container_id: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                action = await cleanup_job(container_id, grace=request.grace, remove=request.remove)
+                return {"container_id": container_id, "success": True, "action": action}
+            except DockerError as e:
+                error = "not found" if e.status == 404 else e.message
+            except Exception as e:
+                error = str(e)
+            return {"container_id": container_id, "success": False, "error": error}
     
-    # Connect to Exchange Online - this will handle auth code display and waiting automatically
-    Connect-ExchangeOnline -Device
+    results = await asyncio.gather(*(cleanup(container_id) for container_id in targets))
+    return {"success": all(r["success"] for r in results), "count": len(results), "results": results}
+
+@app.get("/containers")
+async def list_active_containers(status: Optional[str] = None, domain: Optional[str] = None, active: bool = True,
+                                 min_age: Optional[float] = None, max_age: Optional[float] = None,
+                                 host: Optional[str] = None, limit: int = 100, offset: int = 0):
+    """
+    List mailbox creator jobs, newest first.
+    Filters: comma-separated `status`, exact `domain`, `active` (not finished yet), `min_age`/`max_age`
+    in seconds since submission and the Docker `host` a job runs on. Paginated with `limit`/`offset`.
+    """
+    if not 1 <= limit <= CONTAINERS_PAGE_MAX or offset < 0:
+        raise HTTPException(400, f"limit must be 1-{CONTAINERS_PAGE_MAX} and offset non-negative")
+    try:
+        # Filtering and paging happen in the job store; only the page is joined with live state
+        await store.flush()
+        now = time.time()
+        records, total = await store.search(
+            statuses=[s.strip() for s in status.split(",") if s.strip()] if status else None,
+            domain=domain,
+            active=active,
+            submitted_before=now - min_age if min_age is not None else None,
+            submitted_after=now - max_age if max_age is not None else None,
+            host=host,
+            limit=limit,
+            offset=offset,
+        )
+        
+        # Container state: from the watcher's job table, otherwise one labelled listing for the page
+        containers: Optional[Dict[str, Dict[str, Any]]] = None
+        if not watcher.live and records:
+            listed = await docker.list_containers(
+                all=True, filters={"label": [LABEL_ROLE], "name": [record["name"] for record in records]}
+            )
+            containers = {c["Names"][0].lstrip("/"): c for c in listed}
+        
+        page = []
+        for record in records:
+            name = record["name"]
+            job = jobs.get(name)
+            if job is not None:
+                parsed = job.parser.result(job.running)
+                state = dict(status=parsed.status, auth_code=parsed.auth_code,
+                             created=len(parsed.created), failed=len(parsed.failed))
+            else:
+                state = dict(status=record["status"], auth_code=record["auth_code"],
+                             created=len(record["created_mailboxes"] or []), failed=len(record["failed_mailboxes"] or []))
+            if containers is not None:
+                container = containers.get(name, {}).get("State")
+            elif job is not None:
+                container = "running" if job.running else "exited"
+            else:
+                container = None
+            submitted_at = record["submitted_at"] or record["started_at"]
+            page.append({
+                "container_id": name,
+                "domain": record["domain"],
+                **state,
+                "container": container,
+                "host": record["host"],
+                "submitted_at": submitted_at,
+                "started_at": record["started_at"],
+                "finished_at": record["finished_at"],
+                "age": round(now - submitted_at, 1) if submitted_at else None,
+            })
+        
+        return {"containers": page, "total": total, "limit": limit, "offset": offset}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Error listing containers: {str(e)}")
+
+# Fixed runner script shared by every job. It reads a JSON job payload (see create_job_payload)
+# from $env:MAILBOX_JOB (base64) or /tmp/job/job.json and creates the mailboxes in one session.
+RUNNER_SCRIPT = r"""
+if ($env:MAILBOX_JOB) {
+    $jobJson = [System.Text.Encoding]::UTF8.GetString([System.Convert]::FromBase64String($env:MAILBOX_JOB))
+} else {
+    $jobJson = Get-Content -Raw -Path /tmp/job/job.json
+}
+$job = $jobJson | ConvertFrom-Json
+$domain = $job.domain
+$verbosity = if ($null -ne $job.verbosity) { [int]$job.verbosity } else { 1 }
+
+# Every line the API parses is a compact JSON event: {"type":...,"ts":<unix seconds>,...}
+# Written straight to stdout so it bypasses PowerShell's formatting and stream redirection
+function Send-JobEvent([string]$Type, [hashtable]$Data = @{}) {
+    $record = [ordered]@{ type = $Type; ts = [DateTimeOffset]::UtcNow.ToUnixTimeMilliseconds() / 1000 }
+    foreach ($key in $Data.Keys) { $record[$key] = $Data[$key] }
+    [Console]::Out.WriteLine(($record | ConvertTo-Json -Compress -Depth 3))
+}
+
+function Write-JobLog([string]$Message, [string]$Level = "info") {
+    if ($verbosity -ge 1) { Send-JobEvent log @{ level = $Level; message = $Message } }
+}
+
+if ($verbosity -lt 2) {
+    $ProgressPreference = 'SilentlyContinue'
+}
+
+# Runners started without a proxy (warm pool) are switched to the job's proxy in-session
+if ($job.proxy -and -not $env:HTTPS_PROXY) {
+    $env:ALL_PROXY = $job.proxy
+    $env:HTTP_PROXY = $job.proxy
+    $env:HTTPS_PROXY = $job.proxy
+    $proxyUri = [Uri]$job.proxy
+    $webProxy = [System.Net.WebProxy]::new("$($proxyUri.Scheme)://$($proxyUri.Host):$($proxyUri.Port)")
+    if ($proxyUri.UserInfo) {
+        $proxyUser, $proxyPass = $proxyUri.UserInfo.Split(':', 2)
+        $webProxy.Credentials = [System.Net.NetworkCredential]::new([Uri]::UnescapeDataString($proxyUser), [Uri]::UnescapeDataString($proxyPass))
+    }
+    [System.Net.Http.HttpClient]::DefaultProxy = $webProxy
+    [System.Net.WebRequest]::DefaultWebProxy = $webProxy
+}
+
+# Isolated Mailbox Creation Script
+Send-JobEvent start @{ protocol = 1; domain = $domain; container = $env:HOSTNAME }
+
+# IP Check for Proxy Verification
+try {
+    Write-JobLog "Checking IP location..."
+    
+    # Get IP info from ipinfo.io (includes IP, country, region)
+    $ipInfo = Invoke-RestMethod -Uri "https://ipinfo.io/json" -TimeoutSec 15 -ErrorAction Stop
+    Send-JobEvent proxy_check @{ ip = $ipInfo.ip; country = $ipInfo.country; state = $ipInfo.region; city = $ipInfo.city }
+    
+} catch {
+    Write-JobLog "Failed to get IP info - $_" "warning"
+    
+    # Fallback - try simpler IP check
+    try {
+        $fallbackIP = Invoke-RestMethod -Uri "https://api64.ipify.org" -TimeoutSec 10 -ErrorAction Stop
+        Send-JobEvent proxy_check @{ ip = "$fallbackIP"; country = "Unknown"; state = "Unknown"; city = "Unknown" }
+    } catch {
+        Send-JobEvent proxy_check @{ error = "Complete IP check failure - $_" }
+    }
+}
+
+# Install and Import Exchange Online module (the runner image ships it preinstalled)
+if (-not (Get-Module -ListAvailable -Name ExchangeOnlineManagement)) {
+    Write-JobLog "Installing ExchangeOnlineManagement module..."
+    Install-Module -Name ExchangeOnlineManagement -Force -AllowClobber -Scope CurrentUser *>&1 | Where-Object { $verbosity -ge 2 } | Out-Host
+}
+
+Write-JobLog "Importing ExchangeOnlineManagement module..."
+Import-Module ExchangeOnlineManagement *>&1 | Where-Object { $verbosity -ge 2 } | Out-Host
+
+function New-JobMailbox($name, $job) {
+    $email = "$name@$($job.domain)"
+    try {
+        $password = ConvertTo-SecureString $job.password -AsPlainText -Force
+        $result = New-Mailbox -Name $name -DisplayName $job.display_name -PrimarySmtpAddress $email -Shared -Password $password -ResetPasswordOnNextLogon $false -ErrorAction Stop
+        Send-JobEvent mailbox @{ email = $email; ok = $true }
+    } catch {
+        Send-JobEvent mailbox @{ email = $email; ok = $false; error = "$_" }
+    }
+}
+
+# Connect to Exchange Online with device authentication
+Write-JobLog "Connecting to Exchange Online for domain: $domain"
+
+try {
+    # The device code prompt is turned into an auth_code event; module banners only pass at verbosity 2.
+    # Should the prompt reach the console directly instead, the API still picks the code up from the raw line.
+    Connect-ExchangeOnline -Device -ShowBanner:($verbosity -ge 2) *>&1 | ForEach-Object {
+        $text = "$_"
+        if ($text -match 'enter the code ([A-Z0-9]{6,12}) to authenticate') {
+            Send-JobEvent auth_code @{ code = $Matches[1]; url = "https://microsoft.com/devicelogin" }
+        } elseif ($verbosity -ge 2) {
+            Write-Host $text
+        } elseif ($_ -is [System.Management.Automation.WarningRecord] -or $_ -is [System.Management.Automation.ErrorRecord]) {
+            Write-JobLog $text "warning"
+        }
+    }
     
     # If we reach here, authentication was successful
-    Write-Host "Authentication successful!" -ForegroundColor Green
+    Send-JobEvent authenticated
     
     # Authentication successful - now create mailboxes
-    Write-Host ""
-    Write-Host "=== CREATING MAILBOXES ===" -ForegroundColor Green
-    Write-Host "Creating {len(variations)} mailboxes for domain: {domain}" -ForegroundColor Cyan
-    Write-Host ""
+    Send-JobEvent creating @{ count = $job.mailboxes.Count }
     
-    {chr(10).join(mailbox_commands)}
+    # New-Mailbox is a proxy function from the temporary module Connect-ExchangeOnline imported into
+    # this runspace only. Workers import that module themselves; any worker that still cannot run
+    # New-Mailbox hands its mailbox back to be created sequentially in this runspace.
+    $sequential = [System.Collections.Concurrent.ConcurrentQueue[string]]::new()
+    $concurrency = [int]$job.concurrency
+    $sessionModule = (Get-Command New-Mailbox -ErrorAction SilentlyContinue).Module.Path
+    if ($concurrency -gt 1 -and $job.mailboxes.Count -gt 1 -and $sessionModule) {
+        $newJobMailbox = ${function:New-JobMailbox}.ToString()
+        $sendJobEvent = ${function:Send-JobEvent}.ToString()
+        $job.mailboxes | ForEach-Object -ThrottleLimit $concurrency -Parallel {
+            ${function:New-JobMailbox} = $using:newJobMailbox
+            ${function:Send-JobEvent} = $using:sendJobEvent
+            if (-not (Get-Command New-Mailbox -ErrorAction SilentlyContinue)) {
+                Import-Module $using:sessionModule -ErrorAction SilentlyContinue *>$null
+            }
+            if ((Get-Command New-Mailbox -ErrorAction SilentlyContinue) -and (Get-ConnectionInformation)) {
+                New-JobMailbox $_ $using:job
+            } else {
+                ($using:sequential).Enqueue($_)
+            }
+        }
+    } else {
+        $job.mailboxes | ForEach-Object { $sequential.Enqueue($_) }
+    }
+    foreach ($name in $sequential) {
+        New-JobMailbox $name $job
+    }
     
-    Write-Host ""
-    Write-Host "=== MAILBOX CREATION COMPLETED ===" -ForegroundColor Green
-    Write-Host "Check the SUCCESS/FAILED messages above for individual results" -ForegroundColor Cyan
+    Send-JobEvent completed
     
-}} catch {{
-    Write-Host "ERROR: Failed to connect to Exchange Online: $_" -ForegroundColor Red
+} catch {
+    Send-JobEvent error @{ message = "Failed to connect to Exchange Online: $_" }
     exit 1
-}}
+}
 """
-    
-    return script
 
-async def start_domain_container(domain: str, ps_script: str, proxy_endpoint: Optional[str] = None) -> str:
+def create_job_payload(variations: List[str], domain: str, password: str, first_name: str, last_name: str,
+                       concurrency: int = MAILBOX_CONCURRENCY, verbosity: int = RUNNER_VERBOSITY) -> Dict[str, Any]:
+    """Create the job payload the runner script consumes for isolated domain processing"""
+    return {
+        "domain": domain,
+        "display_name": f"{first_name} {last_name}",
+        "password": password,
+        "mailboxes": variations,
+        "concurrency": concurrency,
+        "verbosity": verbosity,
+    }
+
+def runner_command(wait_for_job: bool = False) -> str:
+    """Wrap the runner script so all of its output goes to the container logs"""
+    # Idle runners preload the Exchange module, then wait for a job to be copied into /tmp/job
+    preamble = """
+Import-Module ExchangeOnlineManagement -ErrorAction SilentlyContinue
+while (-not (Test-Path /tmp/job/ready)) { Start-Sleep -Milliseconds 200 }
+""" if wait_for_job else ""
+    return f"""{preamble}
+# Write script to temp file inside container
+$scriptContent = @'
+{RUNNER_SCRIPT}
+'@
+
+$scriptPath = "/tmp/mailbox_script.ps1"
+$scriptContent | Out-File -FilePath $scriptPath -Encoding UTF8
+
+# Script output already goes to the container's stdout; teeing it there again would log every line twice
+& $scriptPath 2>&1
+exit $LASTEXITCODE
+"""
+
+RUNNER_COMMAND = runner_command()
+RUNNER_IDLE_COMMAND = runner_command(wait_for_job=True)
+
+class RunnerPool:
+    """Pre-started idle runner containers that jobs claim instead of cold-starting one"""
+
+    def __init__(self, client: ExecutionBackend, size: int = RUNNER_POOL_SIZE, image: str = RUNNER_IMAGE):
+        self.docker = client
+        self.size = size
+        self.image = image
+        self._idle: List[str] = []
+        # Runners handed to jobs that a listing may still show under their pool name
+        self._claimed: set = set()
+        self._refill = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    def start(self):
+        if self.size > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Idle runners are left running and adopted again on the next start
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def claim(self, job_name: str, job_payload: Dict[str, Any], proxy_endpoint: Optional[str]) -> bool:
+        """Hand a job payload to an idle runner and rename it to the job's container name"""
+        while self._idle:
+            container_id = self._idle.pop(0)
+            self._claimed.add(container_id)
+            self._refill.set()
+            payload = {**job_payload, "proxy": proxy_endpoint} if proxy_endpoint else job_payload
+            try:
+                # Rename first so the job's output is attributed to it from the first line
+                await self.docker.rename_container(container_id, job_name)
+                await self.docker.put_archive(container_id, "/tmp", {
+                    "job/job.json": json.dumps(payload).encode(),
+                    "job/ready": b"",
+                })
+                print(f"DEBUG: Claimed idle runner {container_id[:12]} for {job_name}")
+                return True
+            except Exception as e:
+                print(f"DEBUG: Idle runner {container_id[:12]} unusable: {e}")
+                try:
+                    await self.docker.remove_container(container_id, force=True)
+                except Exception:
+                    pass
+        return False
+
+    async def _run(self):
+        while True:
+            try:
+                await self._sync()
+                while len(self._idle) < self.size:
+                    self._idle.append(await self._create())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"DEBUG: Runner pool refill failed: {e}")
+            self._refill.clear()
+            try:
+                # Not wait_for: on 3.11 it loses a cancellation that arrives as a claim sets the event
+                async with asyncio.timeout(30):
+                    await self._refill.wait()
+            except TimeoutError:
+                pass
+
+    async def _sync(self):
+        """Adopt idle runners left by a previous process and drop ones that died"""
+        listed, running = set(), []
+        for container in await self.docker.list_containers(all=True, filters={"name": [RUNNER_POOL_PREFIX]}):
+            if not container["Names"][0].lstrip("/").startswith(RUNNER_POOL_PREFIX):
+                continue
+            listed.add(container["Id"])
+            if container["Id"] in self._claimed:
+                continue
+            if container.get("State") == "running":
+                running.append(container["Id"])
+            else:
+                await self.docker.remove_container(container["Id"], force=True)
+        # A claim that ran while the listing was awaited renamed its runner, which the listing cannot show yet;
+        # once a claimed runner is no longer listed under its pool name it needs no tracking
+        running = [c for c in running if c not in self._claimed]
+        self._claimed &= listed
+        self._idle = [c for c in self._idle if c in running] + [c for c in running if c not in self._idle]
+        excess, self._idle = self._idle[self.size:], self._idle[:self.size]
+        for container_id in excess:
+            await self.docker.remove_container(container_id, force=True)
+
+    async def _create(self) -> str:
+        name = f"{RUNNER_POOL_PREFIX}{uuid.uuid4().hex[:12]}"
+        container_id = await self.docker.create_container(name, {
+            "Image": self.image,
+            "Cmd": ["pwsh", "-NoProfile", "-ExecutionPolicy", "Bypass", "-c", RUNNER_IDLE_COMMAND],
+            # Labels are fixed at creation, so claimed runners are identified as jobs by name and the job store
+            "Labels": {LABEL_ROLE: "runner", "mailbox-creator.pool": "idle"},
+        })
+        await self.docker.start_container(container_id)
+        return container_id
+
+runner_pool = RunnerPool(docker)
+
+def job_container_name(domain: str) -> str:
+    """Generate a unique container name for a domain job"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # The suffix keeps names unique when one domain is submitted several times within a second
+    return f"{JOB_NAME_PREFIX}{domain.replace('.', '-')}-{timestamp}-{uuid.uuid4().hex[:6]}"
+
+async def start_domain_container(domain: str, job_payload: Dict[str, Any], proxy_endpoint: Optional[str] = None,
+                                 container_name: Optional[str] = None) -> str:
     """Start an isolated container for a specific domain"""
     
     # Generate unique container name for this domain
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    container_name = f"mailbox-creator-{domain.replace('.', '-')}-{timestamp}"
+    container_name = container_name or job_container_name(domain)
     
     print(f"DEBUG: Starting container for domain: {domain}")
     
+    # Prefer handing the job to an already running idle runner
+    started = time.perf_counter()
+    with span("runner_pool.claim") as claim:
+        claimed = await runner_pool.claim(container_name, job_payload, proxy_endpoint)
+        claim.set(claimed=claimed)
+    if claimed:
+        container_launch_seconds.observe(time.perf_counter() - started, "pool")
+        return container_name
+    
     try:
-        # Build Docker command for detached container
-        cmd = [
-            "docker", "run", "-d", "--name", container_name,
-        ]
+        # Build container config for detached container; the job payload travels in the environment
+        env = [f"MAILBOX_JOB={base64.b64encode(json.dumps(job_payload).encode()).decode()}"]
         
         # Add proxy configuration only if provided - TESTING WITHOUT PROXY FIRST
         if proxy_endpoint:
-            cmd.extend([
-                "-e", f"ALL_PROXY={proxy_endpoint}",
-                "-e", f"HTTP_PROXY={proxy_endpoint}",
-                "-e", f"HTTPS_PROXY={proxy_endpoint}"
+            env.extend([
+                f"ALL_PROXY={proxy_endpoint}",
+                f"HTTP_PROXY={proxy_endpoint}",
+                f"HTTPS_PROXY={proxy_endpoint}"
             ])
         else:
             print(f"DEBUG: Running container without proxy for testing")
         
-        # Create a wrapper script that executes the main script and ensures output goes to container logs
-        wrapper_script = f"""
-# Write script to temp file inside container
-$scriptContent = @'
-{ps_script}
-'@
-
-$scriptPath = "/tmp/mailbox_script.ps1"
-$scriptContent | Out-File -FilePath $scriptPath -Encoding UTF8
-
-# Execute the script and ensure all output goes to container stdout/stderr
-Write-Host "Starting mailbox creation script..." -ForegroundColor Cyan
-& $scriptPath 2>&1 | Tee-Object -FilePath "/dev/stdout"
-Write-Host "Script execution completed." -ForegroundColor Cyan
-"""
+        # Start container with the shared runner command
+        config = {
+            "Image": RUNNER_IMAGE,
+            "Cmd": ["pwsh", "-NoProfile", "-ExecutionPolicy", "Bypass", "-c", RUNNER_COMMAND],
+            "Env": env,
+            "Labels": {
+                LABEL_ROLE: "job",
+                LABEL_JOB: container_name,
+                LABEL_DOMAIN: domain,
+                LABEL_CREATED_AT: datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            },
+        }
         
-        # Start container with the wrapper script
-        cmd.extend([
-            "mcr.microsoft.com/powershell:latest",
-            "pwsh", "-NoProfile", "-ExecutionPolicy", "Bypass", "-c", wrapper_script
-        ])
-        
-        # Start the detached container
-        print(f"DEBUG: Executing Docker command: {' '.join(cmd)}")
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        
-        if result.returncode != 0:
-            raise Exception(f"Failed to start container: {result.stderr}")
-        
-        actual_container_id = result.stdout.strip()
+        # Create and start the detached container
+        print(f"DEBUG: Creating container {container_name} from {config['Image']}")
+        with span("backend.create"):
+            actual_container_id = await docker.create_container(container_name, config)
+        with span("backend.start"):
+            await docker.start_container(actual_container_id)
+        container_launch_seconds.observe(time.perf_counter() - started, "cold")
         print(f"DEBUG: Started container: {actual_container_id}")
         
         return container_name
@@ -520,112 +2137,1918 @@ Write-Host "Script execution completed." -ForegroundColor Cyan
     except Exception as e:
         # Cleanup container on error
         try:
-            subprocess.run(["docker", "rm", "-f", container_name], capture_output=True, timeout=10)
+            await docker.remove_container(container_name, force=True)
         except:
             pass
-        raise e
+        raise Exception(f"Failed to start container: {e}") from e
+
+# Auth code patterns in priority order; the first pattern whose first match is a plausible code wins
+AUTH_CODE_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r"AUTH_CODE: ([A-Z0-9]+)",
+    r"enter the code ([A-Z0-9]{6,12}) to authenticate",
+    r"and enter the code ([A-Z0-9]{6,12}) to authenticate",
+    r"Code: ([A-Z0-9]{6,12})",
+    r"device.*?code.*?([A-Z0-9]{8,10})",  # More specific context
+    r"authentication.*?code.*?([A-Z0-9]{8,10})",  # More specific context
+)]
+AUTH_CODE_STOPWORDS = frozenset(['atcushwake', 'microsoft', 'exchange', 'online'])
+
+# Welcome message patterns that appear after successful authentication
+AUTHENTICATED_RE = re.compile("|".join(f"(?:{pattern})" for pattern in (
+    "This V3 EXO PowerShell module contains new REST API backed Exchange Online cmdlets",
+    r"Unlike the EXO\* prefixed cmdlets, the cmdlets in this module support full functional parity",
+    "For more information check https://aka.ms/exov3-module",
+    "Starting with EXO V3.7",
+    "REST backed EOP and SCC cmdlets are also available",
+    "LoadCmdletHelp parameter alongside Connect-ExchangeOnline",
+    "=== CREATING MAILBOXES ===",  # This appears after successful auth
+    "Creating .* mailboxes for domain:",  # Regex pattern for mailbox creation start
+)), re.IGNORECASE)
+
+# Lowercase substrings at least one of which occurs in any line AUTHENTICATED_RE matches
+AUTHENTICATED_HINTS = ("exo", "rest backed eop", "loadcmdlethelp", "creating")
+
+CREATED_MAILBOX_RE = re.compile(r'Created mailbox ([\w\.\-]+@[\w\.\-]+)')
+FAILED_MAILBOX_RE = re.compile(r'Could not create ([\w\.\-]+@[\w\.\-]+)')
+PROXY_CHECK_RE = re.compile(r'PROXY_CHECK: (IP=.+)')
+IP_FIELD_RES = {field: re.compile(rf'{field}: (.+)') for field in ("IP_ADDRESS", "COUNTRY", "STATE", "CITY")}
+
+# Every line that can still change the parsed state contains one of these tokens: the markers matched
+# case-sensitively as they are, the rest in a lowercased copy of the log. Tokens of state that is already
+# settled (e.g. the EXO banner once authenticated) are dropped, so later lines are never even looked at.
+CANDIDATE_LINE_MARKERS = ("Created mailbox", "Could not create", "MAILBOX CREATION COMPLETED")
+SCAN_BLOCK_CHARS = 1 << 16
+SCAN_BLOCK_OVERLAP = 64  # longer than any token, so tokens crossing a block boundary are still found
+_ASCII_LOWER = {upper: upper + 32 for upper in range(ord("A"), ord("Z") + 1)}
+
+# Runners speaking the event protocol write one compact JSON object per line, always starting with its type
+EVENT_PREFIX = '{"type":"'
+LOG_EVENT_PREFIX = EVENT_PREFIX + 'log"'
+
+_UNSET = object()
+
+@dataclass(slots=True)
+class ParsedStatus:
+    """Everything /status derives from a container's logs"""
+    status: str
+    auth_code: Optional[str]
+    authenticated: bool
+    auth_timeout: bool
+    completed: bool
+    error: bool
+    created: List[str]
+    failed: List[str]
+    ip_info: Optional[str]
+
+class LogParser:
+    """Incremental single-pass parser for runner output
+
+    Text can be fed in arbitrary pieces; each complete line is looked at most once. JSON event lines
+    are decoded directly; the text markers of runners predating the event protocol are still understood.
+    """
+
+    __slots__ = ("_partial", "protocol", "_auth_first", "_auth_best", "auth_code", "saw_auth_code_marker",
+                 "authenticated", "auth_timeout", "completed", "error", "created", "failed",
+                 "_proxy_check", "_ip_fields")
+
+    def __init__(self):
+        self._partial = ""
+        self.protocol = False
+        self._auth_first: List[Any] = [_UNSET] * len(AUTH_CODE_PATTERNS)
+        self._auth_best = len(AUTH_CODE_PATTERNS)
+        self.auth_code: Optional[str] = None
+        self.saw_auth_code_marker = False
+        self.authenticated = False
+        self.auth_timeout = False
+        self.completed = False
+        self.error = False
+        self.created: List[str] = []
+        self.failed: List[str] = []
+        self._proxy_check: Optional[str] = None
+        self._ip_fields: Dict[str, str] = {}
+
+    def feed(self, text: str):
+        """Parse the complete lines in `text`, keeping a trailing partial line for later"""
+        if self._partial:
+            text = self._partial + text
+        cut = text.rfind("\n") + 1
+        self._partial = text[cut:]
+        self._scan(text, cut)
+
+    def flush(self):
+        """Parse a pending partial line, e.g. at the end of a finished log"""
+        if self._partial:
+            text, self._partial = self._partial, ""
+            self._scan(text, len(text))
+
+    def _candidate_tokens(self) -> List[Tuple[str, bool]]:
+        """Tokens of the lines that can still change the parsed state, with whether they match lowercased"""
+        if self.protocol:
+            # Everything arrives as events, except possibly the device code prompt printed by the module
+            return [] if self.auth_code is not None else [("code", True)]
+        tokens = [(marker, False) for marker in CANDIDATE_LINE_MARKERS]
+        if self._auth_best:
+            tokens.append(("code", True))
+        if not self.authenticated:
+            tokens.extend((hint, True) for hint in AUTHENTICATED_HINTS)
+        if not (self.saw_auth_code_marker and self.auth_timeout):
+            tokens.append(("AUTH_", False))
+        if not self.error:
+            tokens.append(("ERROR:", False))
+        if self._proxy_check is None:
+            # The individual IP fields only matter while no consolidated proxy check was seen
+            tokens.append(("PROXY_CHECK: ", False))
+            tokens.extend((f"{field}: ", False) for field in IP_FIELD_RES if field not in self._ip_fields)
+        return tokens
+
+    def _scan(self, text: str, limit: int):
+        if text.find(EVENT_PREFIX, 0, limit) != -1:
+            text = self._scan_events(text[:limit])
+            limit = len(text)
+        done = 0
+        # Walking the log in blocks means a token is only searched for while its state is unsettled
+        for block_start in range(0, limit, SCAN_BLOCK_CHARS):
+            tokens = self._candidate_tokens()
+            if not tokens:
+                return
+            block_end = min(block_start + SCAN_BLOCK_CHARS, limit)
+            lo, hi = max(block_start, done), min(block_end + SCAN_BLOCK_OVERLAP, limit)
+            if lo >= block_end:
+                continue
+            lowered = ""
+            if any(folded for _, folded in tokens):
+                lowered = text[lo:hi].lower()
+                # A few non-ASCII characters change length when lowercased, which would shift positions
+                if len(lowered) != hi - lo:
+                    lowered = text[lo:hi].translate(_ASCII_LOWER)
+            
+            def find(token: str, folded: bool, start: int) -> int:
+                """Position of the next token starting in this block, or -1"""
+                if folded:
+                    pos = lowered.find(token, start - lo)
+                    pos = pos + lo if pos != -1 else -1
+                else:
+                    pos = text.find(token, start, hi)
+                return pos if pos < block_end else -1
+            
+            heads = {}
+            for token, folded in tokens:
+                pos = find(token, folded, lo)
+                if pos != -1:
+                    heads[token, folded] = pos
+            # Candidate lines in order: the next one is where the nearest active token occurs
+            while heads:
+                pos = min(heads.values())
+                start = text.rfind("\n", 0, pos) + 1
+                done = text.find("\n", pos, limit)
+                if done == -1:
+                    done = limit
+                self._parse_line(text[start:done])
+                active = set(self._candidate_tokens())
+                for key, pos in list(heads.items()):
+                    if key in active and pos >= done:
+                        continue
+                    pos = find(*key, done) if key in active else -1
+                    if pos == -1:
+                        del heads[key]
+                    else:
+                        heads[key] = pos
+
+    def _scan_events(self, text: str) -> str:
+        """Apply the event lines in `text` and return the remaining raw lines"""
+        rest, last = [], 0
+        pos = 0 if text.startswith(EVENT_PREFIX) else text.find("\n" + EVENT_PREFIX)
+        while pos != -1:
+            if text[pos] == "\n":
+                pos += 1
+            end = text.find("\n", pos)
+            if end == -1:
+                end = len(text)
+            rest.append(text[last:pos])
+            # Log events never change the parsed state, so they are not even decoded
+            if not text.startswith(LOG_EVENT_PREFIX, pos):
+                try:
+                    self._apply_event(json.loads(text[pos:end]))
+                except (ValueError, TypeError, KeyError, AttributeError):
+                    rest.append(text[pos:end])
+            last = end
+            pos = text.find("\n" + EVENT_PREFIX, end)
+        rest.append(text[last:])
+        return "".join(rest)
+
+    def _apply_event(self, event: Dict[str, Any]):
+        kind = event["type"]
+        if kind == "mailbox":
+            (self.created if event["ok"] else self.failed).append(event["email"])
+        elif kind == "start":
+            self.protocol = True
+        elif kind == "auth_code":
+            self.auth_code = event["code"]
+            self.saw_auth_code_marker = True
+            # An announced code outranks anything the text patterns could find
+            self._auth_best = 0
+        elif kind == "authenticated":
+            self.authenticated = True
+        elif kind == "proxy_check":
+            if self._proxy_check is None and event.get("ip"):
+                self._proxy_check = (f"IP={event['ip']} | Country={event.get('country') or 'Unknown'} | "
+                                     f"State={event.get('state') or 'Unknown'} | City={event.get('city') or 'Unknown'}")
+        elif kind == "completed":
+            self.completed = True
+        elif kind == "auth_timeout":
+            self.auth_timeout = True
+        elif kind == "error":
+            self.error = True
+
+    def _parse_line(self, line: str):
+        if "SUCCESS: Created mailbox" in line:
+            match = CREATED_MAILBOX_RE.search(line)
+            if match:
+                self.created.append(match.group(1))
+        elif "FAILED: Could not create" in line:
+            match = FAILED_MAILBOX_RE.search(line)
+            if match:
+                self.failed.append(match.group(1))
+        
+        lowered = line.lower()
+        
+        # Only patterns ranked above the current best code can still change it
+        for index in range(self._auth_best if "code" in lowered else 0):
+            if self._auth_first[index] is _UNSET:
+                match = AUTH_CODE_PATTERNS[index].search(line)
+                if match:
+                    code = self._auth_first[index] = match.group(1)
+                    # Additional validation: real auth codes are typically 8-10 chars and not common words
+                    if 6 <= len(code) <= 12 and code.lower() not in AUTH_CODE_STOPWORDS:
+                        self._auth_best = index
+                        self.auth_code = code
+                        break
+        
+        if not self.authenticated and any(hint in lowered for hint in AUTHENTICATED_HINTS) and AUTHENTICATED_RE.search(line):
+            self.authenticated = True
+        if "AUTH_CODE:" in line:
+            self.saw_auth_code_marker = True
+        if "AUTH_TIMEOUT:" in line:
+            self.auth_timeout = True
+        if "=== MAILBOX CREATION COMPLETED ===" in line:
+            self.completed = True
+        if "ERROR:" in line:
+            self.error = True
+        
+        if self._proxy_check is None and "PROXY_CHECK: " in line:
+            match = PROXY_CHECK_RE.search(line)
+            if match:
+                self._proxy_check = match.group(1)
+        for name, pattern in IP_FIELD_RES.items():
+            if name not in self._ip_fields and name in line:
+                match = pattern.search(line)
+                if match:
+                    self._ip_fields[name] = match.group(1).strip()
+
+    @property
+    def ip_info(self) -> Optional[str]:
+        if self._proxy_check:
+            return self._proxy_check
+        if "IP_ADDRESS" in self._ip_fields:
+            fields = self._ip_fields
+            return (f"IP={fields['IP_ADDRESS']} | Country={fields.get('COUNTRY', 'Unknown')} | "
+                    f"State={fields.get('STATE', 'Unknown')} | City={fields.get('CITY', 'Unknown')}")
+        return None
+
+    @property
+    def log_status(self) -> str:
+        """Status implied by the logs alone, without knowing whether the container still runs"""
+        if self.auth_timeout:
+            return "auth_timeout"
+        elif self.authenticated:
+            return "creating_mailboxes"
+        elif self.saw_auth_code_marker:
+            return "waiting_for_auth"
+        elif self.completed:
+            return "completed"
+        elif self.error:
+            return "error"
+        return "starting"
+
+    def result(self, is_running: Optional[bool] = None) -> ParsedStatus:
+        """Snapshot the parsed state; with `is_running` the status is the one /status reports"""
+        status = self.log_status if is_running is None else resolve_job_status(self, is_running)
+        return ParsedStatus(
+            status=status,
+            auth_code=self.auth_code,
+            authenticated=self.authenticated,
+            auth_timeout=self.auth_timeout,
+            completed=self.completed,
+            error=self.error,
+            created=list(self.created),
+            failed=list(self.failed),
+            ip_info=self.ip_info,
+        )
+
+def resolve_job_status(parser: LogParser, is_running: bool) -> str:
+    """Combine parsed log state with the container's running flag into the reported status"""
+    if parser.auth_timeout:
+        return "auth_timeout"
+    elif not is_running:
+        if parser.created or parser.failed or parser.completed:
+            return "completed"
+        return "failed"
+    elif parser.authenticated:
+        return "creating_mailboxes"
+    elif parser.auth_code or parser.saw_auth_code_marker:
+        return "waiting_for_auth"
+    return "starting"
+
+def parse_logs(logs: str, is_running: Optional[bool] = None) -> ParsedStatus:
+    """Parse a complete log in one pass"""
+    parser = LogParser()
+    parser.feed(logs)
+    parser.flush()
+    return parser.result(is_running)
 
 def extract_auth_code(logs: str) -> Optional[str]:
     """Extract authentication code from PowerShell logs"""
-    
-    # More precise patterns to avoid false positives
-    patterns = [
-        r"AUTH_CODE: ([A-Z0-9]+)",
-        r"enter the code ([A-Z0-9]{6,12}) to authenticate",
-        r"and enter the code ([A-Z0-9]{6,12}) to authenticate",
-        r"Code: ([A-Z0-9]{6,12})",
-        r"device.*?code.*?([A-Z0-9]{8,10})",  # More specific context
-        r"authentication.*?code.*?([A-Z0-9]{8,10})",  # More specific context
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, logs, re.IGNORECASE)
-        if match:
-            code = match.group(1)
-            # Additional validation: real auth codes are typically 8-10 chars and not common words
-            if 6 <= len(code) <= 12 and not code.lower() in ['atcushwake', 'microsoft', 'exchange', 'online']:
-                return code
-    
-    return None
+    return parse_logs(logs).auth_code
 
 def is_authenticated_from_logs(logs: str) -> bool:
     """Check if authentication was successful by detecting welcome message"""
-    
-    # Look for welcome message patterns that appear after successful authentication
-    welcome_patterns = [
-        "This V3 EXO PowerShell module contains new REST API backed Exchange Online cmdlets",
-        "Unlike the EXO* prefixed cmdlets, the cmdlets in this module support full functional parity", 
-        "For more information check https://aka.ms/exov3-module",
-        "Starting with EXO V3.7",
-        "REST backed EOP and SCC cmdlets are also available",
-        "LoadCmdletHelp parameter alongside Connect-ExchangeOnline",
-        "=== CREATING MAILBOXES ===",  # This appears after successful auth
-        "Creating .* mailboxes for domain:"  # Regex pattern for mailbox creation start
-    ]
-    
-    for pattern in welcome_patterns:
-        if re.search(pattern, logs, re.IGNORECASE):
-            return True
-    
-    return False
+    return parse_logs(logs).authenticated
 
 def parse_container_status(logs: str) -> str:
     """Parse current status from container logs"""
-    if "AUTH_TIMEOUT:" in logs:
-        return "auth_timeout"
-    elif is_authenticated_from_logs(logs):
-        return "creating_mailboxes"
-    elif "AUTH_CODE:" in logs:
-        return "waiting_for_auth"
-    elif "=== MAILBOX CREATION COMPLETED ===" in logs:
-        return "completed"
-    elif "ERROR:" in logs:
-        return "error"
-    else:
-        return "starting"
+    return parse_logs(logs).status
 
 def parse_final_results(logs: str) -> tuple[List[str], List[str]]:
     """Parse final results from logs"""
-    created = []
-    failed = []
-    
-    for line in logs.split('\n'):
-        if "SUCCESS: Created mailbox" in line:
-            # Extract email from success message
-            email_match = re.search(r'Created mailbox ([\w\.\-]+@[\w\.\-]+)', line)
-            if email_match:
-                created.append(email_match.group(1))
-        elif "FAILED: Could not create" in line:
-            # Extract email from failure message
-            email_match = re.search(r'Could not create ([\w\.\-]+@[\w\.\-]+)', line)
-            if email_match:
-                failed.append(email_match.group(1))
-    
-    return created, failed
+    parsed = parse_logs(logs)
+    return parsed.created, parsed.failed
 
 def extract_ip_info(logs: str) -> Optional[str]:
     """Extract IP information from logs for proxy verification"""
+    return parse_logs(logs).ip_info
+
+class QueueFullError(Exception):
+    """Raised when a job can neither start nor wait in the queue"""
+
+@dataclass(order=True)
+class QueuedJob:
+    sort_key: Tuple[int, int]
+    name: str = field(compare=False)
+    domain: str = field(compare=False)
+    payload: Dict[str, Any] = field(compare=False)
+    proxy_endpoint: Optional[str] = field(compare=False)
+
+class JobScheduler:
+    """Admits jobs up to a limit of running containers and queues the rest by priority, then FIFO"""
+
+    def __init__(self, max_running: int = MAX_RUNNING_JOBS, max_queued: int = JOB_QUEUE_SIZE):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self._heap: List[QueuedJob] = []
+        self._queued: Dict[str, QueuedJob] = {}
+        self._running: set = set()
+        # Jobs holding a slot whose container is not started yet; a container listing cannot show them
+        self._reserved: set = set()
+        # Jobs whose container started while a sync is waiting for its listing
+        self._started: Optional[set] = None
+        self._seq = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+        self._launches: set = set()
+
+    @property
+    def queued(self) -> int:
+        return len(self._queued)
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    def state(self, name: str) -> Optional[str]:
+        """Status of a job the scheduler holds but Docker does not know about yet"""
+        if name in self._queued:
+            return "queued"
+        if name in self._reserved:
+            return "container_started"
+        return None
+
+    def position(self, name: str) -> Optional[int]:
+        job = self._queued.get(name)
+        if job is None:
+            return None
+        return sum(1 for other in self._queued.values() if other.sort_key < job.sort_key) + 1
+
+    def admit(self, batch: List[QueuedJob]) -> List[str]:
+        """Reserve slots for, or queue, a whole batch at once; the caller launches the admitted jobs"""
+        order = sorted(range(len(batch)), key=lambda i: (batch[i].sort_key[0], i))
+        free = 0 if self._queued else max(self.max_running - len(self._running), 0)
+        if len(self._queued) + len(batch) - min(free, len(batch)) > self.max_queued:
+            raise QueueFullError(f"Job queue is full ({self.max_queued} jobs waiting)")
+        statuses = [""] * len(batch)
+        for rank, i in enumerate(order):
+            job = batch[i]
+            if rank < free:
+                self._running.add(job.name)
+                self._reserved.add(job.name)
+                statuses[i] = "container_started"
+            else:
+                job.sort_key = (job.sort_key[0], next(self._seq))
+                heapq.heappush(self._heap, job)
+                self._queued[job.name] = job
+                statuses[i] = "queued"
+        return statuses
+
+    def cancel(self, name: str) -> bool:
+        """Drop a queued job; its heap entry is skipped when it comes up"""
+        return self._queued.pop(name, None) is not None
+
+    def release(self, name: str):
+        """Free the slot of a job whose container stopped"""
+        if name in self._running:
+            self._running.discard(name)
+            self._dispatch()
+
+    async def launch(self, name: str, domain: str, payload: Dict[str, Any], proxy_endpoint: Optional[str]):
+        """Start the container of a job that was given a slot by admit"""
+        try:
+            await start_domain_container(domain, payload, proxy_endpoint, container_name=name)
+            if self._started is not None:
+                self._started.add(name)
+        except BaseException:
+            self._running.discard(name)
+            self._dispatch()
+            raise
+        finally:
+            self._reserved.discard(name)
+
+    async def _launch_queued(self, job: QueuedJob):
+        try:
+            await self.launch(job.name, job.domain, job.payload, job.proxy_endpoint)
+        except Exception as e:
+            print(f"DEBUG: Queued job {job.name} failed to start: {e}")
+            store.record(job.name, status="failed", finished_at=time.time())
+            webhooks.observe(job.name, "failed")
+
+    def _dispatch(self):
+        while self._heap and len(self._running) < self.max_running:
+            job = heapq.heappop(self._heap)
+            if self._queued.pop(job.name, None) is None:
+                continue
+            self._running.add(job.name)
+            self._reserved.add(job.name)
+            store.record(job.name, status="container_started")
+            task = asyncio.create_task(self._launch_queued(job))
+            self._launches.add(task)
+            task.add_done_callback(self._launches.discard)
+            # Queue positions moved for everyone still waiting
+            for name in [job.name, *self._queued]:
+                job_updates.notify(name)
+
+    def start(self):
+        self._task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def sync(self):
+        """Recount running job containers, e.g. after a restart or a missed exit event"""
+        started = self._started = set()
+        try:
+            containers = await docker.list_containers(filters={"name": [JOB_NAME_PREFIX]})
+        finally:
+            self._started = None
+        names = {c["Names"][0].lstrip("/") for c in containers}
+        # Slots of jobs the listing cannot show yet stay taken
+        self._running = {name for name in names if name.startswith(JOB_NAME_PREFIX)} | self._reserved | started
+        self._dispatch()
+
+    async def _sync_loop(self):
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"DEBUG: Scheduler sync failed: {e}")
+            await asyncio.sleep(SCHEDULER_SYNC_INTERVAL)
+
+scheduler = JobScheduler()
+
+def parse_docker_timestamp(value: str) -> int:
+    """Convert a Docker RFC3339Nano timestamp to integer nanoseconds since the epoch"""
+    seconds, _, fraction = value.rstrip("Z").partition(".")
+    whole = calendar.timegm(datetime.strptime(seconds, "%Y-%m-%dT%H:%M:%S").timetuple())
+    return whole * 1_000_000_000 + int(fraction[:9].ljust(9, "0") or 0)
+
+def format_since(ns: int) -> str:
+    """Render nanoseconds since the epoch as a Docker `since` parameter"""
+    return f"{ns // 1_000_000_000}.{ns % 1_000_000_000:09d}"
+
+def _metric_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if value == int(value) else repr(float(value))
+
+def _metric_labels(pairs: Tuple[Tuple[str, str], ...]) -> str:
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+class Counter:
+    """Monotonically increasing count per combination of label values"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self._values.items():
+            yield self.name, tuple(zip(self.labels, labels)), value
+
+class Gauge:
+    """Current value, read from the live objects when scraped"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def samples(self):
+        yield self.name, (), self.read()
+
+class Histogram:
+    """Distribution of observed values over fixed buckets, per combination of label values"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...], labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.labels = labels
+        # Label values -> per-bucket counts (the last one past every bound), then sum and count
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str, count: int = 1):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 3)
+        series[bisect.bisect_left(self.buckets, value)] += count
+        series[-2] += value * count
+        series[-1] += count
+
+    def samples(self):
+        for labels, series in self._series.items():
+            pairs = tuple(zip(self.labels, labels))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), series):
+                cumulative += count
+                yield f"{self.name}_bucket", (*pairs, ("le", _metric_value(bound))), cumulative
+            yield f"{self.name}_sum", pairs, series[-2]
+            yield f"{self.name}_count", pairs, series[-1]
+
+class MetricsRegistry:
+    """Metrics exposed by /metrics in the Prometheus text format; updating one is a few dict and list operations"""
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_metric_labels(labels)} {_metric_value(value)}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+container_launch_seconds = metrics.register(Histogram(
+    "mailbox_creator_container_launch_seconds", "Time to launch a job, by claimed pool runner or cold container start",
+    (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120), ("source",)))
+docker_logs_seconds = metrics.register(Histogram(
+    "mailbox_creator_docker_logs_seconds", "Time to fetch a container's new log lines from the backend",
+    (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)))
+log_parse_seconds = metrics.register(Histogram(
+    "mailbox_creator_log_parse_seconds", "Time to parse one appended piece of runner log",
+    (0.00001, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1)))
+log_parsed_characters = metrics.register(Counter(
+    "mailbox_creator_log_parsed_characters_total", "Runner log characters parsed"))
+job_auth_code_seconds = metrics.register(Histogram(
+    "mailbox_creator_job_auth_code_seconds", "Time from container start until the sign-in code appeared",
+    (1, 2, 5, 10, 20, 30, 60, 120, 300)))
+job_authenticated_seconds = metrics.register(Histogram(
+    "mailbox_creator_job_authenticated_seconds", "Time from container start until sign-in completed",
+    (5, 10, 30, 60, 120, 300, 600, 900, 1800)))
+job_mailbox_seconds = metrics.register(Histogram(
+    "mailbox_creator_job_mailbox_seconds", "Time per mailbox result, measured between successive results of a job",
+    (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)))
+job_runtime_seconds = metrics.register(Histogram(
+    "mailbox_creator_job_runtime_seconds", "Time from container start until the job finished, by final status",
+    (30, 60, 120, 300, 600, 900, 1800, 3600, 7200), ("status",)))
+mailboxes_total = metrics.register(Counter(
+    "mailbox_creator_mailboxes_total", "Mailboxes of finished jobs, by result", ("result",)))
+http_request_seconds = metrics.register(Histogram(
+    "mailbox_creator_http_request_seconds", "Time until the response headers were sent, by handler",
+    (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 10), ("handler",)))
+metrics.register(Gauge("mailbox_creator_jobs_running", "Job containers running or being launched",
+                       lambda: scheduler.running))
+metrics.register(Gauge("mailbox_creator_jobs_queued", "Jobs waiting for a free container slot", lambda: scheduler.queued))
+metrics.register(Gauge("mailbox_creator_runners_idle", "Pre-started idle runner containers", lambda: runner_pool.idle))
+
+def observe_finished_job(job: "Job", parsed: ParsedStatus):
+    """Record the phase durations of a job that was seen running and has now finished, once"""
+    if job.running and job.measured is None:
+        job.measured = False
+    if job.running or job.measured is not False or job.finished_at is None:
+        return
+    job.measured = True
+    if job.started_at:
+        if job.auth_code_at:
+            job_auth_code_seconds.observe(job.auth_code_at - job.started_at)
+        if job.authenticated_at:
+            job_authenticated_seconds.observe(job.authenticated_at - job.started_at)
+        job_runtime_seconds.observe(job.finished_at - job.started_at, parsed.status)
+    mailboxes_total.inc("created", amount=len(parsed.created))
+    mailboxes_total.inc("failed", amount=len(parsed.failed))
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    """One timed step of a traced request; every step of a request is collected on its root span"""
+
+    __slots__ = ("name", "attrs", "parent", "root", "children", "started_at", "start", "duration", "_token")
+
+    def __init__(self, name: str, attrs: Dict[str, Any], parent: Optional["Span"] = None):
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.root = parent.root if parent is not None else self
+        self.children: List["Span"] = []
+        self.started_at = time.time() if parent is None else None
+        self.start = time.perf_counter()
+        self.duration = 0.0
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.duration = time.perf_counter() - self.start
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        if self.parent is not None:
+            self.root.children.append(self)
+        return False
+
+class _NoSpan:
+    """Stand-in returned when the current request is not traced"""
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self) -> "_NoSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+_NO_SPAN = _NoSpan()
+
+def span(name: str, **attrs):
+    """Time a step of the current request if it is being traced; costs one context lookup otherwise"""
+    parent = _current_span.get()
+    if parent is None:
+        return _NO_SPAN
+    return Span(name, attrs, parent)
+
+class TraceExporter:
+    """Starts sampled request traces and writes each finished one as a JSON line to stdout or a file
+
+    Finished traces are serialized and written by a background thread, so a slow disk or pipe never
+    blocks the event loop; traces are dropped while QUEUE_SIZE of them are waiting.
+    """
+
+    QUEUE_SIZE = 10000
+
+    def __init__(self, target: str = TRACE_EXPORT, sample_rate: float = TRACE_SAMPLE_RATE,
+                 min_duration_ms: float = TRACE_MIN_DURATION_MS):
+        self.target = target
+        self.sample_rate = sample_rate
+        self.min_duration_ms = min_duration_ms
+        self.dropped = 0
+        self._file = None
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(self.QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, name: str, **attrs):
+        if not self.target or random.random() >= self.sample_rate:
+            return _NO_SPAN
+        return Span(name, attrs)
+
+    def export(self, root: Span):
+        if root.duration * 1000 < self.min_duration_ms:
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._write, name="trace-exporter", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(root)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """Write the traces still queued and stop the writer thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self):
+        while (root := self._queue.get()) is not None:
+            try:
+                line = self._format(root)
+                if self.target == "stdout":
+                    print(line, flush=True)
+                else:
+                    if self._file is None:
+                        self._file = open(self.target, "a", buffering=1)
+                    self._file.write(line + "\n")
+            except Exception as e:
+                print(f"DEBUG: Trace export failed: {e}")
+
+    @staticmethod
+    def _format(root: Span) -> str:
+        ids = {id(root): 0}
+        spans = []
+        for number, child in enumerate(sorted(root.children, key=lambda child: child.start), 1):
+            ids[id(child)] = number
+            spans.append({
+                "id": number,
+                "parent": ids.get(id(child.parent)),
+                "name": child.name,
+                "offset_ms": round((child.start - root.start) * 1000, 3),
+                "duration_ms": round(child.duration * 1000, 3),
+                **({"attrs": child.attrs} if child.attrs else {}),
+            })
+        return json.dumps({
+            "trace_id": f"{random.getrandbits(64):016x}",
+            "name": root.name,
+            "start": root.started_at,
+            "duration_ms": round(root.duration * 1000, 3),
+            "attrs": root.attrs,
+            "spans": spans,
+        }, default=str)
+
+tracer = TraceExporter()
+
+class RequestTimer:
+    """ASGI middleware timing each request until its response headers, labelled with the matched handler
+
+    Sampled requests are also traced end to end and exported once the response is complete.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        root = tracer.start("request", method=scope["method"], path=scope["path"])
+        
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                # The router stores the matched endpoint in the scope
+                endpoint = scope.get("endpoint")
+                http_request_seconds.observe(time.perf_counter() - started, getattr(endpoint, "__name__", "unmatched"))
+                root.set(status=message["status"])
+            await send(message)
+        
+        try:
+            with root:
+                await self.app(scope, receive, timed_send)
+        finally:
+            if root is not _NO_SPAN:
+                root.name = getattr(scope.get("endpoint"), "__name__", "unmatched")
+                tracer.export(root)
+
+app.add_middleware(RequestTimer)
+
+class Job:
+    """Live state of one runner container: log cursor, parsed results and lifecycle"""
+
+    __slots__ = ("name", "docker_id", "lock", "chunks", "log_head", "log_size", "log_dropped", "parser", "cursor_ns", "cursor_seen",
+                 "running", "exit_code", "started_at", "auth_code_at", "authenticated_at", "finished_at",
+                 "following", "synced", "measured", "mailbox_at")
+
+    def __init__(self, name: str, docker_id: str):
+        self.name = name
+        self.docker_id = docker_id
+        self.lock = asyncio.Lock()
+        # Log text, oldest first; the first log_head characters of the oldest chunk are no longer retained
+        self.chunks: "deque[str]" = deque()
+        self.log_head = 0
+        self.log_size = 0
+        # Characters cut from the head of the retained log
+        self.log_dropped = 0
+        self.parser = LogParser()
+        # Timestamp (ns) of the newest line seen and how many lines carried exactly that timestamp
+        self.cursor_ns = 0
+        self.cursor_seen = 0
+        self.running = False
+        self.exit_code: Optional[int] = None
+        self.started_at: Optional[float] = None
+        self.auth_code_at: Optional[float] = None
+        self.authenticated_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Logs are streamed live by the watcher / all logs of a stopped container have been read
+        self.following = False
+        self.synced = False
+        # Phase metrics: None until the job is seen running, False while it runs, True once recorded
+        self.measured: Optional[bool] = None
+        # Log time of the latest mailbox result
+        self.mailbox_at: Optional[float] = None
+
+    @property
+    def logs(self) -> str:
+        if self.log_head:
+            self.chunks[0] = self.chunks[0][self.log_head:]
+            self.log_head = 0
+        if len(self.chunks) > 1:
+            self.chunks = deque(["".join(self.chunks)])
+        return self.chunks[0] if self.chunks else ""
+
+    def feed_timestamped(self, raw: str):
+        """Feed `docker logs --timestamps` output, skipping lines already consumed"""
+        lines = []
+        # Lines at exactly the cursor timestamp are returned again by `since` and were consumed before
+        skip = self.cursor_seen
+        for entry in raw.splitlines(keepends=True):
+            stamp, _, line = entry.partition(" ")
+            try:
+                ts = parse_docker_timestamp(stamp)
+            except ValueError:
+                lines.append(entry)
+                continue
+            if ts < self.cursor_ns:
+                continue
+            if ts == self.cursor_ns:
+                if skip:
+                    skip -= 1
+                    continue
+                self.cursor_seen += 1
+            else:
+                self.cursor_ns, self.cursor_seen, skip = ts, 1, 0
+            lines.append(line if line.endswith("\n") else line + "\n")
+        if lines:
+            self.feed("".join(lines))
+
+    def feed(self, text: str):
+        """Update derived results from newly appended log lines only"""
+        results = len(self.parser.created) + len(self.parser.failed)
+        started = time.perf_counter()
+        with span("parse.feed", characters=len(text)):
+            self.parser.feed(text)
+        log_parse_seconds.observe(time.perf_counter() - started)
+        log_parsed_characters.inc(amount=len(text))
+        # Phase transitions are stamped with the log time of the lines that revealed them
+        if self.auth_code_at is None and self.parser.auth_code:
+            self.auth_code_at = self.cursor_ns / 1e9 if self.cursor_ns else time.time()
+        if self.authenticated_at is None and self.parser.authenticated:
+            self.authenticated_at = self.cursor_ns / 1e9 if self.cursor_ns else time.time()
+        new_results = len(self.parser.created) + len(self.parser.failed) - results
+        # Only jobs followed while running have line times that reflect how long mailboxes took
+        if new_results and self.measured is False:
+            at = self.cursor_ns / 1e9 if self.cursor_ns else time.time()
+            since = self.mailbox_at or self.authenticated_at
+            if since:
+                job_mailbox_seconds.observe(max(at - since, 0) / new_results, count=new_results)
+            self.mailbox_at = at
+        self.chunks.append(text)
+        self.log_size += len(text)
+        # Parsed results cover the whole stream; only the tail of the raw text is retained
+        excess = self.log_size - JOB_LOG_RETAIN_CHARS
+        while excess > 0:
+            cut = min(len(self.chunks[0]) - self.log_head, excess)
+            if cut == len(self.chunks[0]) - self.log_head:
+                self.chunks.popleft()
+                self.log_head = 0
+            else:
+                # The oldest chunk is cut lazily, without copying it on every feed
+                self.log_head += cut
+            self.log_dropped += cut
+            self.log_size -= cut
+            excess -= cut
+
+    def log_range(self, offset: int = 0, limit: Optional[int] = None) -> Tuple[str, int]:
+        """Slice the log by position in the whole stream; returns the text and the offset it starts at"""
+        if offset < 0:
+            offset = max(self.log_dropped + self.log_size + offset, 0)
+        # Text before the retained tail is gone; serve from the oldest retained character instead
+        start = max(offset, self.log_dropped) - self.log_dropped
+        logs = self.logs
+        return logs[start:] if limit is None else logs[start:start + limit], start + self.log_dropped
+
+class JobTable:
+    """Bounded in-memory table of jobs; finished jobs are evicted least recently used first"""
+
+    def __init__(self, max_size: int = JOB_TABLE_SIZE):
+        self.max_size = max_size
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def get(self, name: str) -> Optional[Job]:
+        job = self._jobs.get(name)
+        if job is not None:
+            self._jobs.move_to_end(name)
+        return job
+
+    def upsert(self, name: str, docker_id: str) -> Job:
+        """Return the job for a container, replacing it if the name now belongs to a new container"""
+        job = self.get(name)
+        if job is None or job.docker_id != docker_id:
+            job = self._jobs[name] = Job(name, docker_id)
+            self._evict()
+        return job
+
+    def pop(self, name: str) -> Optional[Job]:
+        return self._jobs.pop(name, None)
+
+    def running(self) -> List[Job]:
+        return [job for job in self._jobs.values() if job.running]
+
+    def _evict(self):
+        excess = len(self._jobs) - self.max_size
+        if excess <= 0:
+            return
+        for name in [name for name, job in self._jobs.items() if not job.running][:excess]:
+            del self._jobs[name]
+
+jobs = JobTable()
+
+class JobUpdates:
+    """Wakes the status streams of a job whenever its state is published"""
+
+    def __init__(self):
+        self._events: Dict[str, asyncio.Event] = {}
+        self._waiters: Dict[str, int] = {}
+
+    def notify(self, name: str):
+        event = self._events.pop(name, None)
+        if event is not None:
+            event.set()
+
+    async def wait(self, name: str, timeout: float) -> bool:
+        """Wait for the next change of a job; False if the timeout passed first"""
+        event = self._events.get(name)
+        if event is None:
+            event = self._events[name] = asyncio.Event()
+        self._waiters[name] = self._waiters.get(name, 0) + 1
+        try:
+            async with asyncio.timeout(timeout):
+                await event.wait()
+            return True
+        except TimeoutError:
+            return False
+        finally:
+            # Jobs that never change again, unknown ids included, keep no entry once nobody waits
+            self._waiters[name] -= 1
+            if not self._waiters[name]:
+                del self._waiters[name]
+                if self._events.get(name) is event:
+                    del self._events[name]
+
+job_updates = JobUpdates()
+
+class CoalescingCache:
+    """Merges concurrent fetches of a key into one and reuses the result for a short TTL (bounded LRU)"""
+
+    def __init__(self, ttl: float = STATUS_CACHE_TTL, max_size: int = STATUS_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def get(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            self._entries.move_to_end(key)
+            return entry[1]
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(fetch())
+            task.add_done_callback(lambda done: self._store(key, done))
+        # A caller that goes away must not cancel the fetch the others are waiting for
+        return await asyncio.shield(task)
+
+    def _store(self, key: str, task: asyncio.Future):
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._entries[key] = (time.monotonic(), task.result())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: str):
+        self._entries.pop(key, None)
+
+status_cache = CoalescingCache()
+
+def redact_proxy(proxy_endpoint: Optional[str]) -> Optional[str]:
+    """Strip credentials from a proxy URL before it is persisted"""
+    if not proxy_endpoint:
+        return None
+    url = urlsplit(proxy_endpoint)
+    return f"{url.scheme}://{url.hostname}:{url.port}" if url.hostname else None
+
+class JobStore:
+    """SQLite (WAL) record of every job the API launched, written in batches"""
+
+    COLUMNS = ("docker_id", "domain", "sender_name", "variations", "proxy", "status", "auth_code",
+               "created_mailboxes", "failed_mailboxes", "ip_info", "exit_code", "submitted_at",
+               "started_at", "auth_code_at", "authenticated_at", "finished_at", "updated_at", "callback_url", "host")
+    JSON_COLUMNS = ("created_mailboxes", "failed_mailboxes")
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            name TEXT PRIMARY KEY,
+            docker_id TEXT,
+            domain TEXT,
+            sender_name TEXT,
+            variations INTEGER,
+            proxy TEXT,
+            status TEXT,
+            auth_code TEXT,
+            created_mailboxes TEXT,
+            failed_mailboxes TEXT,
+            ip_info TEXT,
+            exit_code INTEGER,
+            submitted_at REAL,
+            started_at REAL,
+            auth_code_at REAL,
+            authenticated_at REAL,
+            finished_at REAL,
+            updated_at REAL,
+            callback_url TEXT,
+            host TEXT
+        )
+    """
+    WEBHOOK_SCHEMA = """
+        CREATE TABLE IF NOT EXISTS webhooks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_name TEXT,
+            url TEXT,
+            event TEXT,
+            payload TEXT,
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at REAL,
+            last_error TEXT,
+            created_at REAL
+        )
+    """
+
+    def __init__(self, path: str = JOB_DB_PATH, flush_interval: float = JOB_STORE_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._flusher: Optional[asyncio.Task] = None
+
+    def open(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(self.SCHEMA)
+        # Databases created by older versions lack newer columns
+        existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column in self.COLUMNS:
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_unfinished ON jobs (finished_at) WHERE finished_at IS NULL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_submitted ON jobs (submitted_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_domain ON jobs (domain, submitted_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, submitted_at)")
+        self._conn.execute(self.WEBHOOK_SCHEMA)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS webhooks_pending ON webhooks (job_name, id) WHERE next_attempt_at IS NOT NULL")
+
+    def start(self):
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+        await self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def record(self, name: str, **fields):
+        """Queue an update of a job's columns; updates of the same job are merged until the next flush"""
+        fields["updated_at"] = time.time()
+        self._pending.setdefault(name, {}).update(fields)
+
+    async def flush(self):
+        if not self._pending or self._conn is None:
+            return
+        batch, self._pending = self._pending, {}
+        await asyncio.to_thread(self._write, batch)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"DEBUG: Job store flush failed: {e}")
+
+    def _write(self, batch: Dict[str, Dict[str, Any]]):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for name, fields in batch.items():
+                    values = [json.dumps(v) if k in self.JSON_COLUMNS and v is not None else v for k, v in fields.items()]
+                    columns = ", ".join(fields)
+                    updates = ", ".join(f"{column} = excluded.{column}" for column in fields)
+                    self._conn.execute(
+                        f"INSERT INTO jobs (name, {columns}) VALUES (?{', ?' * len(fields)}) "
+                        f"ON CONFLICT(name) DO UPDATE SET {updates}",
+                        [name, *values],
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        records = []
+        for row in rows:
+            record = dict(row)
+            for column in self.JSON_COLUMNS:
+                if record.get(column) is not None:
+                    record[column] = json.loads(record[column])
+            records.append(record)
+        return records
+
+    async def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return the stored record of a job, including updates not yet flushed"""
+        if self._conn is None:
+            return None
+        with span("store.get"):
+            rows = await asyncio.to_thread(self._query, "SELECT * FROM jobs WHERE name = ?", (name,))
+        pending = self._pending.get(name)
+        if not rows and not pending:
+            return None
+        record = rows[0] if rows else {"name": name, **{column: None for column in self.COLUMNS}}
+        record.update(pending or {})
+        return record
+
+    async def unfinished(self) -> List[Dict[str, Any]]:
+        if self._conn is None:
+            return []
+        return await asyncio.to_thread(self._query, "SELECT * FROM jobs WHERE finished_at IS NULL")
+
+    async def search(self, statuses: Optional[List[str]] = None, domain: Optional[str] = None, active: bool = False,
+                     submitted_after: Optional[float] = None, submitted_before: Optional[float] = None,
+                     host: Optional[str] = None, limit: int = 100, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """Filtered page of job records, newest first, and the total number of matches"""
+        if self._conn is None:
+            return [], 0
+        clauses, params = [], []
+        if statuses:
+            clauses.append(f"status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if domain:
+            clauses.append("domain = ?")
+            params.append(domain)
+        if active:
+            clauses.append("finished_at IS NULL")
+        if host:
+            clauses.append("host = ?")
+            params.append(host)
+        if submitted_after is not None:
+            clauses.append("submitted_at >= ?")
+            params.append(submitted_after)
+        if submitted_before is not None:
+            clauses.append("submitted_at <= ?")
+            params.append(submitted_before)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        
+        def query() -> Tuple[List[Dict[str, Any]], int]:
+            records = self._query(f"SELECT * FROM jobs{where} ORDER BY submitted_at DESC, name LIMIT ? OFFSET ?",
+                                  (*params, limit, offset))
+            with self._lock:
+                total = self._conn.execute(f"SELECT COUNT(*) FROM jobs{where}", params).fetchone()[0]
+            return records, total
+        
+        return await asyncio.to_thread(query)
+
+    def _execute(self, sql: str, params: Tuple = ()) -> int:
+        with self._lock:
+            return self._conn.execute(sql, params).lastrowid
+
+    async def add_webhook(self, job_name: str, url: str, event: str, payload: Dict[str, Any]):
+        now = time.time()
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT INTO webhooks (job_name, url, event, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_name, url, event, json.dumps(payload), now, now),
+        )
+
+    async def due_webhooks(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Deliveries whose retry time has come, holding back any job with an earlier delivery still pending"""
+        if self._conn is None:
+            return []
+        return await asyncio.to_thread(
+            self._query,
+            "SELECT * FROM webhooks w WHERE next_attempt_at <= ? AND NOT EXISTS ("
+            "SELECT 1 FROM webhooks p WHERE p.job_name = w.job_name AND p.id < w.id AND p.next_attempt_at IS NOT NULL"
+            ") ORDER BY id LIMIT ?",
+            (time.time(), limit),
+        )
+
+    async def update_webhook(self, webhook_id: int, attempts: int, next_attempt_at: Optional[float], error: Optional[str]):
+        """Reschedule a delivery, or close it with next_attempt_at=None (kept for inspection when it failed)"""
+        if error is None:
+            await asyncio.to_thread(self._execute, "DELETE FROM webhooks WHERE id = ?", (webhook_id,))
+        else:
+            await asyncio.to_thread(
+                self._execute,
+                "UPDATE webhooks SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (attempts, next_attempt_at, error, webhook_id),
+            )
+
+store = JobStore()
+
+class WebhookDispatcher:
+    """Posts job events to callback URLs from a persistent retry queue in the job store"""
+
+    FINAL_STATUSES = ("completed", "failed", "auth_timeout", "cancelled")
+
+    def __init__(self, host_concurrency: int = WEBHOOK_HOST_CONCURRENCY):
+        self.host_concurrency = host_concurrency
+        self._callbacks: Dict[str, str] = {}
+        self._sent: Dict[str, set] = {}
+        self._pools: Dict[Tuple[str, str, int], _HTTPConnectionPool] = {}
+        self._inflight: set = set()
+        self._tasks: set = set()
+        # Latest task writing each job's events to the queue; the next one waits for it
+        self._enqueuing: Dict[str, asyncio.Task] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._ssl = ssl.create_default_context()
+
+    def register(self, name: str, url: str, sent: Tuple[str, ...] = ()):
+        self._callbacks[name] = url
+        self._sent[name] = set(sent)
+
+    async def load(self):
+        """Resume callbacks of jobs that were still running when the API stopped"""
+        for record in await store.unfinished():
+            if record["callback_url"]:
+                self.register(record["name"], record["callback_url"], ("auth_code",) if record["auth_code"] else ())
+
+    def observe(self, name: str, status: str, auth_code: Optional[str] = None,
+                created: Optional[List[str]] = None, failed: Optional[List[str]] = None, **fields):
+        """Queue the events a job's new state triggers; called on every published change"""
+        url = self._callbacks.get(name)
+        if url is None:
+            return
+        sent = self._sent[name]
+        payload = {
+            "container_id": name,
+            "status": status,
+            "auth_code": auth_code,
+            "auth_url": "https://microsoft.com/devicelogin",
+            **fields,
+        }
+        events = []
+        if auth_code and "auth_code" not in sent:
+            sent.add("auth_code")
+            events.append(("auth_code", payload))
+        if status in self.FINAL_STATUSES:
+            # The final event is the last one a job sends
+            del self._callbacks[name], self._sent[name]
+            events.append((status, {**payload, "created_mailboxes": created or [], "failed_mailboxes": failed or []}))
+        if events:
+            # Deliveries go out in queue order, so a job's events are queued one after another
+            task = asyncio.create_task(self._enqueue(name, url, events, self._enqueuing.get(name)))
+            self._enqueuing[name] = task
+            self._tasks.add(task)
+            task.add_done_callback(lambda done: self._enqueued(name, done))
+
+    def _enqueued(self, name: str, task: asyncio.Task):
+        self._tasks.discard(task)
+        if self._enqueuing.get(name) is task:
+            del self._enqueuing[name]
+
+    async def _enqueue(self, name: str, url: str, events: List[Tuple[str, Dict[str, Any]]],
+                       previous: Optional[asyncio.Task]):
+        if previous is not None:
+            await asyncio.wait([previous])
+        for event, payload in events:
+            try:
+                await store.add_webhook(name, url, event, {"event": event, "timestamp": time.time(), **payload})
+            except Exception as e:
+                print(f"DEBUG: Failed to queue {event} webhook for {name}: {e}")
+        self._wake.set()
+
+    def _pool(self, url) -> _HTTPConnectionPool:
+        key = (url.scheme, url.hostname, url.port or (443 if url.scheme == "https" else 80))
+        pool = self._pools.get(key)
+        if pool is None:
+            scheme, hostname, port = key
+            context = self._ssl if scheme == "https" else None
+            opener: StreamOpener = lambda: asyncio.open_connection(hostname, port, ssl=context)
+            default_port = port == (443 if scheme == "https" else 80)
+            pool = self._pools[key] = _HTTPConnectionPool(opener, hostname if default_port else f"{hostname}:{port}",
+                                                          self.host_concurrency)
+        return pool
+
+    async def _deliver(self, delivery: Dict[str, Any]):
+        url = urlsplit(delivery["url"])
+        target = (url.path or "/") + (f"?{url.query}" if url.query else "")
+        attempts = delivery["attempts"] + 1
+        try:
+            try:
+                status, _, _ = await asyncio.wait_for(self._pool(url).request(
+                    "POST", target, delivery["payload"].encode(),
+                    {"Content-Type": "application/json", "X-Webhook-Event": delivery["event"],
+                     "X-Webhook-Delivery": str(delivery["id"])}
+                ), WEBHOOK_TIMEOUT)
+                error = None if 200 <= status < 300 else f"HTTP {status}"
+                # Client errors other than timeouts / rate limiting will not go away by retrying
+                retry = status >= 500 or status in (408, 429)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+                error, retry = f"{type(e).__name__}: {e}", True
+            next_attempt_at = None
+            if error is not None and retry and attempts < WEBHOOK_MAX_ATTEMPTS:
+                delay = min(WEBHOOK_BACKOFF_BASE * 2 ** (attempts - 1), WEBHOOK_BACKOFF_MAX)
+                next_attempt_at = time.time() + delay * random.uniform(0.8, 1.2)
+            elif error is not None:
+                print(f"DEBUG: Giving up {delivery['event']} webhook for {delivery['job_name']}: {error}")
+            await store.update_webhook(delivery["id"], attempts, next_attempt_at, error)
+        except Exception as e:
+            print(f"DEBUG: Webhook delivery {delivery['id']} failed: {e}")
+        finally:
+            self._inflight.discard(delivery["id"])
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            try:
+                for delivery in await store.due_webhooks():
+                    if delivery["id"] not in self._inflight:
+                        self._inflight.add(delivery["id"])
+                        task = asyncio.create_task(self._deliver(delivery))
+                        self._tasks.add(task)
+                        task.add_done_callback(self._tasks.discard)
+            except Exception as e:
+                print(f"DEBUG: Webhook queue scan failed: {e}")
+            # Retries come due without a wake-up, so rescan at least once a second. asyncio.timeout rather
+            # than wait_for: on 3.11 wait_for loses a cancellation that arrives as a delivery sets the event
+            try:
+                async with asyncio.timeout(1):
+                    await self._wake.wait()
+            except TimeoutError:
+                pass
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        # Events observed last are still written to the queue, to be delivered after a restart
+        await asyncio.gather(*self._enqueuing.values(), return_exceptions=True)
+        for pool in self._pools.values():
+            await pool.close()
+
+webhooks = WebhookDispatcher()
+
+
+class LogRecorder:
+    """Saves the complete, timed log stream of each finished job for replay and parser regression tests"""
+
+    def __init__(self, directory: str = LOG_CAPTURE_DIR):
+        self.directory = directory
+        self._captured: set = set()
+        self._tasks: set = set()
+
+    def observe(self, job: Job, parsed: ParsedStatus):
+        if not self.directory or job.running or job.finished_at is None or job.name in self._captured:
+            return
+        self._captured.add(job.name)
+        task = asyncio.create_task(self._capture(job, parsed))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _capture(self, job: Job, parsed: ParsedStatus):
+        try:
+            # Re-read from the start: the job table only retains the tail of long logs
+            raw = await docker.container_logs(job.docker_id, timestamps=1)
+            entries = []
+            for entry in raw.splitlines():
+                stamp, _, line = entry.partition(" ")
+                try:
+                    entries.append((parse_docker_timestamp(stamp), line))
+                except ValueError:
+                    entries.append((entries[-1][0] if entries else 0, entry))
+            record = await store.get(job.name)
+            header = {
+                "name": job.name,
+                "domain": record["domain"] if record else None,
+                "started_at": job.started_at,
+                "finished_at": job.finished_at,
+                "exit_code": job.exit_code,
+                "result": {
+                    "status": parsed.status,
+                    "auth_code": parsed.auth_code,
+                    "created": parsed.created,
+                    "failed": parsed.failed,
+                    "ip_info": parsed.ip_info,
+                },
+            }
+            os.makedirs(self.directory, exist_ok=True)
+            await asyncio.to_thread(write_log_capture, os.path.join(self.directory, f"{job.name}.log.gz"), header, entries)
+        except Exception as e:
+            print(f"DEBUG: Log capture for {job.name} failed: {e}")
+
+    async def stop(self):
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+recorder = LogRecorder()
+
+def publish_job(job: Job):
+    """Propagate a change of a job's parsed state or lifecycle to the job store"""
+    parsed = job.parser.result(job.running)
+    store.record(
+        job.name,
+        docker_id=job.docker_id,
+        host=docker.host_of(job.name),
+        status=parsed.status,
+        auth_code=parsed.auth_code,
+        created_mailboxes=parsed.created,
+        failed_mailboxes=parsed.failed,
+        ip_info=parsed.ip_info,
+        exit_code=job.exit_code,
+        started_at=job.started_at,
+        auth_code_at=job.auth_code_at,
+        authenticated_at=job.authenticated_at,
+        finished_at=job.finished_at,
+    )
+    job_updates.notify(job.name)
+    webhooks.observe(job.name, parsed.status, parsed.auth_code, parsed.created, parsed.failed,
+                     ip_info=parsed.ip_info, exit_code=job.exit_code)
+    recorder.observe(job, parsed)
+    observe_finished_job(job, parsed)
+
+async def job_started_at(name: str, fallback: float) -> float:
+    """Return when a job started according to the job store, or `fallback` for containers it does not know"""
+    # A runner claimed from the pool keeps the pool container's creation and start times, so neither
+    # says when the job began
+    record = await store.get(name)
+    if record is None:
+        return fallback
+    return record["started_at"] or record["submitted_at"] or fallback
+
+async def tail_container_logs(container_id: str, listed: Optional[Dict[str, Any]] = None) -> Tuple[Job, bool]:
+    """Advance the log cursor of a container and return its job state and running flag"""
+    if listed is not None and listed.get("State") == "running":
+        # A container listing already says it is running; stopped ones are inspected for exit details
+        info, state, is_running = listed, {}, True
+    else:
+        # Inspect first so that a container reported as stopped has no unread output
+        with span("backend.inspect"):
+            info = await docker.inspect_container(container_id)
+        state = info.get("State", {})
+        is_running = bool(state.get("Running"))
     
-    # Look for the consolidated proxy check line
-    proxy_check_match = re.search(r'PROXY_CHECK: (IP=.+)', logs)
-    if proxy_check_match:
-        return proxy_check_match.group(1)
+    job = jobs.upsert(container_id, info["Id"])
+    async with job.lock:
+        params: Dict[str, Any] = {"timestamps": 1}
+        if job.cursor_ns:
+            params["since"] = format_since(job.cursor_ns)
+        started = time.perf_counter()
+        with span("backend.logs"):
+            raw = await docker.container_logs(job.docker_id, **params)
+        docker_logs_seconds.observe(time.perf_counter() - started)
+        with span("parse.timestamps", characters=len(raw)):
+            job.feed_timestamped(raw)
+        if not job.following:
+            job.running = is_running
+            job.synced = not is_running
+        if job.started_at is None and state.get("StartedAt", "").startswith("2"):
+            job.started_at = await job_started_at(job.name, parse_docker_timestamp(state["StartedAt"]) / 1e9)
+        if not is_running and job.finished_at is None:
+            job.exit_code = state.get("ExitCode")
+            job.finished_at = parse_docker_timestamp(state["FinishedAt"]) / 1e9 if state.get("FinishedAt", "").startswith("2") else time.time()
+    publish_job(job)
+    if not is_running:
+        scheduler.release(container_id)
     
-    # Fallback: extract individual components
-    ip_match = re.search(r'IP_ADDRESS: (.+)', logs)
-    country_match = re.search(r'COUNTRY: (.+)', logs)
-    state_match = re.search(r'STATE: (.+)', logs)
-    city_match = re.search(r'CITY: (.+)', logs)
+    return job, is_running
+
+async def reconcile_job_store():
+    """Bring the job store in line with the containers that exist after a restart"""
+    containers = {
+        c["Names"][0].lstrip("/"): c
+        for c in await docker.list_containers(all=True, filters={"name": [JOB_NAME_PREFIX]})
+        if c["Names"][0].lstrip("/").startswith(JOB_NAME_PREFIX)
+    }
     
-    if ip_match:
-        ip = ip_match.group(1).strip()
-        country = country_match.group(1).strip() if country_match else "Unknown"
-        state = state_match.group(1).strip() if state_match else "Unknown"
-        city = city_match.group(1).strip() if city_match else "Unknown"
-        
-        return f"IP={ip} | Country={country} | State={state} | City={city}"
+    # Jobs whose container vanished while the API was down can no longer make progress
+    now = time.time()
+    for record in await store.unfinished():
+        if record["name"] not in containers and record["host"] not in docker.unreachable:
+            status = "completed" if record["created_mailboxes"] or record["failed_mailboxes"] else "failed"
+            store.record(record["name"], status=status, finished_at=now)
+            webhooks.observe(record["name"], status, record["auth_code"], record["created_mailboxes"],
+                             record["failed_mailboxes"], ip_info=record["ip_info"], exit_code=record["exit_code"])
     
-    return None
+    # Snapshot results of containers that finished unobserved; running ones are picked up by the watcher
+    semaphore = asyncio.Semaphore(8)
+    
+    async def snapshot(name: str):
+        async with semaphore:
+            record = await store.get(name)
+            if record is None or record["finished_at"] is None:
+                await tail_container_logs(name)
+    
+    await asyncio.gather(*(snapshot(name) for name, c in containers.items() if c.get("State") != "running"),
+                         return_exceptions=True)
+    for name, container in containers.items():
+        if container.get("State") == "running" and await store.get(name) is None:
+            created = float(container.get("Created", now))
+            store.record(name, docker_id=container["Id"], domain=container.get("Labels", {}).get(LABEL_DOMAIN),
+                         status="starting", submitted_at=created, started_at=created)
+    await store.flush()
+
+class JobWatcher:
+    """Follows Docker container events and streams runner logs into the job table"""
+
+    def __init__(self, client: ExecutionBackend, table: JobTable):
+        self.docker = client
+        self.jobs = table
+        self.live = False
+        self._task: Optional[asyncio.Task] = None
+        self._followers: Dict[str, asyncio.Task] = {}
+        self._exits: set = set()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        tasks = [t for t in [self._task, *self._followers.values()] if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.live = False
+
+    async def _run(self):
+        backoff = 1
+        while True:
+            try:
+                events = await self.docker.events(filters={"type": ["container"], "event": ["start", "rename", "die", "destroy"]})
+                # Subscribe before listing so that no transition falls between the two
+                await self._seed()
+                self.live, backoff = True, 1
+                async for event in events:
+                    self._handle_event(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"DEBUG: Docker event stream failed: {e}")
+            self.live = False
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    async def _seed(self):
+        for container in await self.docker.list_containers(all=True, filters={"name": [JOB_NAME_PREFIX]}):
+            name = container["Names"][0].lstrip("/")
+            if not name.startswith(JOB_NAME_PREFIX):
+                continue
+            job = self.jobs.upsert(name, container["Id"])
+            job.running = container.get("State") == "running"
+            if job.running:
+                job.started_at = job.started_at or await job_started_at(name, float(container.get("Created", time.time())))
+                self._follow(job)
+
+    def _handle_event(self, event: Dict[str, Any]):
+        actor = event.get("Actor", {})
+        name = actor.get("Attributes", {}).get("name", "")
+        if not name.startswith(JOB_NAME_PREFIX):
+            return
+        action = event.get("Action") or event.get("status")
+        timestamp = event.get("timeNano", 0) / 1e9 or time.time()
+        # Claimed pool runners are already running and become jobs when renamed
+        if action in ("start", "rename"):
+            job = self.jobs.upsert(name, actor["ID"])
+            job.running, job.synced = True, False
+            job.started_at, job.finished_at, job.exit_code = timestamp, None, None
+            publish_job(job)
+            self._follow(job)
+        elif action == "die":
+            job = self.jobs.get(name)
+            if job is not None:
+                exit_code = actor.get("Attributes", {}).get("exitCode")
+                task = asyncio.create_task(self._on_exit(job, int(exit_code) if exit_code else None, timestamp))
+                self._exits.add(task)
+                task.add_done_callback(self._exits.discard)
+        elif action == "destroy":
+            job = self.jobs.get(name)
+            follower = self._followers.pop(name, None)
+            if follower is not None:
+                follower.cancel()
+            if job is not None:
+                job.running, job.following = False, False
+            scheduler.release(name)
+
+    async def _on_exit(self, job: Job, exit_code: Optional[int], timestamp: float):
+        # Let the follower drain the final lines before the job is reported as stopped
+        follower = self._followers.get(job.name)
+        if follower is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(follower), 10)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
+        job.running, job.exit_code, job.finished_at = False, exit_code, timestamp
+        publish_job(job)
+        scheduler.release(job.name)
+
+    def _follow(self, job: Job):
+        if job.name in self._followers:
+            return
+        job.following = True
+        self._followers[job.name] = asyncio.create_task(self._stream_logs(job))
+
+    async def _stream_logs(self, job: Job):
+        try:
+            params: Dict[str, Any] = {"timestamps": 1}
+            if job.cursor_ns:
+                params["since"] = format_since(job.cursor_ns)
+            pending = ""
+            async for text in await self.docker.follow_logs(job.docker_id, **params):
+                pending += text
+                cut = pending.rfind("\n") + 1
+                if cut:
+                    async with job.lock:
+                        job.feed_timestamped(pending[:cut])
+                    pending = pending[cut:]
+                    publish_job(job)
+            async with job.lock:
+                if pending:
+                    job.feed_timestamped(pending)
+                # The stream only ends once the container has stopped
+                job.synced = True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"DEBUG: Log stream for {job.name} failed: {e}")
+        finally:
+            job.following = False
+            if self._followers.get(job.name) is asyncio.current_task():
+                del self._followers[job.name]
+
+watcher = JobWatcher(docker, jobs)
+
+async def remove_job_container(container_id: str, grace: int = 10, snapshot: bool = True):
+    """Stop a job container, snapshot its final results into the job store, then remove it"""
+    if snapshot:
+        await docker.stop_container(container_id, timeout=grace)
+        # The logs are gone once the container is removed
+        await tail_container_logs(container_id)
+        await store.flush()
+    
+    await docker.remove_container(container_id, force=True)
+    jobs.pop(container_id)
+    status_cache.invalidate(container_id)
+
+class ContainerReaper:
+    """Periodically removes job containers past their retention, in parallel without blocking requests"""
+
+    RETENTION = {
+        "completed": RETENTION_COMPLETED,
+        "failed": RETENTION_FAILED,
+        "auth_timeout": RETENTION_AUTH_TIMEOUT,
+    }
+
+    def __init__(self, client: ExecutionBackend, interval: float = REAPER_INTERVAL, concurrency: int = REAPER_CONCURRENCY):
+        self.docker = client
+        self.interval = interval
+        self.concurrency = concurrency
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            try:
+                removed = await self.sweep()
+                if removed:
+                    print(f"DEBUG: Reaper removed {removed} job containers")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"DEBUG: Reaper sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def sweep(self) -> int:
+        """Remove every job container whose retention ran out; returns how many were removed"""
+        now = time.time()
+        containers = [
+            c for c in await self.docker.list_containers(all=True, filters={"name": [JOB_NAME_PREFIX]})
+            if c["Names"][0].lstrip("/").startswith(JOB_NAME_PREFIX)
+        ]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        
+        async def reap(container: Dict[str, Any]) -> bool:
+            name = container["Names"][0].lstrip("/")
+            async with semaphore:
+                try:
+                    if container.get("State") == "running":
+                        # Stuck jobs are killed without a grace period once they exceed the maximum runtime
+                        if now - await job_started_at(name, float(container.get("Created", now))) < JOB_MAX_RUNTIME:
+                            return False
+                        await remove_job_container(name, grace=0)
+                        return True
+                    
+                    # Snapshot results first: the finish time and final status come from the job's logs
+                    record = await store.get(name)
+                    if record is None or record["finished_at"] is None:
+                        await tail_container_logs(name)
+                        await store.flush()
+                        record = await store.get(name)
+                    finished_at = record["finished_at"] if record and record["finished_at"] else now
+                    retention = self.RETENTION.get(record["status"] if record else None, RETENTION_FAILED)
+                    if now - finished_at < retention:
+                        return False
+                    await remove_job_container(name, snapshot=False)
+                    return True
+                except DockerError as e:
+                    if e.status != 404:
+                        print(f"DEBUG: Reaper could not remove {name}: {e}")
+                    return False
+        
+        return sum(await asyncio.gather(*(reap(c) for c in containers)))
+
+reaper = ContainerReaper(docker)
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    """Open the job store, reconcile it with Docker and start the job watcher"""
+    store.open()
+    store.start()
+    await webhooks.load()
+    webhooks.start()
+    try:
+        await reconcile_job_store()
+    except Exception as e:
+        print(f"DEBUG: Job store reconciliation failed: {e}")
+    if WATCH_DOCKER_EVENTS:
+        watcher.start()
+    runner_pool.start()
+    scheduler.start()
+    reaper.start()
+
+@app.on_event("shutdown")
+async def close_docker_client():
+    """Stop background tasks, flush the job store and traces and close pooled Docker API connections"""
+    await reaper.stop()
+    await scheduler.stop()
+    await runner_pool.stop()
+    await watcher.stop()
+    await recorder.stop()
+    await webhooks.stop()
+    await store.close()
+    await docker.close()
+    await asyncio.to_thread(tracer.close)
+
+class ProfilerBusy(Exception):
+    """A profile is already being taken"""
+
+class SamplingProfiler:
+    """Samples the Python stacks of all threads at a fixed interval and counts them in collapsed-stack format"""
+
+    # Innermost frames of threads that are waiting rather than working: the event loop polling (asyncio's
+    # selector, or uvloop's native loop under asyncio.run) and idle executor workers
+    IDLE_FRAMES = frozenset({("selectors.py", "select"), ("runners.py", "run"), ("threading.py", "wait"),
+                             ("queue.py", "get"), ("thread.py", "_worker")})
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def run(self, seconds: float, interval: float, idle: bool = False) -> Tuple[Dict[str, int], int]:
+        """Sample for `seconds` from the calling thread; returns stack counts and the number of sampling rounds"""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        try:
+            me = threading.get_ident()
+            names: Dict[int, str] = {}
+            labels: Dict[Any, str] = {}
+            stacks: Dict[str, int] = {}
+            rounds = 0
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    code = frame.f_code
+                    if not idle and (os.path.basename(code.co_filename), code.co_name) in self.IDLE_FRAMES:
+                        continue
+                    frames = []
+                    while frame is not None:
+                        code = frame.f_code
+                        label = labels.get(code)
+                        if label is None:
+                            label = labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                        frames.append(label)
+                        frame = frame.f_back
+                    if ident not in names:
+                        names.update((thread.ident, thread.name) for thread in threading.enumerate())
+                    frames.append(names.get(ident, f"thread-{ident}"))
+                    stack = ";".join(reversed(frames))
+                    stacks[stack] = stacks.get(stack, 0) + 1
+                rounds += 1
+                time.sleep(interval)
+            return stacks, rounds
+        finally:
+            self._lock.release()
+
+profiler = SamplingProfiler()
+
+def require_admin(request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(404, "Not Found")
+    supplied = request.headers.get("authorization", "")
+    if not supplied.lower().startswith("bearer ") or not hmac.compare_digest(supplied[7:].strip().encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(401, "Admin token required", headers={"WWW-Authenticate": "Bearer"})
+
+@app.post("/debug/profile")
+async def profile_process(request: Request, seconds: float = 10, interval: float = 0.005, idle: bool = False):
+    """
+    Sample the stacks of every thread (the event loop included) for `seconds` and return them in
+    collapsed-stack format for flame graph tools. Waiting threads are left out unless `idle` is set.
+    Requires `Authorization: Bearer <ADMIN_TOKEN>`.
+    """
+    require_admin(request)
+    if not 0 < seconds <= PROFILE_MAX_SECONDS:
+        raise HTTPException(400, f"seconds must be greater than 0 and at most {PROFILE_MAX_SECONDS:g}")
+    if not 0.001 <= interval <= 1:
+        raise HTTPException(400, "interval must be between 0.001 and 1 seconds")
+    try:
+        stacks, rounds = await asyncio.to_thread(profiler.run, seconds, interval, idle)
+    except ProfilerBusy:
+        raise HTTPException(409, "A profile is already being taken")
+    body = "".join(f"{stack} {count}\n" for stack, count in sorted(stacks.items(), key=lambda item: -item[1]))
+    return Response(body, media_type="text/plain", headers={"X-Profile-Rounds": str(rounds)})
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics: launch, log fetch and parse latencies, job phases, queue gauges and mailbox counts"""
+    # Starlette appends the charset to text/* media types
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/health")
 async def health_check():
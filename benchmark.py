@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Offline micro-benchmarks for the parsing, generation and script-building hot paths.
+
+Runs against synthetic runner logs (legacy text markers and JSON events) from a few KB up to
+--max-size, writes the timings to a JSON file and optionally compares them with an earlier run:
+
+    python benchmark.py --output bench-new.json --compare bench-old.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import app
+
+SIZES = [4 << 10, 1 << 20, 10 << 20, 100 << 20]
+VARIATION_COUNTS = [1, 10, 100, 431]  # 431 is the most generate_email_variations can produce
+
+NOISE_LINES = [
+    "VERBOSE: Loading module from path '/usr/local/share/powershell/Modules/ExchangeOnlineManagement/3.4.0/netCore/Microsoft.Exchange.Management.dll'.",
+    "Some progress line with numbers 12345 and words like domain and mailbox",
+    "----------------------------------------------------------------------------------------",
+    "WARNING: The names of some imported commands from the module 'tmpEXO' include unapproved verbs.",
+]
+
+def text_log(size: int, seed: int = 1) -> str:
+    """Runner output in the legacy text format, padded with module noise to `size` characters"""
+    rng = random.Random(seed)
+    head = [
+        "=== STARTING MAILBOX CREATION FOR EXAMPLE.COM ===",
+        "PROXY_CHECK: IP=203.0.113.7 | Country=US | State=California | City=Los Angeles",
+        "IP_ADDRESS: 203.0.113.7",
+        "To sign in, use a web browser to open the page https://microsoft.com/devicelogin and enter the code ABCD12345 to authenticate.",
+        "This V3 EXO PowerShell module contains new REST API backed Exchange Online cmdlets",
+        "=== CREATING MAILBOXES ===",
+    ]
+    lines, total, i = list(head), sum(len(line) + 1 for line in head), 0
+    while total < size:
+        if i % 50 == 0:
+            line = f"SUCCESS: Created mailbox user{i}@example.com"
+        elif i % 50 == 25:
+            line = f"FAILED: Could not create user{i}@example.com - already exists"
+        else:
+            line = rng.choice(NOISE_LINES)
+        lines.append(line)
+        total += len(line) + 1
+        i += 1
+    lines.append("=== MAILBOX CREATION COMPLETED ===")
+    return "\n".join(lines) + "\n"
+
+def event_log(size: int, seed: int = 1) -> str:
+    """Runner output in the JSON event protocol, padded with log events to `size` characters"""
+    rng = random.Random(seed)
+    ts = 1733063422.0
+
+    def event(kind: str, **fields) -> str:
+        return json.dumps({"type": kind, "ts": round(ts, 3), **fields}, separators=(",", ":"))
+
+    head = [
+        event("start", protocol=1, domain="example.com", container="0123456789ab"),
+        event("proxy_check", ip="203.0.113.7", country="US", state="California", city="Los Angeles"),
+        event("auth_code", code="ABCD12345", url="https://microsoft.com/devicelogin"),
+        event("authenticated"),
+        event("creating", count=431),
+    ]
+    lines, total, i = list(head), sum(len(line) + 1 for line in head), 0
+    while total < size:
+        ts += 0.01
+        if i % 50 == 0:
+            line = event("mailbox", email=f"user{i}@example.com", ok=True)
+        elif i % 50 == 25:
+            line = event("mailbox", email=f"user{i}@example.com", ok=False, error="already exists")
+        else:
+            line = event("log", level="info", message=rng.choice(NOISE_LINES))
+        lines.append(line)
+        total += len(line) + 1
+        i += 1
+    lines.append(event("completed"))
+    return "\n".join(lines) + "\n"
+
+def measure(fn, min_time: float, max_rounds: int = 50):
+    """Run `fn` repeatedly for at least `min_time` seconds (and at least 3 times); returns per-call timings"""
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < 3 or (time.perf_counter() - started < min_time and len(timings) < max_rounds):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return timings
+
+def summarize(name: str, params: dict, timings: list, size: int = None) -> dict:
+    result = {
+        "name": name,
+        "params": params,
+        "rounds": len(timings),
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "mean_s": statistics.fmean(timings),
+    }
+    if size:
+        result["mb_per_s"] = size / (1 << 20) / result["median_s"]
+    return result
+
+def run(max_size: int, min_time: float, only: str = None) -> list:
+    results = []
+
+    def record(name: str, params: dict, fn, size: int = None):
+        if only and only not in name:
+            return
+        result = summarize(name, params, measure(fn, min_time), size)
+        results.append(result)
+        throughput = f"  {result['mb_per_s']:8.1f} MB/s" if size else ""
+        print(f"{name:<28} {json.dumps(params):<42} {result['median_s'] * 1000:10.3f} ms{throughput}", flush=True)
+
+    for size in [s for s in SIZES if s <= max_size]:
+        for fmt, build in (("text", text_log), ("events", event_log)):
+            logs = build(size)
+            params = {"format": fmt, "size": size}
+            record("parse_final_results", params, lambda logs=logs: app.parse_final_results(logs), size)
+            record("extract_auth_code", params, lambda logs=logs: app.extract_auth_code(logs), size)
+            record("is_authenticated_from_logs", params, lambda logs=logs: app.is_authenticated_from_logs(logs), size)
+            record("extract_ip_info", params, lambda logs=logs: app.extract_ip_info(logs), size)
+            record("parse_container_status", params, lambda logs=logs: app.parse_container_status(logs), size)
+
+            # Incremental path: the log arrives in 64 KB pieces the way followers and polls feed it
+            def incremental(logs=logs):
+                parser = app.LogParser()
+                for start in range(0, len(logs), 65536):
+                    parser.feed(logs[start:start + 65536])
+                parser.flush()
+                parser.result(True)
+            record("LogParser.feed", params, incremental, size)
+            # Bound as defaults above, so the closures keep no reference once this size is done
+            del logs, incremental
+
+    for count in VARIATION_COUNTS:
+        params = {"variations": count}
+        record("generate_email_variations", params, lambda: app.generate_email_variations("Michelle", "Martin", count))
+        variations = app.generate_email_variations("Michelle", "Martin", count)
+        # create_powershell_script was replaced by a fixed runner script fed with a JSON payload
+        record("create_job_payload", params, lambda: json.dumps(app.create_job_payload(
+            variations, "example.com", "Secret123!", "Michelle", "Martin")))
+    record("runner_command", {}, lambda: app.runner_command())
+
+    return results
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+    }
+
+def compare(results: list, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = {(r["name"], json.dumps(r["params"], sort_keys=True)): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path} (median, >1.00x = faster now):")
+    for result in results:
+        old = baseline.get((result["name"], json.dumps(result["params"], sort_keys=True)))
+        if old:
+            speedup = old["median_s"] / result["median_s"]
+            flag = "  REGRESSION" if speedup < 0.9 else ""
+            print(f"{result['name']:<28} {json.dumps(result['params']):<42} {speedup:6.2f}x{flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="benchmark-results.json", help="where to write the JSON results")
+    parser.add_argument("--max-size", type=int, default=max(SIZES), help="largest synthetic log in bytes")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds to spend on each benchmark")
+    parser.add_argument("--only", help="run only benchmarks whose name contains this text")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = run(args.max_size, args.min_time, args.only)
+    with open(args.output, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+    print(f"\nWrote {len(results)} results to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    sys.exit(main())
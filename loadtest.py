@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Load generator for the API's own throughput: job submission and status polling.
+
+Start the API on the in-process fake backend so that no containers are launched, e.g.
+
+    EXECUTION_BACKEND=fake MAX_RUNNING_JOBS=5000 JOB_QUEUE_SIZE=5000 JOB_DB_PATH=/tmp/load.db \\
+        uvicorn app:app --port 8000
+
+then submit jobs and poll their status with many concurrent clients:
+
+    python loadtest.py --url http://127.0.0.1:8000 --jobs 2000 --concurrency 200 --pollers 500 --duration 30
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from app import _HTTPConnectionPool
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+class Phase:
+    """Latencies and response codes of one kind of request"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies = []
+        self.codes = Counter()
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def add(self, code, latency: float):
+        self.codes[code] += 1
+        self.latencies.append(latency)
+
+    def summary(self) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        latencies = sorted(self.latencies)
+        return {
+            "name": self.name,
+            "requests": len(latencies),
+            "seconds": elapsed,
+            "requests_per_s": len(latencies) / elapsed if elapsed else 0.0,
+            "codes": {str(code): count for code, count in sorted(self.codes.items(), key=str)},
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        }
+
+async def timed(pool: _HTTPConnectionPool, phase: Phase, method: str, target: str, payload=None) -> bytes:
+    body = json.dumps(payload).encode() if payload is not None else None
+    headers = {"Content-Type": "application/json"} if body is not None else None
+    started = time.perf_counter()
+    try:
+        status, _, data = await pool.request(method, target, body, headers)
+    except (OSError, asyncio.IncompleteReadError) as e:
+        phase.add(type(e).__name__, time.perf_counter() - started)
+        return b""
+    phase.add(status, time.perf_counter() - started)
+    return data if status == 200 else b""
+
+async def create_jobs(pool: _HTTPConnectionPool, count: int, concurrency: int, variations: int) -> tuple:
+    phase, created = Phase("create"), []
+    counter = iter(range(count))
+
+    async def worker():
+        for i in counter:
+            data = await timed(pool, phase, "POST", "/create-mailboxes", {
+                "domain": f"load{i}.example.com",
+                "sender_name": "Load Test",
+                "password": "not-used",
+                "variations": variations,
+            })
+            if data:
+                created.append(json.loads(data)["container_id"])
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    phase.finished = time.perf_counter()
+    return phase, created
+
+async def poll_status(pool: _HTTPConnectionPool, container_ids: list, pollers: int, duration: float) -> Phase:
+    phase = Phase("status")
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            await timed(pool, phase, "GET", f"/status/{random.choice(container_ids)}")
+
+    await asyncio.gather(*(worker() for _ in range(pollers)))
+    phase.finished = time.perf_counter()
+    return phase
+
+async def run(args) -> list:
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    pool = _HTTPConnectionPool(lambda: asyncio.open_connection(host, port), f"{host}:{port}",
+                               max(args.concurrency, args.pollers))
+    try:
+        create, created = await create_jobs(pool, args.jobs, args.concurrency, args.variations)
+        phases = [create]
+        if created and args.duration > 0:
+            phases.append(await poll_status(pool, created, args.pollers, args.duration))
+        # One more pass shows how far the simulated jobs got
+        progress = Phase("final-status")
+        statuses = Counter()
+        for start in range(0, len(created), 500):
+            data = await timed(pool, progress, "POST", "/status/batch", {"container_ids": created[start:start + 500]})
+            if data:
+                statuses.update(job["status"] for job in json.loads(data)["jobs"])
+        print(f"job statuses: {dict(statuses)}")
+        return [phase.summary() for phase in phases]
+    finally:
+        await pool.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="base URL of the API under test")
+    parser.add_argument("--jobs", type=int, default=1000, help="jobs to submit")
+    parser.add_argument("--concurrency", type=int, default=100, help="submissions in flight at once")
+    parser.add_argument("--variations", type=int, default=10, help="mailboxes per job")
+    parser.add_argument("--pollers", type=int, default=200, help="concurrent status pollers")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to poll status for")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    for result in results:
+        print(f"{result['name']:<8} {result['requests']:>8} req {result['requests_per_s']:>9.1f} req/s  "
+              f"p50 {result['p50_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  "
+              f"max {result['max_ms']:8.2f} ms  codes {result['codes']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"url": args.url, "timestamp": time.time(), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    sys.exit(main())
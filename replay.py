@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Replay captured runner logs (see LOG_CAPTURE_DIR) through the job pipeline.
+
+Each capture is fed line by line into a Job exactly as the log follower would, with the
+original spacing between lines scaled by --speed (0 replays as fast as possible). The
+parsed result is compared with the one recorded at capture time, so a directory of
+captures doubles as a parser regression corpus:
+
+    python replay.py data/captures --speed 0 --check
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import app
+
+def capture_paths(targets: list) -> list:
+    paths = []
+    for target in targets:
+        if os.path.isdir(target):
+            paths.extend(sorted(os.path.join(target, name) for name in os.listdir(target) if name.endswith(".log.gz")))
+        else:
+            paths.append(target)
+    return paths
+
+async def replay(path: str, speed: float) -> dict:
+    header, entries = app.read_log_capture(path)
+    job = app.Job(header["name"], header["name"])
+    base_ns = int((header.get("started_at") or time.time()) * 1e9)
+    started, busy, stamp_ns, size = time.monotonic(), 0.0, 0, 0
+    for offset, line in entries:
+        if speed:
+            delay = started + offset / speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        # Followed lines always carry distinct Docker timestamps
+        stamp_ns = max(base_ns + int(offset * 1e9), stamp_ns + 1)
+        chunk = f"{app.format_docker_timestamp(stamp_ns)} {line}\n"
+        size += len(line) + 1
+        t0 = time.perf_counter()
+        job.feed_timestamped(chunk)
+        # Every followed chunk is published, which derives the full status
+        job.parser.result(True)
+        busy += time.perf_counter() - t0
+    t0 = time.perf_counter()
+    parsed = job.parser.result(False)
+    busy += time.perf_counter() - t0
+    result = {
+        "status": parsed.status,
+        "auth_code": parsed.auth_code,
+        "created": parsed.created,
+        "failed": parsed.failed,
+        "ip_info": parsed.ip_info,
+    }
+    expected = header.get("result", {})
+    return {
+        "capture": path,
+        "lines": len(entries),
+        "bytes": size,
+        "recorded_seconds": entries[-1][0] if entries else 0.0,
+        "replay_seconds": time.monotonic() - started,
+        "parse_seconds": busy,
+        "mb_per_s": size / (1 << 20) / busy if busy else 0.0,
+        "mismatches": sorted(key for key in result if key in expected and expected[key] != result[key]),
+    }
+
+async def run(paths: list, speed: float, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(path: str) -> dict:
+        async with semaphore:
+            return await replay(path, speed)
+
+    return await asyncio.gather(*(limited(path) for path in paths))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("captures", nargs="+", help="capture files or directories of them")
+    parser.add_argument("--speed", type=float, default=1, help="replay speed-up; 0 feeds lines without waiting")
+    parser.add_argument("--concurrency", type=int, default=100, help="captures replayed at once")
+    parser.add_argument("--check", action="store_true", help="exit non-zero if a parsed result differs from the recorded one")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args()
+
+    paths = capture_paths(args.captures)
+    if not paths:
+        parser.error("no captures found")
+    results = asyncio.run(run(paths, args.speed, args.concurrency))
+    for result in results:
+        flag = f"  MISMATCH {','.join(result['mismatches'])}" if result["mismatches"] else ""
+        print(f"{os.path.basename(result['capture']):<60} {result['lines']:>7} lines {result['parse_seconds'] * 1000:9.2f} ms "
+              f"{result['mb_per_s']:8.1f} MB/s{flag}")
+    total_bytes = sum(r["bytes"] for r in results)
+    total_busy = sum(r["parse_seconds"] for r in results)
+    mismatched = sum(1 for r in results if r["mismatches"])
+    print(f"\n{len(results)} captures, {total_bytes / (1 << 20):.1f} MB parsed in {total_busy:.3f} s, {mismatched} mismatched")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"speed": args.speed, "results": results}, f, indent=2)
+    if args.check and mismatched:
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
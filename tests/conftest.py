@@ -0,0 +1,66 @@
+import asyncio
+import json
+import os
+import ssl
+import sys
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+Handler = Callable[[str, str, Dict[str, str], bytes], Awaitable[bytes]]
+
+def http_response(status: int, body: bytes = b"", headers: Optional[Dict[str, str]] = None) -> bytes:
+    """A complete HTTP/1.1 response with a Content-Length body"""
+    lines = [f"HTTP/1.1 {status} X", f"Content-Length: {len(body)}"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode() + body
+
+def json_response(status: int, payload) -> bytes:
+    return http_response(status, json.dumps(payload).encode(), {"Content-Type": "application/json"})
+
+def chunked_response(status: int, chunks: List[bytes], headers: Optional[Dict[str, str]] = None) -> bytes:
+    lines = [f"HTTP/1.1 {status} X", "Transfer-Encoding: chunked"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    body = b"".join(b"%x\r\n%s\r\n" % (len(chunk), chunk) for chunk in chunks)
+    return ("\r\n".join(lines) + "\r\n\r\n").encode() + body + b"0\r\n\r\n"
+
+class FakeHTTPServer:
+    """Scripted HTTP/1.1 server on a unix socket or local TCP port that records every request"""
+
+    def __init__(self, handler: Handler):
+        self.handler = handler
+        self.requests: List[Tuple[str, str, Dict[str, str], bytes]] = []
+        self.connections = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start_unix(self, path: str):
+        self._server = await asyncio.start_unix_server(self._serve, path)
+
+    async def start_tcp(self, ssl_context: Optional[ssl.SSLContext] = None) -> int:
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", 0, ssl=ssl_context)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers: Dict[str, str] = {}
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                self.requests.append((method, target, headers, body))
+                writer.write(await self.handler(method, target, headers, body))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
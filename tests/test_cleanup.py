@@ -0,0 +1,46 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+from fastapi import HTTPException
+
+import app
+
+def run_with_backend(monkeypatch, scenario):
+    """Run `scenario(backend)` with a fresh job store and the fake backend standing in for Docker"""
+    async def main():
+        store = app.JobStore(os.path.join(tempfile.mkdtemp(), "jobs.db"))
+        store.open()
+        monkeypatch.setattr(app, "store", store)
+        backend = app.FakeBackend(auth_delay=60, failure_rate=0)
+        monkeypatch.setattr(app, "docker", backend)
+        try:
+            return await scenario(backend)
+        finally:
+            await backend.close()
+            await store.close()
+    return asyncio.run(main())
+
+def test_deleting_an_unknown_container_is_not_found(monkeypatch):
+    async def scenario(backend):
+        with pytest.raises(HTTPException) as raised:
+            await app.cleanup_container("mailbox-creator-missing", grace=0)
+        return raised.value
+
+    error = run_with_backend(monkeypatch, scenario)
+    assert error.status_code == 404
+    assert error.detail == "Container mailbox-creator-missing not found"
+
+def test_daemon_failures_are_server_errors(monkeypatch):
+    async def scenario(backend):
+        async def stop_container(container_id, timeout=10):
+            raise app.DockerError(500, "driver failed")
+        backend.stop_container = stop_container
+        with pytest.raises(HTTPException) as raised:
+            await app.cleanup_container("mailbox-creator-any", grace=0)
+        return raised.value
+
+    error = run_with_backend(monkeypatch, scenario)
+    assert error.status_code == 500
+    assert error.detail == "Error cleaning up container: driver failed"
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import tempfile
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import app
+
+def run_listing(monkeypatch, scenario):
+    """Run `scenario(backend, now)` with a job store holding a history of jobs and the fake backend as Docker"""
+    async def main():
+        store = app.JobStore(os.path.join(tempfile.mkdtemp(), "jobs.db"))
+        store.open()
+        backend = app.FakeBackend(auth_delay=60, failure_rate=0)
+        monkeypatch.setattr(app, "store", store)
+        monkeypatch.setattr(app, "docker", backend)
+        monkeypatch.setattr(app, "jobs", app.JobTable())
+        monkeypatch.setattr(app, "scheduler", app.JobScheduler(max_running=100))
+        monkeypatch.setattr(app, "runner_pool", app.RunnerPool(backend, size=0))
+        now = time.time()
+        for i in range(6):
+            # One job a minute; every other one has finished
+            store.record(f"mailbox-creator-a-{i}", domain="a.example", submitted_at=now - 600 + 60 * i,
+                         status="completed" if i % 2 else "waiting_for_auth", finished_at=now if i % 2 else None)
+        store.record("mailbox-creator-b-0", domain="b.example", status="failed", submitted_at=now - 900, finished_at=now)
+        try:
+            return await scenario(backend, now)
+        finally:
+            await backend.close()
+            await store.close()
+    return asyncio.run(main())
+
+def names(listing):
+    return [container["container_id"] for container in listing["containers"]]
+
+def test_filters(monkeypatch):
+    async def scenario(backend, now):
+        request = app.MailboxRequest(domain="c.example", sender_name="Ada Lovelace", password="x", variations=1)
+        running = (await app.create_mailboxes(request)).container_id
+        return running, {
+            "active": await app.list_active_containers(),
+            "all": await app.list_active_containers(active=False),
+            "domain": await app.list_active_containers(domain="a.example", active=False),
+            "status": await app.list_active_containers(status="completed, failed", active=False),
+            "age": await app.list_active_containers(active=False, min_age=330, max_age=500),
+        }
+
+    running, listings = run_listing(monkeypatch, scenario)
+    assert names(listings["active"]) == [running, "mailbox-creator-a-4", "mailbox-creator-a-2", "mailbox-creator-a-0"]
+    assert listings["active"]["containers"][0]["container"] == "running"
+    assert listings["active"]["containers"][1]["container"] is None
+    assert listings["all"]["total"] == 8
+    assert names(listings["domain"]) == [f"mailbox-creator-a-{i}" for i in range(5, -1, -1)]
+    assert names(listings["status"]) == ["mailbox-creator-a-5", "mailbox-creator-a-3", "mailbox-creator-a-1", "mailbox-creator-b-0"]
+    assert names(listings["age"]) == ["mailbox-creator-a-4", "mailbox-creator-a-3", "mailbox-creator-a-2"]
+
+def test_pages_are_disjoint_and_newest_first(monkeypatch):
+    async def scenario(backend, now):
+        pages = [await app.list_active_containers(active=False, limit=3, offset=offset) for offset in (0, 3, 6)]
+        with pytest.raises(HTTPException) as raised:
+            await app.list_active_containers(limit=0)
+        return pages, raised.value
+
+    pages, error = run_listing(monkeypatch, scenario)
+    assert [names(page) for page in pages] == [
+        ["mailbox-creator-a-5", "mailbox-creator-a-4", "mailbox-creator-a-3"],
+        ["mailbox-creator-a-2", "mailbox-creator-a-1", "mailbox-creator-a-0"],
+        ["mailbox-creator-b-0"],
+    ]
+    assert [(page["total"], page["limit"], page["offset"]) for page in pages] == [(7, 3, 0), (7, 3, 3), (7, 3, 6)]
+    assert error.status_code == 400
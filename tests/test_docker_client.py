@@ -0,0 +1,193 @@
+import asyncio
+import json
+import os
+import shutil
+import ssl
+import subprocess
+import tempfile
+
+import pytest
+
+import app
+from conftest import FakeHTTPServer, chunked_response, http_response, json_response
+
+def frame(stream: int, data: bytes) -> bytes:
+    """One frame of Docker's multiplexed log stream"""
+    return bytes([stream, 0, 0, 0]) + len(data).to_bytes(4, "big") + data
+
+def run_against(handler, scenario):
+    """Run `scenario(client, server)` with a DockerClient talking to a fake daemon socket"""
+    async def main():
+        path = os.path.join(tempfile.mkdtemp(), "docker.sock")
+        server = FakeHTTPServer(handler)
+        await server.start_unix(path)
+        client = app.DockerClient(f"unix://{path}", "v1.41", pool_size=4)
+        try:
+            return await scenario(client, server)
+        finally:
+            await client.close()
+            await server.close()
+    return asyncio.run(main())
+
+def test_chunked_response_is_reassembled():
+    body = json.dumps({"Id": "abc", "State": {"Running": True}}).encode()
+
+    async def handler(method, target, headers, payload):
+        return chunked_response(200, [body[:7], body[7:20], body[20:]], {"Content-Type": "application/json"})
+
+    async def scenario(client, server):
+        return await client.inspect_container("job")
+
+    assert run_against(handler, scenario) == {"Id": "abc", "State": {"Running": True}}
+
+def test_logs_are_demultiplexed():
+    stream = frame(1, b"AUTH_CODE: ABC123\n") + frame(2, b"warning\n") + frame(1, "café\n".encode())
+
+    async def handler(method, target, headers, payload):
+        assert target.startswith("/v1.41/containers/job/logs?")
+        return http_response(200, stream)
+
+    async def scenario(client, server):
+        return await client.container_logs("job")
+
+    assert run_against(handler, scenario) == "AUTH_CODE: ABC123\nwarning\ncafé\n"
+
+def test_followed_logs_split_frames_across_chunks():
+    stream = frame(1, b"first line\n") + frame(1, "second é\n".encode())
+    # Chunk boundaries fall inside a frame header and inside a multi-byte character
+    cuts = [5, 14, len(stream) - 2]
+    chunks = [stream[a:b] for a, b in zip([0] + cuts, cuts + [len(stream)])]
+
+    async def handler(method, target, headers, payload):
+        assert "follow=1" in target
+        return chunked_response(200, chunks)
+
+    async def scenario(client, server):
+        return "".join([text async for text in await client.follow_logs("job")])
+
+    assert run_against(handler, scenario) == "first line\nsecond é\n"
+
+def test_tty_logs_pass_through_unframed():
+    async def handler(method, target, headers, payload):
+        return http_response(200, b"plain output\n")
+
+    async def scenario(client, server):
+        return await client.container_logs("job")
+
+    assert run_against(handler, scenario) == "plain output\n"
+
+def test_keep_alive_connections_are_reused():
+    async def handler(method, target, headers, payload):
+        return json_response(200, {"Id": target})
+
+    async def scenario(client, server):
+        for _ in range(5):
+            await client.inspect_container("job")
+        await asyncio.gather(*(client.inspect_container("job") for _ in range(3)))
+        await client.inspect_container("job")
+        return server.connections
+
+    # Sequential calls share one connection; concurrent ones open at most the extra ones they need
+    assert run_against(handler, scenario) == 3
+
+def test_connection_closed_by_daemon_is_replaced():
+    async def handler(method, target, headers, payload):
+        return http_response(200, b"{}", {"Connection": "close"})
+
+    async def scenario(client, server):
+        await client.inspect_container("job")
+        await client.inspect_container("job")
+        return server.connections
+
+    assert run_against(handler, scenario) == 2
+
+def test_error_status_raises_docker_error():
+    async def handler(method, target, headers, payload):
+        return json_response(409, {"message": "container is not running"})
+
+    async def scenario(client, server):
+        await client.start_container("job")
+
+    with pytest.raises(app.DockerError) as raised:
+        run_against(handler, scenario)
+    assert raised.value.status == 409
+    assert raised.value.message == "container is not running"
+
+def test_missing_image_is_pulled_before_create():
+    pulled = []
+
+    async def handler(method, target, headers, payload):
+        if target.startswith("/v1.41/images/create"):
+            pulled.append(target)
+            return chunked_response(200, [b'{"status":"Pulling"}\n', b'{"status":"Done"}\n'])
+        if pulled:
+            return json_response(201, {"Id": "new-container"})
+        return json_response(404, {"message": "No such image: runner:1"})
+
+    async def scenario(client, server):
+        container_id = await client.create_container("job", {"Image": "registry.local:5000/runner:1"})
+        return container_id, [(method, target) for method, target, _, _ in server.requests]
+
+    container_id, requests = run_against(handler, scenario)
+    assert container_id == "new-container"
+    assert [method for method, _ in requests] == ["POST", "POST", "POST"]
+    assert requests[1][1] == "/v1.41/images/create?fromImage=registry.local%3A5000%2Frunner&tag=1"
+
+def test_in_band_pull_error_is_raised():
+    async def handler(method, target, headers, payload):
+        if target.startswith("/v1.41/images/create"):
+            # The daemon answers 200 and reports the failure in the progress stream
+            return chunked_response(200, [b'{"status":"Pulling"}\n', b'{"error":"manifest unknown"}\n'])
+        return json_response(404, {"message": "No such image"})
+
+    async def scenario(client, server):
+        await client.create_container("job", {"Image": "runner"})
+
+    with pytest.raises(app.DockerError) as raised:
+        run_against(handler, scenario)
+    assert raised.value.status == 500
+    assert raised.value.message == "manifest unknown"
+
+def make_certs(directory: str):
+    """A CA, a server certificate for 127.0.0.1 and a client certificate, laid out like DOCKER_CERT_PATH"""
+    def openssl(*args):
+        subprocess.run(["openssl", *args], cwd=directory, check=True, capture_output=True)
+    openssl("req", "-x509", "-newkey", "rsa:2048", "-nodes", "-keyout", "ca-key.pem", "-out", "ca.pem",
+            "-days", "1", "-subj", "/CN=test-ca")
+    for name, extension in (("server", "subjectAltName=IP:127.0.0.1"), ("", "extendedKeyUsage=clientAuth")):
+        prefix = f"{name}-" if name else ""
+        openssl("req", "-newkey", "rsa:2048", "-nodes", "-keyout", f"{prefix}key.pem", "-out", f"{prefix}req.pem",
+                "-subj", f"/CN={name or 'client'}")
+        with open(os.path.join(directory, f"{prefix}ext.cnf"), "w") as f:
+            f.write(extension + "\n")
+        openssl("x509", "-req", "-in", f"{prefix}req.pem", "-CA", "ca.pem", "-CAkey", "ca-key.pem", "-CAcreateserial",
+                "-out", f"{prefix}cert.pem", "-days", "1", "-extfile", f"{prefix}ext.cnf")
+
+@pytest.mark.skipif(shutil.which("openssl") is None, reason="needs openssl to issue test certificates")
+def test_tcp_host_uses_client_certificate_tls():
+    directory = tempfile.mkdtemp()
+    make_certs(directory)
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH, cafile=os.path.join(directory, "ca.pem"))
+    context.load_cert_chain(os.path.join(directory, "server-cert.pem"), os.path.join(directory, "server-key.pem"))
+    # The daemon side refuses clients without a certificate from the CA
+    context.verify_mode = ssl.CERT_REQUIRED
+
+    async def handler(method, target, headers, payload):
+        return json_response(200, {"Id": "abc"})
+
+    async def main():
+        server = FakeHTTPServer(handler)
+        port = await server.start_tcp(ssl_context=context)
+        client = app.DockerClient(f"tcp://127.0.0.1:{port}", "v1.41", tls_verify=True, cert_path=directory)
+        try:
+            return await client.inspect_container("job")
+        finally:
+            await client.close()
+            await server.close()
+
+    assert asyncio.run(main()) == {"Id": "abc"}
+
+def test_plain_tcp_is_refused_for_remote_hosts():
+    with pytest.raises(ValueError):
+        app.DockerClient("tcp://10.0.0.12:2375", tls_verify=False)
+    app.DockerClient("tcp://127.0.0.1:2375", tls_verify=False)
@@ -0,0 +1,65 @@
+import asyncio
+import base64
+import json
+import os
+import tempfile
+import time
+
+import app
+
+async def run_container(backend: app.FakeBackend, name: str, payload=None) -> str:
+    """Start a fake runner; with a payload it runs that job, without one it idles like a pool runner"""
+    config = {"Labels": {app.LABEL_DOMAIN: "example.com"}}
+    if payload is not None:
+        config["Env"] = [f"MAILBOX_JOB={base64.b64encode(json.dumps(payload).encode()).decode()}"]
+    container_id = await backend.create_container(name, config)
+    await backend.start_container(container_id)
+    return container_id
+
+def test_reconcile_after_restart(monkeypatch):
+    path = os.path.join(tempfile.mkdtemp(), "jobs.db")
+    now = time.time()
+
+    async def main():
+        # The API records a few jobs, then goes down
+        before = app.JobStore(path)
+        before.open()
+        before.record("mailbox-creator-vanished-done", domain="example.com", status="creating_mailboxes",
+                      created_mailboxes=["ada@example.com"], failed_mailboxes=[], submitted_at=now - 60)
+        before.record("mailbox-creator-vanished", domain="example.com", status="waiting_for_auth", submitted_at=now - 60)
+        before.record("mailbox-creator-exited", domain="example.com", status="container_started", submitted_at=now - 60)
+        await before.close()
+
+        backend = app.FakeBackend(auth_delay=0, login_delay=0, mailbox_delay=0, failure_rate=0)
+        monkeypatch.setattr(app, "docker", backend)
+        monkeypatch.setattr(app, "jobs", app.JobTable())
+        # While it was down one job finished and another container was started by hand
+        exited = await run_container(backend, "mailbox-creator-exited", {"domain": "example.com", "mailboxes": ["ada", "grace"]})
+        unknown = await run_container(backend, "mailbox-creator-unknown")
+        while backend._containers[exited].running:
+            await asyncio.sleep(0.01)
+
+        after = app.JobStore(path)
+        after.open()
+        monkeypatch.setattr(app, "store", after)
+        try:
+            await app.reconcile_job_store()
+            records = {name: await after.get(name) for name in (
+                "mailbox-creator-vanished-done", "mailbox-creator-vanished", "mailbox-creator-exited", "mailbox-creator-unknown")}
+        finally:
+            await after.close()
+            await backend.close()
+        return records, exited, unknown
+
+    records, exited, unknown = asyncio.run(main())
+    assert records["mailbox-creator-vanished-done"]["status"] == "completed"
+    assert records["mailbox-creator-vanished"]["status"] == "failed"
+    assert all(records[name]["finished_at"] >= now for name in ("mailbox-creator-vanished-done", "mailbox-creator-vanished"))
+    assert records["mailbox-creator-exited"]["status"] == "completed"
+    assert records["mailbox-creator-exited"]["docker_id"] == exited
+    assert records["mailbox-creator-exited"]["created_mailboxes"] == ["ada@example.com", "grace@example.com"]
+    assert records["mailbox-creator-exited"]["exit_code"] == 0
+    assert records["mailbox-creator-unknown"]["status"] == "starting"
+    assert records["mailbox-creator-unknown"]["docker_id"] == unknown
+    assert records["mailbox-creator-unknown"]["domain"] == "example.com"
+    assert records["mailbox-creator-unknown"]["finished_at"] is None
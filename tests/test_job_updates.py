@@ -0,0 +1,26 @@
+import asyncio
+
+import app
+
+def test_waiters_that_give_up_leave_nothing_behind():
+    async def main():
+        updates = app.JobUpdates()
+        assert not await updates.wait("mailbox-creator-unknown", 0.01)
+        # A client that disconnects cancels its wait
+        stream = asyncio.create_task(updates.wait("mailbox-creator-gone", 10))
+        await asyncio.sleep(0.01)
+        stream.cancel()
+        await asyncio.gather(stream, return_exceptions=True)
+        return updates._events, updates._waiters
+
+    assert asyncio.run(main()) == ({}, {})
+
+def test_remaining_waiters_are_still_woken():
+    async def main():
+        updates = app.JobUpdates()
+        patient = asyncio.create_task(updates.wait("mailbox-creator-job", 10))
+        assert not await updates.wait("mailbox-creator-job", 0.01)
+        updates.notify("mailbox-creator-job")
+        return await patient, updates._events, updates._waiters
+
+    assert asyncio.run(main()) == (True, {}, {})
@@ -0,0 +1,174 @@
+import random
+import re
+from typing import List, Optional
+
+import pytest
+
+import app
+
+# The helpers as they were before LogParser, kept as the reference the parser must agree with
+
+def reference_auth_code(logs: str) -> Optional[str]:
+    patterns = [
+        r"AUTH_CODE: ([A-Z0-9]+)",
+        r"enter the code ([A-Z0-9]{6,12}) to authenticate",
+        r"and enter the code ([A-Z0-9]{6,12}) to authenticate",
+        r"Code: ([A-Z0-9]{6,12})",
+        r"device.*?code.*?([A-Z0-9]{8,10})",
+        r"authentication.*?code.*?([A-Z0-9]{8,10})",
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, logs, re.IGNORECASE)
+        if match:
+            code = match.group(1)
+            if 6 <= len(code) <= 12 and not code.lower() in ['atcushwake', 'microsoft', 'exchange', 'online']:
+                return code
+    return None
+
+def reference_authenticated(logs: str) -> bool:
+    welcome_patterns = [
+        "This V3 EXO PowerShell module contains new REST API backed Exchange Online cmdlets",
+        "Unlike the EXO* prefixed cmdlets, the cmdlets in this module support full functional parity",
+        "For more information check https://aka.ms/exov3-module",
+        "Starting with EXO V3.7",
+        "REST backed EOP and SCC cmdlets are also available",
+        "LoadCmdletHelp parameter alongside Connect-ExchangeOnline",
+        "=== CREATING MAILBOXES ===",
+        "Creating .* mailboxes for domain:"
+    ]
+    return any(re.search(pattern, logs, re.IGNORECASE) for pattern in welcome_patterns)
+
+def reference_status(logs: str) -> str:
+    if "AUTH_TIMEOUT:" in logs:
+        return "auth_timeout"
+    elif reference_authenticated(logs):
+        return "creating_mailboxes"
+    elif "AUTH_CODE:" in logs:
+        return "waiting_for_auth"
+    elif "=== MAILBOX CREATION COMPLETED ===" in logs:
+        return "completed"
+    elif "ERROR:" in logs:
+        return "error"
+    return "starting"
+
+def reference_final_results(logs: str):
+    created, failed = [], []
+    for line in logs.split('\n'):
+        if "SUCCESS: Created mailbox" in line:
+            match = re.search(r'Created mailbox ([\w\.\-]+@[\w\.\-]+)', line)
+            if match:
+                created.append(match.group(1))
+        elif "FAILED: Could not create" in line:
+            match = re.search(r'Could not create ([\w\.\-]+@[\w\.\-]+)', line)
+            if match:
+                failed.append(match.group(1))
+    return created, failed
+
+def reference_ip_info(logs: str) -> Optional[str]:
+    proxy_check_match = re.search(r'PROXY_CHECK: (IP=.+)', logs)
+    if proxy_check_match:
+        return proxy_check_match.group(1)
+    ip_match = re.search(r'IP_ADDRESS: (.+)', logs)
+    country_match = re.search(r'COUNTRY: (.+)', logs)
+    state_match = re.search(r'STATE: (.+)', logs)
+    city_match = re.search(r'CITY: (.+)', logs)
+    if ip_match:
+        ip = ip_match.group(1).strip()
+        country = country_match.group(1).strip() if country_match else "Unknown"
+        state = state_match.group(1).strip() if state_match else "Unknown"
+        city = city_match.group(1).strip() if city_match else "Unknown"
+        return f"IP={ip} | Country={country} | State={state} | City={city}"
+    return None
+
+NOISE = [
+    "VERBOSE: Loading module from path '/usr/local/share/powershell/Modules/ExchangeOnlineManagement'.",
+    "WARNING: The names of some imported commands from the module 'tmpEXO' include unapproved verbs.",
+    "Some progress line with numbers 12345 and words like domain and mailbox",
+    "Straße İstanbul naïve ÅNGSTRÖM",
+    "----------------------------------------------------------------------------------------",
+    "",
+]
+
+def random_code(rng: random.Random) -> str:
+    alphabet = "ABCDEFGHJKLMNPQRSTUVWXYZ0123456789abcdef"
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(3, 14)))
+
+def random_case(rng: random.Random, text: str) -> str:
+    return "".join(c.upper() if rng.random() < 0.3 else c.lower() if rng.random() < 0.3 else c for c in text)
+
+def random_line(rng: random.Random) -> str:
+    user = f"user{rng.randint(0, 999)}@example{rng.randint(0, 9)}.com"
+    choices = [
+        lambda: rng.choice(NOISE),
+        lambda: f"SUCCESS: Created mailbox {user}",
+        lambda: f"FAILED: Could not create {user} - already exists",
+        lambda: f"Created mailbox {user}",
+        lambda: f"AUTH_CODE: {random_code(rng)}",
+        lambda: f"To sign in, open https://microsoft.com/devicelogin and enter the code {random_code(rng)} to authenticate.",
+        lambda: f"{random_case(rng, 'Code')}: {random_code(rng)}",
+        lambda: f"device login {random_case(rng, 'code')} is {random_code(rng)}",
+        lambda: f"authentication {random_case(rng, 'code')}={random_code(rng)}",
+        lambda: f"enter the code {rng.choice(['MICROSOFT', 'Exchange', 'online1'])} to authenticate",
+        lambda: random_case(rng, "This V3 EXO PowerShell module contains new REST API backed Exchange Online cmdlets"),
+        lambda: random_case(rng, "Starting with EXO V3.7, use the LoadCmdletHelp parameter alongside Connect-ExchangeOnline"),
+        lambda: random_case(rng, "REST backed EOP and SCC cmdlets are also available"),
+        lambda: random_case(rng, "=== CREATING MAILBOXES ==="),
+        lambda: f"{random_case(rng, 'Creating')} {rng.randint(1, 50)} mailboxes for domain: example.com",
+        lambda: "AUTH_TIMEOUT: no sign-in within 15 minutes",
+        lambda: "=== MAILBOX CREATION COMPLETED ===",
+        lambda: f"ERROR: {rng.choice(['quota', 'throttled'])}",
+        lambda: f"PROXY_CHECK: IP=198.51.100.{rng.randint(1, 254)} | Country=US",
+        lambda: f"IP_ADDRESS: 203.0.113.{rng.randint(1, 254)}  ",
+        lambda: f"COUNTRY: {rng.choice(['US', 'DE'])}",
+        lambda: f"STATE: {rng.choice(['Texas', 'Bavaria'])}",
+        lambda: f"CITY: {rng.choice(['Austin', 'Munich'])}",
+    ]
+    # Mostly noise, like real runner output
+    line = rng.choice(NOISE) if rng.random() < 0.6 else rng.choice(choices)()
+    if rng.random() < 0.1:
+        line = f"{rng.choice(NOISE)} {line}"
+    return line
+
+def random_log(rng: random.Random) -> str:
+    lines = [random_line(rng) for _ in range(rng.randint(0, rng.choice([20, 100, 1000])))]
+    return "\n".join(lines) + rng.choice(["", "\n"])
+
+def split_randomly(rng: random.Random, text: str) -> List[str]:
+    cuts = sorted(rng.randint(0, len(text)) for _ in range(rng.randint(0, 12)))
+    return [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+
+@pytest.mark.parametrize("block_chars", [24, 100, 1 << 16])
+def test_parser_matches_reference_helpers(monkeypatch, block_chars):
+    # Small blocks put tokens and lines across block boundaries all the time
+    monkeypatch.setattr(app, "SCAN_BLOCK_CHARS", block_chars)
+    rng = random.Random(block_chars)
+    for _ in range(150):
+        logs = random_log(rng)
+        expected = (reference_auth_code(logs), reference_authenticated(logs), reference_status(logs),
+                    reference_final_results(logs), reference_ip_info(logs))
+        assert (app.extract_auth_code(logs), app.is_authenticated_from_logs(logs), app.parse_container_status(logs),
+                app.parse_final_results(logs), app.extract_ip_info(logs)) == expected, logs
+
+        parser = app.LogParser()
+        for piece in split_randomly(rng, logs):
+            parser.feed(piece)
+        parser.flush()
+        parsed = parser.result()
+        assert (parsed.auth_code, parsed.authenticated, parsed.status, (parsed.created, parsed.failed),
+                parsed.ip_info) == expected, logs
+
+def test_events_and_text_markers_mix():
+    logs = "\n".join([
+        '{"type":"start","domain":"example.com"}',
+        "To sign in, enter the code ABCD12345 to authenticate.",
+        '{"type":"log","message":"Created mailbox ignored@example.com"}',
+        '{"type":"authenticated"}',
+        '{"type":"mailbox","email":"a@example.com","ok":true}',
+        '{"type":"mailbox","email":"b@example.com","ok":false}',
+        '{"type":"completed"}',
+    ]) + "\n"
+    parsed = app.parse_logs(logs, is_running=False)
+    assert parsed.auth_code == "ABCD12345"
+    assert parsed.created == ["a@example.com"]
+    assert parsed.failed == ["b@example.com"]
+    assert parsed.status == "completed"
@@ -0,0 +1,50 @@
+import asyncio
+import os
+import tempfile
+import time
+
+import app
+
+class ListingBackend:
+    """Lists a fixed set of containers, which is all the reaper asks of the backend for running ones"""
+
+    def __init__(self, containers):
+        self.containers = containers
+
+    async def list_containers(self, all=False, filters=None):
+        return self.containers
+
+def sweep(monkeypatch, containers, records):
+    async def main():
+        store = app.JobStore(os.path.join(tempfile.mkdtemp(), "jobs.db"))
+        store.open()
+        monkeypatch.setattr(app, "store", store)
+        for name, fields in records.items():
+            store.record(name, **fields)
+        removed = []
+
+        async def remove_job_container(container_id, grace=10, snapshot=True):
+            removed.append((container_id, grace))
+        monkeypatch.setattr(app, "remove_job_container", remove_job_container)
+        try:
+            await app.ContainerReaper(ListingBackend(containers)).sweep()
+        finally:
+            await store.close()
+        return removed
+    return asyncio.run(main())
+
+def running(name: str, created: float):
+    return {"Id": name, "Names": [f"/{name}"], "State": "running", "Created": int(created)}
+
+def test_pool_runner_runtime_counts_from_job_start(monkeypatch):
+    now = time.time()
+    # The runner sat in the pool for longer than the maximum runtime before it was claimed
+    containers = [running("mailbox-creator-claimed", now - app.JOB_MAX_RUNTIME - 600)]
+    records = {"mailbox-creator-claimed": {"status": "container_started", "submitted_at": now - 60, "started_at": now - 30}}
+    assert sweep(monkeypatch, containers, records) == []
+
+def test_job_past_max_runtime_is_removed(monkeypatch):
+    now = time.time()
+    containers = [running("mailbox-creator-stuck", now - 60), running("mailbox-creator-unknown", now - app.JOB_MAX_RUNTIME - 1)]
+    records = {"mailbox-creator-stuck": {"status": "waiting_for_auth", "submitted_at": now - app.JOB_MAX_RUNTIME - 1}}
+    assert sorted(sweep(monkeypatch, containers, records)) == [("mailbox-creator-stuck", 0), ("mailbox-creator-unknown", 0)]
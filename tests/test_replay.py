@@ -0,0 +1,18 @@
+import asyncio
+import os
+
+import pytest
+
+import app
+import replay
+
+CAPTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "captures")
+
+@pytest.mark.parametrize("path", replay.capture_paths([CAPTURES]), ids=os.path.basename)
+def test_capture_replays_to_recorded_result(path):
+    # Same check as `python replay.py tests/captures --speed 0 --check`
+    header, entries = app.read_log_capture(path)
+    result = asyncio.run(replay.replay(path, speed=0))
+    assert result["lines"] == len(entries) > 0
+    assert set(header["result"]) == {"status", "auth_code", "created", "failed", "ip_info"}
+    assert result["mismatches"] == []
@@ -0,0 +1,36 @@
+import asyncio
+import json
+
+import app
+
+class SlowListingBackend(app.FakeBackend):
+    """Answers listings with the state at the time of the call, but only after a delay"""
+
+    async def list_containers(self, all=False, filters=None):
+        listed = await super().list_containers(all, filters)
+        await asyncio.sleep(0.05)
+        return listed
+
+def test_claim_during_sync_is_not_handed_out_again():
+    async def main():
+        backend = SlowListingBackend(auth_delay=60, failure_rate=0)
+        pool = app.RunnerPool(backend, size=3)
+        for _ in range(3):
+            pool._idle.append(await pool._create())
+        # Job 1 claims a runner while the pool is still waiting for a listing that shows it as idle
+        sync = asyncio.create_task(pool._sync())
+        await asyncio.sleep(0.01)
+        assert await pool.claim("mailbox-creator-job1", {"job": 1}, None)
+        await sync
+        for i in (2, 3):
+            assert await pool.claim(f"mailbox-creator-job{i}", {"job": i}, None)
+        containers = {c.name: c for c in backend._containers.values()}
+        await backend.close()
+        return containers, pool.idle
+
+    containers, idle = asyncio.run(main())
+    jobs = {name: container for name, container in containers.items() if name.startswith("mailbox-creator-job")}
+    assert sorted(jobs) == ["mailbox-creator-job1", "mailbox-creator-job2", "mailbox-creator-job3"]
+    assert [json.loads(jobs[f"mailbox-creator-job{i}"].files["/tmp/job/job.json"]) for i in (1, 2, 3)] == \
+        [{"job": 1}, {"job": 2}, {"job": 3}]
+    assert idle == 0
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+from fastapi import HTTPException
+
+import app
+
+def queued_job(name: str, priority: int = 0) -> app.QueuedJob:
+    return app.QueuedJob((-priority, 0), f"mailbox-creator-{name}", "example.com", {}, None)
+
+class ListingBackend:
+    """Lists fixed running job containers after a delay, like a busy daemon"""
+
+    def __init__(self, names, delay: float = 0):
+        self.names = names
+        self.delay = delay
+
+    async def list_containers(self, all=False, filters=None):
+        listed = [{"Id": name, "Names": [f"/{name}"], "State": "running"} for name in self.names]
+        await asyncio.sleep(self.delay)
+        return listed
+
+def run_scheduler(monkeypatch, scenario, max_running: int, max_queued: int = 10, backend=None):
+    """Run `scenario(scheduler, started)`; container starts are recorded in `started` instead of run"""
+    async def main():
+        store = app.JobStore(os.path.join(tempfile.mkdtemp(), "jobs.db"))
+        store.open()
+        monkeypatch.setattr(app, "store", store)
+        if backend is not None:
+            monkeypatch.setattr(app, "docker", backend)
+        started = []
+
+        async def start_domain_container(domain, payload, proxy_endpoint=None, container_name=None):
+            started.append(container_name)
+            return container_name
+        monkeypatch.setattr(app, "start_domain_container", start_domain_container)
+        scheduler = app.JobScheduler(max_running=max_running, max_queued=max_queued)
+        monkeypatch.setattr(app, "scheduler", scheduler)
+        try:
+            return await scenario(scheduler, started)
+        finally:
+            await store.close()
+    return asyncio.run(main())
+
+def test_batch_is_admitted_up_to_the_limit_or_rejected_whole(monkeypatch):
+    async def scenario(scheduler, started):
+        statuses = scheduler.admit([queued_job("a"), queued_job("b"), queued_job("c")])
+        with pytest.raises(app.QueueFullError):
+            scheduler.admit([queued_job("d"), queued_job("e")])
+        return statuses, scheduler.running, scheduler.queued
+
+    statuses, running, queued = run_scheduler(monkeypatch, scenario, max_running=2, max_queued=2)
+    assert statuses == ["container_started", "container_started", "queued"]
+    assert (running, queued) == (2, 1)
+
+def test_queue_leaves_by_priority_then_submission_order(monkeypatch):
+    async def scenario(scheduler, started):
+        scheduler.admit([queued_job("first")])
+        await scheduler.launch("mailbox-creator-first", "example.com", {}, None)
+        scheduler.admit([queued_job("low-1"), queued_job("high", priority=5)])
+        scheduler.admit([queued_job("low-2")])
+        positions = [scheduler.position(f"mailbox-creator-{name}") for name in ("high", "low-1", "low-2")]
+        for name in ("first", "high", "low-1"):
+            scheduler.release(f"mailbox-creator-{name}")
+            await asyncio.sleep(0.01)
+        return positions, started
+
+    positions, started = run_scheduler(monkeypatch, scenario, max_running=1)
+    assert positions == [1, 2, 3]
+    assert started == ["mailbox-creator-first", "mailbox-creator-high", "mailbox-creator-low-1", "mailbox-creator-low-2"]
+
+def test_full_queue_answers_429_with_retry_after(monkeypatch):
+    async def scenario(scheduler, started):
+        request = app.MailboxRequest(domain="example.com", sender_name="Ada Lovelace", password="x", variations=1)
+        with pytest.raises(HTTPException) as raised:
+            await app.create_mailboxes(request)
+        return raised.value
+
+    error = run_scheduler(monkeypatch, scenario, max_running=0, max_queued=0)
+    assert error.status_code == 429
+    assert error.headers == {"Retry-After": str(app.QUEUE_RETRY_AFTER)}
+
+def test_sync_keeps_slots_of_jobs_not_listed_yet(monkeypatch):
+    backend = ListingBackend(["mailbox-creator-old"], delay=0.05)
+
+    async def scenario(scheduler, started):
+        scheduler.admit([queued_job("reserved"), queued_job("launched")])
+        sync = asyncio.create_task(scheduler.sync())
+        await asyncio.sleep(0.01)
+        # Starts while the listing is on its way, so the listing cannot show it
+        await scheduler.launch("mailbox-creator-launched", "example.com", {}, None)
+        await sync
+        return scheduler.running, scheduler.admit([queued_job("waiting")]), started
+
+    running, statuses, started = run_scheduler(monkeypatch, scenario, max_running=3, backend=backend)
+    assert running == 3
+    assert statuses == ["queued"]
+    assert started == ["mailbox-creator-launched"]
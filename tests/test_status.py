@@ -0,0 +1,119 @@
+import asyncio
+import json
+import os
+import tempfile
+
+from starlette.requests import Request
+
+import app
+
+def http_request(*headers) -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": [(k.encode(), v.encode()) for k, v in headers]})
+
+def run_api(monkeypatch, scenario):
+    """Run `scenario(backend)` against a fresh API state with the fake backend standing in for Docker"""
+    async def main():
+        store = app.JobStore(os.path.join(tempfile.mkdtemp(), "jobs.db"))
+        store.open()
+        backend = app.FakeBackend(auth_delay=0.01, login_delay=0.01, mailbox_delay=0.01, failure_rate=0)
+        monkeypatch.setattr(app, "store", store)
+        monkeypatch.setattr(app, "docker", backend)
+        monkeypatch.setattr(app, "jobs", app.JobTable())
+        monkeypatch.setattr(app, "status_cache", app.CoalescingCache())
+        monkeypatch.setattr(app, "scheduler", app.JobScheduler(max_running=100))
+        monkeypatch.setattr(app, "runner_pool", app.RunnerPool(backend, size=0))
+        try:
+            return await scenario(backend)
+        finally:
+            await backend.close()
+            await store.close()
+    return asyncio.run(main())
+
+async def finished_job(backend: app.FakeBackend, domain: str = "example.com", variations: int = 2) -> str:
+    """Submit a job and wait until its container has exited"""
+    request = app.MailboxRequest(domain=domain, sender_name="Ada Lovelace", password="x", variations=variations)
+    name = (await app.create_mailboxes(request)).container_id
+    while backend._get(name).running:
+        await asyncio.sleep(0.01)
+    return name
+
+def test_batch_status_reports_failures_per_job(monkeypatch):
+    async def scenario(backend):
+        done, broken = await finished_job(backend), await finished_job(backend)
+        container_logs = backend.container_logs
+
+        async def failing_logs(container_id, **params):
+            if container_id == backend._get(broken).id:
+                raise app.DockerError(500, "driver failed")
+            return await container_logs(container_id, **params)
+        backend.container_logs = failing_logs
+        request = app.BatchStatusRequest(container_ids=[done, "mailbox-creator-missing", broken])
+        response = await app.get_batch_status(request, http_request())
+        return json.loads(response.body), done, broken
+
+    body, done, broken = run_api(monkeypatch, scenario)
+    assert body["success"] is False
+    assert [(job["container_id"], job["success"], job["status"]) for job in body["jobs"]] == [
+        (done, True, "completed"),
+        ("mailbox-creator-missing", False, "not_found"),
+        (broken, False, "error"),
+    ]
+    assert len(body["jobs"][0]["created_mailboxes"]) == 2
+    assert body["jobs"][2]["error"] == "Error checking status: driver failed"
+
+async def status(name: str, *headers, **params) -> app.Response:
+    return await app.get_container_status(name, http_request(*headers), **params)
+
+def test_unchanged_status_answers_304(monkeypatch):
+    async def scenario(backend):
+        name = await finished_job(backend)
+        first = await status(name)
+        again = await status(name, ("if-none-match", first.headers["etag"]))
+        stale = await status(name, ("if-none-match", 'W/"0"'))
+        return first, again, stale
+
+    first, again, stale = run_api(monkeypatch, scenario)
+    assert first.status_code == 200 and first.headers["etag"].startswith('W/"')
+    assert again.status_code == 304 and again.body == b""
+    assert again.headers["etag"] == first.headers["etag"]
+    assert stale.status_code == 200 and stale.body == first.body
+
+def test_log_ranges_are_positions_in_the_whole_stream(monkeypatch):
+    async def scenario(backend):
+        name = await finished_job(backend)
+        ranges = [json.loads((await status(name, include_logs=True, **params)).body)
+                  for params in ({}, {"logs_offset": 5, "logs_limit": 10}, {"logs_offset": -20})]
+        monkeypatch.setattr(app, "JOB_LOG_RETAIN_CHARS", 100)
+        # A further line makes the job drop everything but the last 100 characters
+        app.jobs.get(name).feed("{\"type\":\"log\",\"level\":\"info\",\"message\":\"done\"}\n")
+        tail = json.loads((await status(name, include_logs=True, logs_limit=30)).body)
+        return ranges, tail
+
+    (whole, window, end), tail = run_api(monkeypatch, scenario)
+    logs = whole["logs"]
+    assert (whole["logs_offset"], whole["logs_size"]) == (0, len(logs))
+    assert (window["logs"], window["logs_offset"], window["logs_size"]) == (logs[5:15], 5, len(logs))
+    assert (end["logs"], end["logs_offset"]) == (logs[-20:], len(logs) - 20)
+    size = tail["logs_size"]
+    assert size > len(logs)
+    # Text before the retained tail is gone, so the range starts at the oldest retained character
+    assert tail["logs_offset"] == size - 100 and len(tail["logs"]) == 30
+
+def test_concurrent_polls_share_one_backend_fetch(monkeypatch):
+    async def scenario(backend):
+        backend.auth_delay = 60
+        request = app.MailboxRequest(domain="example.com", sender_name="Ada Lovelace", password="x", variations=2)
+        name = (await app.create_mailboxes(request)).container_id
+        calls = []
+        container_logs = backend.container_logs
+
+        async def counted_logs(container_id, **params):
+            calls.append(container_id)
+            return await container_logs(container_id, **params)
+        backend.container_logs = counted_logs
+        responses = await asyncio.gather(*(status(name) for _ in range(20)))
+        return [json.loads(response.body)["status"] for response in responses], calls
+
+    statuses, calls = run_api(monkeypatch, scenario)
+    assert statuses == ["starting"] * 20
+    assert len(calls) == 1
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+import app
+
+def counting_fetch(result="status", delay: float = 0.01, error: Exception = None):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return result
+    return fetch, calls
+
+def test_concurrent_gets_share_one_fetch():
+    async def main():
+        cache = app.CoalescingCache(ttl=60)
+        fetch, calls = counting_fetch()
+        results = await asyncio.gather(*(cache.get("job", fetch) for _ in range(20)))
+        # Within the TTL a later poll reuses the result without fetching
+        results.append(await cache.get("job", fetch))
+        return results, calls
+
+    results, calls = asyncio.run(main())
+    assert results == ["status"] * 21
+    assert len(calls) == 1
+
+def test_expired_and_invalidated_entries_are_fetched_again():
+    async def main():
+        cache = app.CoalescingCache(ttl=0.05)
+        fetch, calls = counting_fetch()
+        await cache.get("job", fetch)
+        await asyncio.sleep(0.06)
+        await cache.get("job", fetch)
+        cache.invalidate("job")
+        await cache.get("job", fetch)
+        return calls
+
+    assert len(asyncio.run(main())) == 3
+
+def test_errors_are_shared_but_not_cached():
+    async def main():
+        cache = app.CoalescingCache(ttl=60)
+        fetch, calls = counting_fetch(error=app.DockerError(500, "driver failed"))
+        results = await asyncio.gather(*(cache.get("job", fetch) for _ in range(5)), return_exceptions=True)
+        with pytest.raises(app.DockerError):
+            await cache.get("job", fetch)
+        return results, calls
+
+    results, calls = asyncio.run(main())
+    assert all(isinstance(result, app.DockerError) for result in results)
+    assert len(calls) == 2
+
+def test_cancelled_poll_does_not_cancel_the_shared_fetch():
+    async def main():
+        cache = app.CoalescingCache(ttl=60)
+        fetch, calls = counting_fetch(delay=0.05)
+        gone = asyncio.create_task(cache.get("job", fetch))
+        waiting = asyncio.create_task(cache.get("job", fetch))
+        await asyncio.sleep(0.01)
+        gone.cancel()
+        return await waiting, calls
+
+    result, calls = asyncio.run(main())
+    assert result == "status"
+    assert len(calls) == 1
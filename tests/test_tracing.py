@@ -0,0 +1,22 @@
+import json
+import os
+import tempfile
+
+import app
+
+def finished_span(name: str, duration: float) -> app.Span:
+    root = app.Span(name, {"path": "/health"})
+    root.duration = duration
+    return root
+
+def test_traces_are_written_by_the_background_thread():
+    path = os.path.join(tempfile.mkdtemp(), "traces.jsonl")
+    exporter = app.TraceExporter(path, sample_rate=1, min_duration_ms=5)
+    for i in range(50):
+        exporter.export(finished_span(f"handler-{i}", 0.01))
+    exporter.export(finished_span("fast", 0.001))
+    exporter.close()
+    with open(path) as f:
+        traces = [json.loads(line) for line in f]
+    assert [trace["name"] for trace in traces] == [f"handler-{i}" for i in range(50)]
+    assert traces[0]["duration_ms"] == 10 and traces[0]["attrs"] == {"path": "/health"}
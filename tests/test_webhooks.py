@@ -0,0 +1,130 @@
+import asyncio
+import json
+import os
+import tempfile
+
+import pytest
+from fastapi import HTTPException
+
+import app
+from conftest import FakeHTTPServer, http_response
+
+def run_with_dispatcher(monkeypatch, handler, scenario):
+    """Run `scenario(dispatcher, server, url)` with a fresh job store and a callback server on localhost"""
+    monkeypatch.setattr(app, "WEBHOOK_BACKOFF_BASE", 0.01)
+
+    async def main():
+        store = app.JobStore(os.path.join(tempfile.mkdtemp(), "jobs.db"))
+        store.open()
+        monkeypatch.setattr(app, "store", store)
+        dispatcher = app.WebhookDispatcher()
+        monkeypatch.setattr(app, "webhooks", dispatcher)
+        server = FakeHTTPServer(handler)
+        port = await server.start_tcp()
+        dispatcher.start()
+        try:
+            return await scenario(dispatcher, server, f"http://127.0.0.1:{port}/hooks?source=test")
+        finally:
+            await dispatcher.stop()
+            await server.close()
+            await store.close()
+    return asyncio.run(main())
+
+async def wait_for(condition, timeout: float = 5):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+def deliveries(server: FakeHTTPServer):
+    return [(headers["x-webhook-event"], json.loads(body)) for _, _, headers, body in server.requests]
+
+def test_events_revealed_together_are_delivered_in_order(monkeypatch):
+    async def handler(method, target, headers, body):
+        return http_response(200)
+
+    async def scenario(dispatcher, server, url):
+        dispatcher.register("job-1", url)
+        dispatcher.observe("job-1", "completed", auth_code="ABCD1234", created=["a@example.com"], failed=[])
+        await wait_for(lambda: len(server.requests) == 2)
+        await wait_for(lambda: not dispatcher._tasks)
+        return server, await asyncio.to_thread(app.store._query, "SELECT * FROM webhooks")
+
+    server, pending = run_with_dispatcher(monkeypatch, handler, scenario)
+    (first, auth), (second, final) = deliveries(server)
+    assert (first, second) == ("auth_code", "completed")
+    assert server.requests[0][1] == "/hooks?source=test"
+    assert auth["auth_code"] == "ABCD1234" and "created_mailboxes" not in auth
+    assert final["created_mailboxes"] == ["a@example.com"]
+    assert pending == []
+
+def test_events_of_consecutive_updates_keep_their_order(monkeypatch):
+    async def handler(method, target, headers, body):
+        return http_response(204)
+
+    async def scenario(dispatcher, server, url):
+        for i in range(20):
+            dispatcher.register(f"job-{i}", url)
+            dispatcher.observe(f"job-{i}", "waiting_for_auth", auth_code=f"CODE{i:04d}")
+            dispatcher.observe(f"job-{i}", "failed")
+        await wait_for(lambda: len(server.requests) == 40)
+        return server
+
+    server = run_with_dispatcher(monkeypatch, handler, scenario)
+    order = {}
+    for event, payload in deliveries(server):
+        order.setdefault(payload["container_id"], []).append(event)
+    assert all(events == ["auth_code", "failed"] for events in order.values())
+    assert len(order) == 20
+
+def test_server_errors_are_retried(monkeypatch):
+    statuses = [503, 500, 200]
+
+    async def handler(method, target, headers, body):
+        return http_response(statuses.pop(0))
+
+    async def scenario(dispatcher, server, url):
+        dispatcher.register("job-1", url)
+        dispatcher.observe("job-1", "failed")
+        await wait_for(lambda: len(server.requests) == 3)
+        await wait_for(lambda: not dispatcher._inflight)
+        rows = await asyncio.to_thread(app.store._query, "SELECT * FROM webhooks")
+        return server, rows
+
+    server, rows = run_with_dispatcher(monkeypatch, handler, scenario)
+    assert [headers["x-webhook-delivery"] for _, _, headers, _ in server.requests] == ["1", "1", "1"]
+    assert rows == []
+
+def test_client_errors_are_not_retried(monkeypatch):
+    async def handler(method, target, headers, body):
+        return http_response(410)
+
+    async def scenario(dispatcher, server, url):
+        dispatcher.register("job-1", url)
+        dispatcher.observe("job-1", "cancelled")
+        await wait_for(lambda: len(server.requests) == 1)
+        await wait_for(lambda: not dispatcher._inflight)
+        await asyncio.sleep(0.1)
+        rows = await asyncio.to_thread(app.store._query, "SELECT * FROM webhooks")
+        return server, rows
+
+    server, rows = run_with_dispatcher(monkeypatch, handler, scenario)
+    assert len(server.requests) == 1
+    assert len(rows) == 1 and rows[0]["next_attempt_at"] is None and rows[0]["last_error"] == "HTTP 410"
+
+def test_rejected_submission_registers_no_callback(monkeypatch):
+    monkeypatch.setattr(app, "scheduler", app.JobScheduler(max_running=0, max_queued=0))
+
+    async def handler(method, target, headers, body):
+        return http_response(200)
+
+    async def scenario(dispatcher, server, url):
+        request = app.MailboxRequest(domain="example.com", sender_name="Ada Lovelace", password="x",
+                                     variations=1, callback_url=url)
+        with pytest.raises(HTTPException) as raised:
+            await app.create_mailboxes(request)
+        return raised.value.status_code, dict(dispatcher._callbacks), dict(app.store._pending)
+
+    status, callbacks, pending = run_with_dispatcher(monkeypatch, handler, scenario)
+    assert status == 429
+    assert callbacks == {} and pending == {}